@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+启动耗时基准测试 - 测量stdio服务器从启动进程到返回首个 tools/list 响应的时间
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+project_root = Path(__file__).parent.parent
+src_path = project_root / "src"
+
+PROTOCOL_VERSION = "2024-11-05"
+
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="测量Mercari MCP服务器的冷启动耗时")
+    parser.add_argument("--runs", type=int, default=5, help="重复次数")
+    parser.add_argument(
+        "--module",
+        default="mercari_mcp.server",
+        help="要启动的服务器模块"
+    )
+    return parser.parse_args()
+
+
+def _child_env() -> Dict[str, str]:
+    """子进程环境变量（使用源码目录中的包）"""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(src_path), env.get("PYTHONPATH")]))
+    return env
+
+
+def _send(process: subprocess.Popen, message: Dict[str, Any]) -> None:
+    stdin = process.stdin
+    assert stdin is not None
+    stdin.write((json.dumps(message) + "\n").encode("utf-8"))
+    stdin.flush()
+
+
+def _read_response(process: subprocess.Popen, request_id: int) -> Dict[str, Any]:
+    """读取指定ID的响应（跳过通知消息）"""
+    stdout = process.stdout
+    assert stdout is not None
+    while True:
+        line = stdout.readline()
+        if not line:
+            raise RuntimeError("服务器在响应前退出")
+        message = json.loads(line)
+        if message.get("id") == request_id:
+            return message
+
+
+def measure_import(module: str) -> float:
+    """测量仅导入服务器模块的耗时（秒）"""
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        env=_child_env(),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        check=True
+    ).stdout
+    return float(output.decode().strip().splitlines()[-1])
+
+
+def measure_first_list_tools(module: str) -> Dict[str, float]:
+    """启动服务器进程，完成初始化握手后请求 tools/list，返回各阶段耗时（秒）"""
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", module],
+        env=_child_env(),
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL
+    )
+    try:
+        _send(process, {
+            "jsonrpc": "2.0",
+            "id": 1,
+            "method": "initialize",
+            "params": {
+                "protocolVersion": PROTOCOL_VERSION,
+                "capabilities": {},
+                "clientInfo": {"name": "bench-startup", "version": "0.1.0"}
+            }
+        })
+        _read_response(process, 1)
+        initialized = time.perf_counter()
+
+        _send(process, {"jsonrpc": "2.0", "method": "notifications/initialized"})
+        _send(process, {"jsonrpc": "2.0", "id": 2, "method": "tools/list"})
+        response = _read_response(process, 2)
+        listed = time.perf_counter()
+        if "error" in response:
+            raise RuntimeError(f"tools/list 失败: {response['error']}")
+        return {"initialize": initialized - start, "list_tools": listed - start}
+    finally:
+        process.kill()
+        process.wait()
+
+
+def _format(samples: List[float]) -> str:
+    return (
+        f"min {min(samples) * 1000:.0f}ms / median {statistics.median(samples) * 1000:.0f}ms"
+        f" / max {max(samples) * 1000:.0f}ms"
+    )
+
+
+def main():
+    args = parse_args()
+    imports: List[float] = []
+    initializes: List[float] = []
+    list_tools: List[float] = []
+
+    for run in range(args.runs):
+        imports.append(measure_import(args.module))
+        timings = measure_first_list_tools(args.module)
+        initializes.append(timings["initialize"])
+        list_tools.append(timings["list_tools"])
+        print(
+            f"第 {run + 1} 次: 导入 {imports[-1] * 1000:.0f}ms, "
+            f"initialize {timings['initialize'] * 1000:.0f}ms, "
+            f"首个tools/list {timings['list_tools'] * 1000:.0f}ms",
+            file=sys.stderr
+        )
+
+    print(f"📦 模块导入: {_format(imports)}")
+    print(f"🤝 initialize响应: {_format(initializes)}")
+    print(f"🛠️ 首个tools/list响应: {_format(list_tools)}")
+
+
+if __name__ == "__main__":
+    main()
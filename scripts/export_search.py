@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Mercari搜索结果批量导出脚本
+"""
+
+import sys
+import argparse
+import logging
+from pathlib import Path
+
+# 添加源码路径到Python路径
+project_root = Path(__file__).parent.parent
+src_path = project_root / "src"
+sys.path.insert(0, str(src_path))
+
+from mercari_mcp.export import EXPORT_FORMATS, export_search
+from mercari_mcp.mercapi_client import MercapiClient
+
+
+def setup_logging(log_level: str = "INFO"):
+    """设置日志"""
+    logging.basicConfig(
+        level=getattr(logging, log_level.upper()),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.StreamHandler(sys.stderr)
+        ]
+    )
+
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="将Mercari搜索结果导出为NDJSON/Parquet文件")
+    parser.add_argument("keyword", help="搜索关键词")
+    parser.add_argument("-o", "--output", required=True, help="输出文件路径")
+    parser.add_argument(
+        "--format",
+        default="ndjson",
+        choices=list(EXPORT_FORMATS),
+        help="导出格式"
+    )
+    parser.add_argument("--max-items", type=int, help="最多导出的商品数量（累计）")
+    parser.add_argument("--max-pages", type=int, help="本次运行最多拉取的页数")
+    parser.add_argument("--category-id", type=int, help="分类ID")
+    parser.add_argument("--price-min", type=int, help="最低价格")
+    parser.add_argument("--price-max", type=int, help="最高价格")
+    parser.add_argument("--condition", help="商品状态，可用逗号分隔多个：new, like_new, good, fair, poor")
+    parser.add_argument("--status", choices=["on_sale", "sold_out"], help="销售状态")
+    parser.add_argument("--sort", default="created_time", choices=["created_time", "price", "popular"], help="排序方式")
+    parser.add_argument("--order", default="desc", choices=["asc", "desc"], help="排序顺序")
+    parser.add_argument("--with-seller", action="store_true", help="同时获取卖家信息（每个商品一次请求，较慢）")
+    parser.add_argument("--no-resume", action="store_true", help="忽略进度文件，重新导出")
+    parser.add_argument(
+        "--log-level",
+        default="INFO",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
+        help="日志级别"
+    )
+    return parser.parse_args()
+
+
+async def run(args):
+    """执行导出"""
+    result = await export_search(
+        MercapiClient(),
+        keyword=args.keyword,
+        output_path=args.output,
+        format=args.format,
+        max_items=args.max_items,
+        max_pages=args.max_pages,
+        resume=not args.no_resume,
+        category_id=args.category_id,
+        price_min=args.price_min,
+        price_max=args.price_max,
+        condition=args.condition,
+        status=args.status,
+        sort=args.sort,
+        order=args.order,
+        fetch_seller=args.with_seller
+    )
+    print(result.model_dump_json(indent=2))
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    setup_logging(args.log_level)
+    
+    try:
+        import asyncio
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        print("\n导出已中断，再次运行相同命令即可继续", file=sys.stderr)
+        sys.exit(130)
+    except Exception as e:
+        print(f"导出失败: {e}", file=sys.stderr)
+        sys.exit(1)
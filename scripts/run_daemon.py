@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Mercari MCP守护进程启动脚本
+"""
+
+import sys
+import os
+import argparse
+import logging
+from pathlib import Path
+
+# 添加源码路径到Python路径
+project_root = Path(__file__).parent.parent
+src_path = project_root / "src"
+sys.path.insert(0, str(src_path))
+
+
+def setup_logging(log_level: str = "INFO"):
+    """设置日志"""
+    logging.basicConfig(
+        level=getattr(logging, log_level.upper()),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.StreamHandler(sys.stderr)
+        ]
+    )
+
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="Mercari MCP守护进程（通过Unix套接字为多个会话提供服务）")
+    parser.add_argument(
+        "--log-level",
+        default="INFO",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
+        help="日志级别"
+    )
+    parser.add_argument(
+        "--socket",
+        default=None,
+        help="Unix套接字路径（默认 $MERCARI_MCP_CACHE_DIR/daemon.sock）"
+    )
+    parser.add_argument(
+        "--slow-log",
+        default=None,
+        help="慢调用日志路径（JSON行，按大小轮转），记录超过阈值的工具调用"
+    )
+    parser.add_argument(
+        "--slow-log-threshold",
+        type=float,
+        default=None,
+        help="慢调用阈值（毫秒，默认5000）"
+    )
+    parser.add_argument(
+        "--profile-signal",
+        action="store_true",
+        help="收到 SIGUSR2 时对事件循环进行CPU采样分析"
+    )
+    parser.add_argument(
+        "--version",
+        action="version",
+        version="Mercari MCP Daemon 0.1.0"
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    setup_logging(args.log_level)
+    
+    # 性能诊断选项通过环境变量传给服务器
+    if args.slow_log:
+        os.environ["MERCARI_MCP_SLOW_LOG"] = args.slow_log
+    if args.slow_log_threshold is not None:
+        os.environ["MERCARI_MCP_SLOW_LOG_THRESHOLD_MS"] = str(args.slow_log_threshold)
+    if args.profile_signal:
+        os.environ["MERCARI_MCP_PROFILE_SIGNAL"] = "1"
+    
+    # 设置环境变量
+    if args.socket:
+        os.environ["MERCARI_MCP_DAEMON_SOCKET"] = args.socket
+    
+    # 解析参数后再导入守护进程模块，--help/--version 无需加载MCP依赖
+    from mercari_mcp.daemon import main
+    
+    try:
+        # 运行守护进程
+        import asyncio
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\n守护进程已停止", file=sys.stderr)
+        sys.exit(0)
+    except Exception as e:
+        print(f"守护进程启动失败: {e}", file=sys.stderr)
+        sys.exit(1)
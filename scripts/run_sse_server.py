@@ -14,8 +14,6 @@ project_root = Path(__file__).parent.parent
 src_path = project_root / "src"
 sys.path.insert(0, str(src_path))
 
-from mercari_mcp.sse_server import main
-
 
 def setup_logging(log_level: str = "INFO"):
     """设置日志"""
@@ -48,6 +46,22 @@ def parse_args():
         default=8000,
         help="服务器端口"
     )
+    parser.add_argument(
+        "--slow-log",
+        default=None,
+        help="慢调用日志路径（JSON行，按大小轮转），记录超过阈值的工具调用"
+    )
+    parser.add_argument(
+        "--slow-log-threshold",
+        type=float,
+        default=None,
+        help="慢调用阈值（毫秒，默认5000）"
+    )
+    parser.add_argument(
+        "--profile-signal",
+        action="store_true",
+        help="收到 SIGUSR2 时对事件循环进行CPU采样分析"
+    )
     parser.add_argument(
         "--version",
         action="version",
@@ -60,6 +74,17 @@ if __name__ == "__main__":
     args = parse_args()
     setup_logging(args.log_level)
     
+    # 性能诊断选项通过环境变量传给服务器
+    if args.slow_log:
+        os.environ["MERCARI_MCP_SLOW_LOG"] = args.slow_log
+    if args.slow_log_threshold is not None:
+        os.environ["MERCARI_MCP_SLOW_LOG_THRESHOLD_MS"] = str(args.slow_log_threshold)
+    if args.profile_signal:
+        os.environ["MERCARI_MCP_PROFILE_SIGNAL"] = "1"
+    
+    # 解析参数后再导入服务器模块，--help/--version 无需加载MCP依赖
+    from mercari_mcp.sse_server import main
+    
     # 设置环境变量
     os.environ["MCP_HOST"] = args.host
     os.environ["MCP_PORT"] = str(args.port)
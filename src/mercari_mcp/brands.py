@@ -0,0 +1,155 @@
+"""
+品牌词典索引 - 基于前缀树将品牌名称/别名解析为Mercari品牌ID
+"""
+
+import logging
+from typing import Any, Dict, Iterable, List, Optional
+
+from pydantic import BaseModel, Field
+
+from .text_utils import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# 按日文品牌名称挂载的中文/英文别名
+BRAND_ALIASES: Dict[str, List[str]] = {
+    "アップル": ["苹果", "apple"],
+    "ナイキ": ["耐克", "nike"],
+    "アディダス": ["阿迪达斯", "阿迪", "adidas"],
+    "シャネル": ["香奈儿", "chanel"],
+    "ルイヴィトン": ["路易威登", "lv", "louis vuitton"],
+    "グッチ": ["古驰", "gucci"],
+    "エルメス": ["爱马仕", "hermes"],
+    "プラダ": ["普拉达", "prada"],
+    "ロレックス": ["劳力士", "rolex"],
+    "ソニー": ["索尼", "sony"],
+    "任天堂": ["nintendo"],
+    "ユニクロ": ["优衣库", "uniqlo"],
+    "ディオール": ["迪奥", "dior"],
+    "コーチ": ["蔻驰", "coach"],
+    "サンリオ": ["三丽鸥", "sanrio"],
+}
+
+
+class BrandEntry(BaseModel):
+    """品牌"""
+    id: int = Field(..., description="品牌ID")
+    name: str = Field(..., description="品牌名称")
+    sub_name: Optional[str] = Field(None, description="品牌副名称（英文/读音）")
+
+
+class BrandMatch(BaseModel):
+    """品牌名称解析结果"""
+    id: int = Field(..., description="品牌ID")
+    name: str = Field(..., description="品牌名称")
+    sub_name: Optional[str] = Field(None, description="品牌副名称")
+    matched: str = Field(..., description="命中的名称或别名")
+    exact: bool = Field(..., description="是否精确匹配")
+
+
+def parse_brand_entries(raw_entries: Iterable[Dict[str, Any]]) -> List[BrandEntry]:
+    """解析上游返回的品牌列表"""
+    entries: List[BrandEntry] = []
+    for raw in raw_entries:
+        try:
+            entries.append(BrandEntry(
+                id=int(raw["id"]),
+                name=str(raw["name"]),
+                sub_name=raw.get("sub_name") or raw.get("subName") or None
+            ))
+        except (KeyError, TypeError, ValueError):
+            continue
+    return entries
+
+
+class _TrieNode:
+    """前缀树节点"""
+    __slots__ = ("children", "brand_ids", "term")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.brand_ids: List[int] = []
+        self.term: Optional[str] = None
+
+
+class BrandIndex:
+    """品牌索引
+
+    品牌名称、副名称和别名规范化后插入前缀树：
+    完整匹配时直接返回对应品牌，否则返回以查询为前缀的品牌（较短的名称优先）。
+    """
+
+    def __init__(self, entries: Iterable[BrandEntry],
+                 aliases: Optional[Dict[str, List[str]]] = None):
+        self._by_id: Dict[int, BrandEntry] = {}
+        self._root = _TrieNode()
+        aliases = BRAND_ALIASES if aliases is None else aliases
+
+        for entry in entries:
+            self._by_id[entry.id] = entry
+            self._insert(entry.name, entry.id)
+            if entry.sub_name:
+                self._insert(entry.sub_name, entry.id)
+            for alias in aliases.get(entry.name, []):
+                self._insert(alias, entry.id)
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def _insert(self, term: str, brand_id: int) -> None:
+        """插入一个名称或别名"""
+        key = normalize_text(term)
+        if not key:
+            return
+        node = self._root
+        for char in key:
+            node = node.children.setdefault(char, _TrieNode())
+        node.term = term
+        if brand_id not in node.brand_ids:
+            node.brand_ids.append(brand_id)
+
+    def get(self, brand_id: Optional[int]) -> Optional[BrandEntry]:
+        """按ID获取品牌"""
+        if brand_id is None:
+            return None
+        return self._by_id.get(int(brand_id))
+
+    def name_for(self, brand_id: Optional[int]) -> Optional[str]:
+        """按ID获取品牌名称"""
+        entry = self.get(brand_id)
+        return entry.name if entry else None
+
+    def resolve(self, name: str, limit: int = 10) -> List[BrandMatch]:
+        """将品牌名称/别名/ID解析为品牌列表（精确匹配优先，其次前缀匹配）"""
+        key = normalize_text(name)
+        if not key:
+            return []
+        if key.isdigit() and int(key) in self._by_id:
+            entry = self._by_id[int(key)]
+            return [self._match(entry.id, entry.name, True)]
+
+        node = self._root
+        for char in key:
+            child = node.children.get(char)
+            if child is None:
+                return []
+            node = child
+
+        matches: List[BrandMatch] = []
+        seen = set()
+        # 广度优先遍历子树，较短的补全优先
+        frontier = [node]
+        while frontier and len(matches) < limit:
+            next_frontier: List[_TrieNode] = []
+            for current in frontier:
+                for brand_id in current.brand_ids:
+                    if brand_id not in seen and len(matches) < limit:
+                        seen.add(brand_id)
+                        matches.append(self._match(brand_id, current.term or key, current is node))
+                next_frontier.extend(current.children[char] for char in sorted(current.children))
+            frontier = next_frontier
+        return matches
+
+    def _match(self, brand_id: int, matched: str, exact: bool) -> BrandMatch:
+        entry = self._by_id[brand_id]
+        return BrandMatch(id=entry.id, name=entry.name, sub_name=entry.sub_name, matched=matched, exact=exact)
@@ -0,0 +1,176 @@
+"""
+商品分类索引 - 按ID、日文名称、中英文别名和n-gram模糊匹配解析Mercari分类
+"""
+
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from pydantic import BaseModel, Field
+
+from .text_utils import char_ngrams, normalize_text
+
+logger = logging.getLogger(__name__)
+
+# 按日文分类名称挂载的中文/英文别名
+CATEGORY_ALIASES: Dict[str, List[str]] = {
+    "レディース": ["女装", "女士", "女性", "服装", "women", "womens", "ladies"],
+    "メンズ": ["男装", "男士", "男性", "服装", "men", "mens"],
+    "ベビー・キッズ": ["母婴", "婴儿", "儿童", "童装", "baby", "kids"],
+    "インテリア・住まい・小物": ["家居", "家具", "室内装饰", "interior", "home", "furniture"],
+    "本・音楽・ゲーム": ["书籍", "图书", "音乐", "游戏", "books", "music", "games"],
+    "本": ["书", "书籍", "图书", "book", "books"],
+    "おもちゃ・ホビー・グッズ": ["玩具", "爱好", "周边", "toys", "hobby", "goods"],
+    "コスメ・香水・美容": ["化妆品", "美妆", "香水", "美容", "cosmetics", "beauty", "perfume"],
+    "家電・スマホ・カメラ": ["电子产品", "数码", "家电", "electronics", "appliances"],
+    "スマートフォン/携帯電話": ["手机", "智能手机", "smartphone", "mobile phone"],
+    "PC/タブレット": ["电脑", "平板", "平板电脑", "pc", "computer", "tablet"],
+    "カメラ": ["相机", "照相机", "camera"],
+    "テレビゲーム": ["电子游戏", "游戏机", "video game", "video games"],
+    "スポーツ・レジャー": ["运动", "户外", "体育", "sports", "leisure", "outdoor"],
+    "ハンドメイド": ["手工", "手作", "handmade"],
+    "チケット": ["门票", "票券", "ticket", "tickets"],
+    "自動車・オートバイ": ["汽车", "摩托车", "car", "cars", "motorcycle", "automobile"],
+    "腕時計": ["手表", "腕表", "watch", "watches"],
+    "バッグ": ["包", "包包", "bag", "bags"],
+    "財布": ["钱包", "wallet"],
+    "トレーディングカード": ["卡牌", "集换式卡牌", "球星卡", "trading card", "trading cards"],
+    "その他": ["其他", "other", "others"],
+}
+
+
+class CategoryNode(BaseModel):
+    """分类节点"""
+    id: int = Field(..., description="分类ID")
+    name: str = Field(..., description="分类名称（日文）")
+    parent_id: Optional[int] = Field(None, description="父分类ID")
+    root_id: Optional[int] = Field(None, description="根分类ID")
+    path: List[str] = Field(default_factory=list, description="从根分类到本分类的名称路径")
+
+
+class CategoryMatch(BaseModel):
+    """分类名称解析结果"""
+    id: int = Field(..., description="分类ID")
+    name: str = Field(..., description="分类名称")
+    path: str = Field(..., description="分类路径")
+    score: float = Field(..., description="匹配得分（1为精确匹配）")
+
+
+def flatten_category_tree(raw_nodes: Iterable[Dict[str, Any]]) -> List[CategoryNode]:
+    """将上游返回的嵌套分类树展开为节点列表"""
+    nodes: List[CategoryNode] = []
+
+    def visit(raw: Dict[str, Any], parent: Optional[CategoryNode]) -> None:
+        try:
+            node = CategoryNode(
+                id=int(raw["id"]),
+                name=str(raw["name"]),
+                parent_id=parent.id if parent else raw.get("parent_category_id") or None,
+                root_id=parent.root_id if parent else int(raw["id"]),
+                path=(parent.path if parent else []) + [str(raw["name"])]
+            )
+        except (KeyError, TypeError, ValueError):
+            return
+        nodes.append(node)
+        for child in raw.get("children") or []:
+            visit(child, node)
+
+    for raw in raw_nodes:
+        visit(raw, None)
+    return nodes
+
+
+class CategoryIndex:
+    """分类索引
+
+    - 按ID查名称：字典查找
+    - 按名称/别名解析：规范化后字典查找
+    - 模糊匹配：名称和别名的字符bigram倒排 + Dice系数打分
+    """
+
+    def __init__(self, nodes: Iterable[CategoryNode],
+                 aliases: Optional[Dict[str, List[str]]] = None):
+        self._by_id: Dict[int, CategoryNode] = {}
+        self._by_name: Dict[str, List[int]] = {}
+        self._grams: Dict[str, Set[str]] = {}
+        self._postings: Dict[str, Set[str]] = {}
+        aliases = CATEGORY_ALIASES if aliases is None else aliases
+
+        for node in nodes:
+            self._by_id[node.id] = node
+            self._add_term(node.name, node.id)
+            # 「・」「/」分隔的复合名称，各部分也可单独匹配
+            for part in node.name.replace("/", "・").split("・"):
+                if part and part != node.name:
+                    self._add_term(part, node.id)
+            for alias in aliases.get(node.name, []):
+                self._add_term(alias, node.id)
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def _add_term(self, term: str, category_id: int) -> None:
+        """登记一个名称或别名"""
+        key = normalize_text(term)
+        if not key:
+            return
+        ids = self._by_name.setdefault(key, [])
+        if category_id not in ids:
+            ids.append(category_id)
+        if key not in self._grams:
+            grams = char_ngrams(key, 2)
+            self._grams[key] = grams
+            for gram in grams:
+                self._postings.setdefault(gram, set()).add(key)
+
+    def get(self, category_id: Optional[int]) -> Optional[CategoryNode]:
+        """按ID获取分类"""
+        if category_id is None:
+            return None
+        return self._by_id.get(int(category_id))
+
+    def name_for(self, category_id: Optional[int]) -> Optional[str]:
+        """按ID获取分类名称"""
+        node = self.get(category_id)
+        return node.name if node else None
+
+    def resolve(self, name: str, limit: int = 5, min_score: float = 0.4) -> List[CategoryMatch]:
+        """将分类名称（日文/中文/英文/ID）解析为分类列表"""
+        key = normalize_text(name)
+        if not key:
+            return []
+        if key.isdigit() and int(key) in self._by_id:
+            return [self._match(int(key), 1.0)]
+
+        exact = self._by_name.get(key)
+        if exact:
+            return [self._match(category_id, 1.0) for category_id in exact[:limit]]
+
+        # 模糊匹配：与查询共享bigram的名称按Dice系数打分
+        query_grams = char_ngrams(key, 2)
+        candidates: Set[str] = set()
+        for gram in query_grams:
+            candidates |= self._postings.get(gram, set())
+
+        scored: Dict[int, float] = {}
+        for term in candidates:
+            grams = self._grams[term]
+            score = 2 * len(query_grams & grams) / (len(query_grams) + len(grams))
+            if key in term:
+                score = max(score, len(key) / len(term))
+            if score < min_score:
+                continue
+            for category_id in self._by_name[term]:
+                if score > scored.get(category_id, 0.0):
+                    scored[category_id] = score
+
+        # 同分时优先层级浅的分类
+        ranked = sorted(
+            scored.items(),
+            key=lambda entry: (-entry[1], len(self._by_id[entry[0]].path), entry[0])
+        )
+        return [self._match(category_id, score) for category_id, score in ranked[:limit]]
+
+    def _match(self, category_id: int, score: float) -> CategoryMatch:
+        node = self._by_id[category_id]
+        return CategoryMatch(id=node.id, name=node.name, path=" > ".join(node.path), score=round(score, 3))
+
@@ -0,0 +1,50 @@
+"""
+配置工具 - 从环境变量读取服务器可选功能的开关与参数
+"""
+
+import os
+from typing import Optional, overload
+
+
+def env_flag(name: str, default: bool = False) -> bool:
+    """读取布尔型环境变量（1/true/yes/on 视为开启）"""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def env_int(name: str, default: int) -> int:
+    """读取整数型环境变量"""
+    value = os.environ.get(name)
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        return default
+
+
+def env_float(name: str, default: float) -> float:
+    """读取浮点型环境变量"""
+    value = os.environ.get(name)
+    if not value:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        return default
+
+
+@overload
+def env_str(name: str, default: str) -> str: ...
+
+
+@overload
+def env_str(name: str, default: None = None) -> Optional[str]: ...
+
+
+def env_str(name: str, default: Optional[str] = None) -> Optional[str]:
+    """读取字符串型环境变量（提供默认值时返回值不为None）"""
+    value = os.environ.get(name)
+    return value if value else default
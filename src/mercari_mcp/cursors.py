@@ -0,0 +1,212 @@
+"""
+结果游标 - 在服务器端保存已拉取并解析的搜索结果，后续翻页直接从内存返回
+"""
+
+import asyncio
+import logging
+import secrets
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .mercapi_client import MercariItem, MercariSearchBatch, MercariSearchResult
+
+logger = logging.getLogger(__name__)
+
+# 拉取一批上游结果（参数为上游分页令牌）
+BatchFetcher = Callable[..., Awaitable[MercariSearchBatch]]
+
+# 单次翻页最多补拉的上游页数（价格筛选可能使整页结果为空）
+MAX_FETCH_PAGES = 5
+
+# 单个商品在内存中的估算固定开销（字节）
+ITEM_OVERHEAD_BYTES = 512
+
+
+class CursorNotFoundError(Exception):
+    """游标无效或已过期"""
+
+
+def estimate_item_bytes(item: MercariItem) -> int:
+    """粗略估算商品占用的内存"""
+    text = len(item.name) + len(item.description or "")
+    return ITEM_OVERHEAD_BYTES + text * 4 + len(item.thumbnail) + len(item.url or "") + 16 * len(item.duplicate_ids)
+
+
+class SearchSession:
+    """一次搜索的服务器端结果会话
+
+    items 保存从第 base_offset 个商品开始的已处理结果，已返回的前缀在会话过大时会被丢弃。
+    """
+
+    def __init__(self, session_id: str, fetch: BatchFetcher, limit: int, context: Dict[str, Any]):
+        self.session_id = session_id
+        self.fetch = fetch
+        self.limit = limit
+        self.context = context
+        self.items: List[MercariItem] = []
+        self.base_offset = 0
+        self.total_count = 0
+        self.collapsed_count = 0
+        self.next_page_token: Optional[str] = None
+        self.started = False
+        self.size_bytes = 0
+        self.last_access = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+
+    @property
+    def lock(self) -> asyncio.Lock:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    @property
+    def buffered_end(self) -> int:
+        """已缓存结果的末尾位置"""
+        return self.base_offset + len(self.items)
+
+    def add_batch(self, batch: MercariSearchBatch) -> None:
+        self.started = True
+        self.items.extend(batch.items)
+        self.total_count = batch.total_count
+        self.collapsed_count += batch.collapsed_count
+        self.next_page_token = batch.next_page_token
+        self.size_bytes += sum(estimate_item_bytes(item) for item in batch.items)
+
+    def drop_before(self, offset: int) -> int:
+        """丢弃 offset 之前已返回的商品，返回释放的估算字节数"""
+        count = min(max(offset - self.base_offset, 0), len(self.items))
+        if not count:
+            return 0
+        freed = sum(estimate_item_bytes(item) for item in self.items[:count])
+        del self.items[:count]
+        self.base_offset += count
+        self.size_bytes -= freed
+        return freed
+
+
+class ResultCursorStore:
+    """结果会话存储
+
+    - 游标为 "<会话ID>.<偏移量>"，同一游标可重复使用（重试安全）
+    - 会话闲置超过 idle_timeout 秒后失效
+    - 所有会话的估算内存超过 max_bytes 时，按最久未访问的顺序淘汰会话，仍超出则丢弃当前会话中已返回的商品
+    """
+
+    def __init__(self, idle_timeout: float = 600.0, max_bytes: int = 64 * 1024 * 1024, max_sessions: int = 1000):
+        self.idle_timeout = idle_timeout
+        self.max_bytes = max_bytes
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, SearchSession]" = OrderedDict()
+        self._total_bytes = 0
+        # 完全从内存返回的翻页次数，以及向上游补拉的次数
+        self.hits = 0
+        self.upstream_fetches = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "sessions": len(self._sessions),
+            "bytes": self._total_bytes,
+            "hits": self.hits,
+            "upstream_fetches": self.upstream_fetches,
+        }
+
+    async def open(self, fetch: BatchFetcher, offset: int, limit: int,
+                   context: Optional[Dict[str, Any]] = None) -> MercariSearchResult:
+        """开始一次搜索，返回从 offset 开始的一页结果；还有更多结果时附带游标"""
+        session = SearchSession(secrets.token_urlsafe(12), fetch, limit, context or {})
+        self._sweep()
+        self._sessions[session.session_id] = session
+        try:
+            result = await self._page(session, offset, limit)
+        except Exception:
+            self._remove(session.session_id)
+            raise
+        if result.cursor is None:
+            # 没有后续结果，不需要保留会话
+            self._remove(session.session_id)
+        return result
+
+    async def next_page(self, cursor: str, limit: Optional[int] = None) -> Tuple[SearchSession, int, MercariSearchResult]:
+        """按游标返回下一页结果（以及该页的起始偏移量）"""
+        session, offset = self._resolve(cursor)
+        if offset < session.base_offset:
+            raise CursorNotFoundError("游标已过期（会话内存不足时已丢弃较早的结果），请重新搜索")
+        fetches = self.upstream_fetches
+        result = await self._page(session, offset, limit or session.limit)
+        if self.upstream_fetches == fetches:
+            self.hits += 1
+        return session, offset, result
+
+    def _resolve(self, cursor: str) -> Tuple[SearchSession, int]:
+        self._sweep()
+        session_id, _, offset_text = (cursor or "").rpartition(".")
+        session = self._sessions.get(session_id)
+        if session is None or not offset_text.isdigit():
+            raise CursorNotFoundError("游标无效或已过期，请重新搜索")
+        self._sessions.move_to_end(session_id)
+        session.last_access = time.monotonic()
+        return session, int(offset_text)
+
+    async def _page(self, session: SearchSession, offset: int, limit: int) -> MercariSearchResult:
+        end = offset + limit
+        async with session.lock:
+            fetched = 0
+            # 缓存不足时才向上游补拉
+            while session.buffered_end < end and (not session.started or session.next_page_token):
+                if fetched >= MAX_FETCH_PAGES:
+                    break
+                before = session.size_bytes
+                batch = await session.fetch(page_token=session.next_page_token)
+                session.add_batch(batch)
+                if session.session_id in self._sessions:
+                    self._total_bytes += session.size_bytes - before
+                self.upstream_fetches += 1
+                fetched += 1
+            self._enforce_limits(session, keep_from=offset)
+
+            start = max(offset - session.base_offset, 0)
+            items = session.items[start:end - session.base_offset]
+            has_next = session.buffered_end > end or bool(session.next_page_token)
+            return MercariSearchResult(
+                total_count=session.total_count,
+                items=items,
+                has_next=has_next,
+                current_page=offset // max(limit, 1) + 1,
+                collapsed_count=session.collapsed_count,
+                cursor=f"{session.session_id}.{end}" if has_next else None
+            )
+
+    def _sweep(self) -> None:
+        """淘汰闲置超时的会话"""
+        deadline = time.monotonic() - self.idle_timeout
+        expired = [sid for sid, session in self._sessions.items() if session.last_access < deadline]
+        for session_id in expired:
+            self._remove(session_id)
+
+    def _enforce_limits(self, current: SearchSession, keep_from: int) -> None:
+        """超出内存或会话数上限时，按最久未访问的顺序回收（当前会话只丢弃 keep_from 之前的商品）"""
+        while len(self._sessions) > self.max_sessions:
+            session_id = next(iter(self._sessions))
+            if session_id == current.session_id:
+                break
+            self._remove(session_id)
+        if self._total_bytes <= self.max_bytes:
+            return
+        for session in list(self._sessions.values()):
+            if self._total_bytes <= self.max_bytes:
+                return
+            if session is current:
+                continue
+            self._remove(session.session_id)
+        # 只剩当前会话时，丢弃其中已返回的商品
+        freed = current.drop_before(keep_from)
+        if current.session_id in self._sessions:
+            self._total_bytes -= freed
+        if self._total_bytes > self.max_bytes:
+            logger.warning(f"结果会话内存超出上限: {self._total_bytes} 字节")
+
+    def _remove(self, session_id: str) -> None:
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            self._total_bytes -= session.size_bytes
@@ -0,0 +1,171 @@
+"""
+常驻守护进程 - 通过Unix套接字为多个会话提供同一个预热的MCP服务器
+
+智能体宿主为每个会话启动一次stdio服务器时，每次都要付出解释器启动、导入、
+TLS握手和空缓存的代价。守护进程常驻并持有预热的Mercapi客户端（连接池、
+分类/品牌索引、本地索引和价格历史），每个会话由轻量的 shim 通过套接字转发。
+"""
+
+import asyncio
+import errno
+import fcntl
+import logging
+import os
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, Optional, Tuple, Union
+
+import anyio
+import anyio.lowlevel
+from anyio.abc import SocketStream
+from anyio.streams.buffered import BufferedByteReceiveStream
+from anyio.streams.memory import MemoryObjectReceiveStream, MemoryObjectSendStream
+from mcp.server import NotificationOptions
+from mcp.server.models import InitializationOptions
+from mcp.shared.message import SessionMessage
+from mcp.types import JSONRPCMessage
+
+from . import server as server_module
+from .loop_health import configure_loop_health_from_env
+from .profiling import configure_profiling_from_env
+from .shim import default_socket_path
+from .tracing import configure_tracing_from_env
+
+logger = logging.getLogger(__name__)
+
+# 单条JSON-RPC消息的最大字节数
+MAX_MESSAGE_BYTES = 16 * 1024 * 1024
+
+
+def lock_path_for(socket_path: Path) -> Path:
+    """守护进程锁文件路径（保证同一套接字只有一个守护进程）"""
+    return socket_path.with_name(socket_path.name + ".lock")
+
+
+@asynccontextmanager
+async def socket_transport(
+    stream: SocketStream
+) -> AsyncIterator[Tuple[MemoryObjectReceiveStream, MemoryObjectSendStream]]:
+    """套接字上按行分隔的JSON-RPC传输（与stdio传输的消息格式相同）"""
+    read_stream_writer: MemoryObjectSendStream[Union[SessionMessage, Exception]]
+    read_stream: MemoryObjectReceiveStream[Union[SessionMessage, Exception]]
+    write_stream: MemoryObjectSendStream[SessionMessage]
+    write_stream_reader: MemoryObjectReceiveStream[SessionMessage]
+    read_stream_writer, read_stream = anyio.create_memory_object_stream(0)
+    write_stream, write_stream_reader = anyio.create_memory_object_stream(0)
+    buffered = BufferedByteReceiveStream(stream)
+
+    async def socket_reader():
+        try:
+            async with read_stream_writer:
+                while True:
+                    try:
+                        line = await buffered.receive_until(b"\n", MAX_MESSAGE_BYTES)
+                    except (anyio.EndOfStream, anyio.IncompleteRead):
+                        break
+                    if not line.strip():
+                        continue
+                    try:
+                        message = JSONRPCMessage.model_validate_json(line)
+                    except Exception as exc:
+                        await read_stream_writer.send(exc)
+                        continue
+                    await read_stream_writer.send(SessionMessage(message))
+        except (anyio.ClosedResourceError, anyio.BrokenResourceError):
+            await anyio.lowlevel.checkpoint()
+
+    async def socket_writer():
+        try:
+            async with write_stream_reader:
+                async for session_message in write_stream_reader:
+                    data = session_message.message.model_dump_json(by_alias=True, exclude_none=True)
+                    await stream.send(data.encode("utf-8") + b"\n")
+        except (anyio.ClosedResourceError, anyio.BrokenResourceError):
+            await anyio.lowlevel.checkpoint()
+
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(socket_reader)
+        tg.start_soon(socket_writer)
+        yield read_stream, write_stream
+
+
+async def _handle_connection(stream: SocketStream) -> None:
+    """处理一个会话连接：在共享的服务器实例上运行一次MCP会话"""
+    logger.info("会话已连接")
+    server = server_module.server
+    try:
+        async with stream, socket_transport(stream) as (read_stream, write_stream):
+            await server.run(
+                read_stream,
+                write_stream,
+                InitializationOptions(
+                    server_name="mercari-mcp",
+                    server_version="0.1.0",
+                    capabilities=server.get_capabilities(
+                        notification_options=NotificationOptions(),
+                        experimental_capabilities={}
+                    )
+                )
+            )
+    except Exception as e:
+        logger.warning(f"会话异常结束: {e}")
+    finally:
+        logger.info("会话已断开")
+
+
+def _acquire_lock(socket_path: Path) -> Optional[int]:
+    """获取守护进程锁，已有守护进程运行时返回None"""
+    fd = os.open(str(lock_path_for(socket_path)), os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError as e:
+        os.close(fd)
+        if e.errno in (errno.EAGAIN, errno.EACCES):
+            return None
+        raise
+    return fd
+
+
+async def _warm_up() -> None:
+    """预热：创建Mercapi客户端并加载分类索引"""
+    try:
+        await server_module.get_mercapi_client().get_category_index()
+    except Exception as e:
+        logger.warning(f"预热失败: {e}")
+
+
+async def serve_daemon(socket_path: Optional[Union[str, Path]] = None) -> None:
+    """启动守护进程，持续接受会话连接"""
+    socket_path = Path(socket_path) if socket_path else default_socket_path()
+    socket_path.parent.mkdir(parents=True, exist_ok=True, mode=0o700)
+
+    lock_fd = _acquire_lock(socket_path)
+    if lock_fd is None:
+        raise Exception(f"守护进程已在运行: {socket_path}")
+
+    try:
+        # 持有锁说明之前的守护进程已退出，残留的套接字文件可以删除
+        if socket_path.exists():
+            socket_path.unlink()
+        listener = await anyio.create_unix_listener(socket_path, mode=0o600)
+        logger.info(f"🚀 Mercari MCP守护进程已启动: {socket_path}")
+
+        async with listener, anyio.create_task_group() as tg:
+            tg.start_soon(_warm_up)
+            await listener.serve(_handle_connection, task_group=tg)
+    finally:
+        if socket_path.exists():
+            socket_path.unlink()
+        os.close(lock_fd)
+
+
+async def main():
+    """主函数"""
+    configure_tracing_from_env()
+    configure_profiling_from_env()
+    configure_loop_health_from_env()
+    await serve_daemon()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
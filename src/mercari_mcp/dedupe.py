@@ -0,0 +1,141 @@
+"""
+近似重复商品检测 - 基于商品名称MinHash与价格分桶的线性时间分组折叠
+"""
+
+import hashlib
+import math
+import random
+from typing import TYPE_CHECKING, Dict, FrozenSet, List, Sequence, Tuple
+
+from .text_utils import char_ngrams, normalize_text
+
+# MinHash签名长度与LSH分段（每段2个哈希值，Jaccard 0.6的商品对约97%进入候选）
+MINHASH_PERMUTATIONS = 16
+MINHASH_ROWS_PER_BAND = 2
+
+# 判定为近似重复的最小名称Jaccard相似度（同一卖家的商品放宽阈值）
+MIN_SIMILARITY = 0.75
+MIN_SIMILARITY_SAME_SELLER = 0.5
+
+# 价格分桶比例：价格相差在此比例以内的商品才可能被判为重复
+PRICE_BUCKET_RATIO = 1.2
+
+if TYPE_CHECKING:
+    from .mercapi_client import MercariItem
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(20240601)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(MINHASH_PERMUTATIONS)
+]
+
+
+def name_shingles(name: str) -> FrozenSet[str]:
+    """商品名称规范化后的字符bigram集合"""
+    key = normalize_text(name)
+    return frozenset(char_ngrams(key, 2) if len(key) >= 2 else {key})
+
+
+def minhash(shingles: FrozenSet[str]) -> Tuple[int, ...]:
+    """MinHash签名"""
+    hashes = [
+        int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for shingle in shingles
+    ] or [0]
+    return tuple(
+        min((a * value + b) % _MERSENNE_PRIME for value in hashes)
+        for a, b in _PERMUTATIONS
+    )
+
+
+def price_bucket(price: int) -> int:
+    """价格的对数分桶"""
+    return int(math.log(max(price, 1), PRICE_BUCKET_RATIO))
+
+
+def _jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class _UnionFind:
+    """并查集（按秩合并 + 路径压缩）"""
+
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+        self.rank = [0] * size
+
+    def find(self, x: int) -> int:
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, a: int, b: int) -> None:
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return
+        if self.rank[root_a] < self.rank[root_b]:
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        if self.rank[root_a] == self.rank[root_b]:
+            self.rank[root_a] += 1
+
+
+def group_duplicates(items: Sequence["MercariItem"]) -> List[List[int]]:
+    """将近似重复的商品分组，返回按首次出现顺序排列的下标分组
+
+    MinHash签名的每个分段与价格分桶组成LSH桶，只比较同桶商品，通常为线性时间；
+    候选商品对再用名称的精确Jaccard相似度与价格比例确认，确认后用并查集合并。
+    """
+    shingles = [name_shingles(item.name) for item in items]
+    buckets = [price_bucket(item.price) for item in items]
+    union_find = _UnionFind(len(items))
+    lsh: Dict[Tuple[int, Tuple[int, ...], int], List[int]] = {}
+
+    for index, signature in enumerate(minhash(grams) for grams in shingles):
+        for band in range(0, MINHASH_PERMUTATIONS, MINHASH_ROWS_PER_BAND):
+            band_value = signature[band:band + MINHASH_ROWS_PER_BAND]
+            merged = False
+            # 相邻价格分桶也参与比较，避免价格恰好落在分桶边界两侧的重复商品被漏掉
+            for bucket in (buckets[index] - 1, buckets[index], buckets[index] + 1):
+                for other in lsh.get((band, band_value, bucket), ()):
+                    if union_find.find(other) == union_find.find(index):
+                        merged = True
+                    elif _is_duplicate(items[index], items[other], shingles[index], shingles[other]):
+                        union_find.union(index, other)
+                        merged = True
+            # 已与桶内商品合并的不再登记，桶内只保留各组的代表，避免大量重复时退化为平方复杂度
+            if not merged:
+                lsh.setdefault((band, band_value, buckets[index]), []).append(index)
+
+    groups: Dict[int, List[int]] = {}
+    for index in range(len(items)):
+        groups.setdefault(union_find.find(index), []).append(index)
+    return sorted(groups.values(), key=lambda group: group[0])
+
+
+def _is_duplicate(a: "MercariItem", b: "MercariItem", shingles_a: FrozenSet[str], shingles_b: FrozenSet[str]) -> bool:
+    """确认两个候选商品是否为近似重复"""
+    low, high = sorted((a.price, b.price))
+    if high > max(low, 1) * PRICE_BUCKET_RATIO:
+        return False
+    same_seller = bool(a.seller_id) and a.seller_id == b.seller_id
+    threshold = MIN_SIMILARITY_SAME_SELLER if same_seller else MIN_SIMILARITY
+    return _jaccard(shingles_a, shingles_b) >= threshold
+
+
+def collapse_duplicates(items: Sequence["MercariItem"]) -> List["MercariItem"]:
+    """每组近似重复商品只保留最先出现的一个，并记录被折叠的商品"""
+    collapsed: List["MercariItem"] = []
+    for group in group_duplicates(items):
+        representative = items[group[0]]
+        if len(group) > 1:
+            representative = representative.model_copy(update={
+                "duplicate_count": len(group) - 1,
+                "duplicate_ids": [items[index].id for index in group[1:]],
+            })
+        collapsed.append(representative)
+    return collapsed
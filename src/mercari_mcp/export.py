@@ -0,0 +1,286 @@
+"""
+批量导出 - 将搜索结果逐页流式写入NDJSON/Parquet文件，支持断点续传
+"""
+
+import asyncio
+import logging
+import os
+import typing
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+from .mercapi_client import MercapiClient, MercariItem
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("ndjson", "parquet")
+
+# Parquet每个行组包含的最大页数（每页最多120个商品）
+PARQUET_PAGES_PER_ROW_GROUP = 8
+
+
+class ExportState(BaseModel):
+    """导出进度（保存在 <输出文件>.state.json 中）"""
+    keyword: str = Field(..., description="搜索关键词")
+    format: str = Field(..., description="导出格式")
+    params: Dict[str, Any] = Field(default_factory=dict, description="搜索参数")
+    next_page_token: Optional[str] = Field(default=None, description="下一页的分页令牌")
+    rows_written: int = Field(default=0, description="已写入的行数")
+    pages_fetched: int = Field(default=0, description="已拉取的页数")
+    bytes_written: int = Field(default=0, description="NDJSON文件已确认写入的字节数")
+    parts: List[str] = Field(default_factory=list, description="Parquet已完成的分片文件")
+    completed: bool = Field(default=False, description="是否已导出全部结果")
+
+
+class ExportResult(BaseModel):
+    """导出结果"""
+    path: str = Field(..., description="输出文件路径")
+    format: str = Field(..., description="导出格式")
+    rows_written: int = Field(..., description="累计写入的行数")
+    rows_this_run: int = Field(..., description="本次运行写入的行数")
+    pages_fetched: int = Field(..., description="累计拉取的页数")
+    completed: bool = Field(..., description="是否已导出全部结果")
+    resumed: bool = Field(default=False, description="是否从上次中断处继续")
+    next_page_token: Optional[str] = Field(default=None, description="继续导出所需的分页令牌")
+    files: List[str] = Field(default_factory=list, description="输出的文件列表")
+
+
+def state_path_for(path: Path) -> Path:
+    """导出进度文件路径"""
+    return path.with_name(path.name + ".state.json")
+
+
+def _load_state(path: Path) -> Optional[ExportState]:
+    """读取导出进度"""
+    state_path = state_path_for(path)
+    if not state_path.exists():
+        return None
+    try:
+        return ExportState.model_validate_json(state_path.read_text(encoding="utf-8"))
+    except Exception as e:
+        logger.warning(f"读取导出进度失败，将重新导出: {e}")
+        return None
+
+
+def _save_state(path: Path, state: ExportState) -> None:
+    """原子地保存导出进度"""
+    state_path = state_path_for(path)
+    tmp_path = state_path.with_name(state_path.name + ".tmp")
+    tmp_path.write_text(state.model_dump_json(indent=2), encoding="utf-8")
+    os.replace(tmp_path, state_path)
+
+
+def _arrow_schema():
+    """根据MercariItem字段生成Arrow表结构"""
+    import pyarrow as pa
+
+    fields = []
+    for name, field in MercariItem.model_fields.items():
+        annotation = field.annotation
+        base = annotation
+        if typing.get_origin(annotation) is typing.Union:
+            base = [arg for arg in typing.get_args(annotation) if arg is not type(None)][0]
+        if typing.get_origin(base) is list:
+            arrow_type = pa.list_(pa.string())
+        elif base is bool:
+            arrow_type = pa.bool_()
+        elif base is int:
+            arrow_type = pa.int64()
+        elif base is float:
+            arrow_type = pa.float64()
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(name, arrow_type))
+    return pa.schema(fields)
+
+
+class _NdjsonWriter:
+    """NDJSON写入器，每页写完后落盘并记录字节偏移"""
+
+    def __init__(self, path: Path, state: ExportState):
+        self.path = path
+        mode = "r+b" if path.exists() and state.bytes_written else "wb"
+        self._file = open(path, mode)
+        # 截断上次中断时未确认的半页数据
+        self._file.seek(state.bytes_written)
+        self._file.truncate()
+
+    def write_page(self, items: List[MercariItem], state: ExportState) -> None:
+        for item in items:
+            self._file.write(item.model_dump_json().encode("utf-8") + b"\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        state.bytes_written = self._file.tell()
+
+    def checkpoint_each_page(self) -> bool:
+        return True
+
+    def close(self, state: ExportState) -> None:
+        self._file.close()
+
+    def files(self, state: ExportState) -> List[str]:
+        return [str(self.path)]
+
+
+class _ParquetWriter:
+    """Parquet写入器
+
+    Parquet文件只有在写入文件尾后才可读，因此每次运行写入一个新的分片，
+    分片正常关闭后才记录进度；进程被强制终止时，续传会从上次关闭的分片之后重新拉取。
+    """
+
+    def __init__(self, path: Path, state: ExportState):
+        try:
+            import pyarrow  # noqa: F401
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise Exception("导出Parquet需要安装pyarrow: pip install -e \".[export]\"")
+
+        self.path = path
+        part_index = len(state.parts)
+        self.part_path = path if part_index == 0 else path.with_name(
+            f"{path.stem}.part{part_index}{path.suffix}"
+        )
+        self._schema = _arrow_schema()
+        self._writer = pq.ParquetWriter(str(self.part_path), self._schema)
+        self._buffer: List[Dict[str, Any]] = []
+        self._buffered_pages = 0
+        self._rows = 0
+
+    def write_page(self, items: List[MercariItem], state: ExportState) -> None:
+        self._buffer.extend(item.model_dump() for item in items)
+        self._buffered_pages += 1
+        self._rows += len(items)
+        if self._buffered_pages >= PARQUET_PAGES_PER_ROW_GROUP:
+            self._flush()
+
+    def _flush(self) -> None:
+        import pyarrow as pa
+
+        if self._buffer:
+            self._writer.write_table(pa.Table.from_pylist(self._buffer, schema=self._schema))
+        self._buffer = []
+        self._buffered_pages = 0
+
+    def checkpoint_each_page(self) -> bool:
+        return False
+
+    def close(self, state: ExportState) -> None:
+        self._flush()
+        self._writer.close()
+        if self._rows:
+            state.parts.append(str(self.part_path))
+        else:
+            self.part_path.unlink()
+
+    def files(self, state: ExportState) -> List[str]:
+        return list(state.parts)
+
+
+async def export_search(
+    client: MercapiClient,
+    keyword: str,
+    output_path: str,
+    format: str = "ndjson",
+    max_items: Optional[int] = None,
+    max_pages: Optional[int] = None,
+    resume: bool = True,
+    category_id: Optional[int] = None,
+    price_min: Optional[int] = None,
+    price_max: Optional[int] = None,
+    condition: Optional[str] = None,
+    status: Optional[str] = None,
+    sort: str = "created_time",
+    order: str = "desc",
+    fetch_seller: bool = False
+) -> ExportResult:
+    """导出搜索结果，内存中最多只保留少量页面"""
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"不支持的导出格式: {format}")
+
+    path = Path(output_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    params = {
+        "category_id": category_id,
+        "price_min": price_min,
+        "price_max": price_max,
+        "condition": condition,
+        "status": status,
+        "sort": sort,
+        "order": order,
+        "fetch_seller": fetch_seller,
+    }
+
+    state = _load_state(path) if resume else None
+    if state is not None and (state.keyword != keyword or state.format != format or state.params != params):
+        logger.warning(f"导出参数与进度文件不一致，将重新导出: {path}")
+        state = None
+    resumed = state is not None and state.pages_fetched > 0
+    if state is None:
+        state = ExportState(keyword=keyword, format=format, params=params)
+
+    if state.completed or (max_items is not None and state.rows_written >= max_items):
+        logger.info(f"导出已完成，无需继续: {path}")
+        return ExportResult(
+            path=str(path), format=format, rows_written=state.rows_written, rows_this_run=0,
+            pages_fetched=state.pages_fetched, completed=state.completed, resumed=resumed,
+            next_page_token=state.next_page_token,
+            files=[str(path)] if format == "ndjson" else list(state.parts)
+        )
+
+    writer = _NdjsonWriter(path, state) if format == "ndjson" else _ParquetWriter(path, state)
+    # 写页面、fsync和保存进度都是阻塞的文件操作，放到线程池中执行，避免阻塞其他客户端
+    loop = asyncio.get_running_loop()
+    rows_this_run = 0
+    pages_this_run = 0
+    logger.info(f"开始导出: keyword={keyword}, path={path}, format={format}, resumed={resumed}")
+
+    try:
+        async for page in client.iter_search_pages(
+            keyword,
+            category_ids=[int(category_id)] if category_id is not None else None,
+            price_min=price_min,
+            price_max=price_max,
+            condition=condition,
+            status=status,
+            sort=sort,
+            order=order,
+            page_token=state.next_page_token,
+            fetch_seller=fetch_seller
+        ):
+            items = page.items
+            if max_items is not None:
+                items = items[:max(max_items - state.rows_written, 0)]
+            await loop.run_in_executor(None, writer.write_page, items, state)
+
+            rows_this_run += len(items)
+            pages_this_run += 1
+            state.rows_written += len(items)
+            state.pages_fetched += 1
+            state.next_page_token = page.next_page_token
+            state.completed = page.next_page_token is None
+            if writer.checkpoint_each_page():
+                await loop.run_in_executor(None, _save_state, path, state)
+
+            if max_items is not None and state.rows_written >= max_items:
+                break
+            if max_pages is not None and pages_this_run >= max_pages:
+                break
+    finally:
+        await loop.run_in_executor(None, writer.close, state)
+        await loop.run_in_executor(None, _save_state, path, state)
+
+    logger.info(f"导出结束: path={path}, 本次写入 {rows_this_run} 行, 累计 {state.rows_written} 行")
+    return ExportResult(
+        path=str(path),
+        format=format,
+        rows_written=state.rows_written,
+        rows_this_run=rows_this_run,
+        pages_fetched=state.pages_fetched,
+        completed=state.completed,
+        resumed=resumed,
+        next_page_token=state.next_page_token,
+        files=writer.files(state)
+    )
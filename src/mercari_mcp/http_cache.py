@@ -0,0 +1,184 @@
+"""
+HTTP响应优化 - SSE服务器的响应压缩（gzip/zstd协商）与条件请求（ETag / Last-Modified）
+"""
+
+import gzip
+import hashlib
+import logging
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, List, Optional, Tuple
+
+from .image_cache import etag_matches
+
+logger = logging.getLogger(__name__)
+
+# 不压缩的响应类型：SSE需要逐条推送，图片本身已压缩
+UNCOMPRESSED_CONTENT_TYPES = ("text/event-stream", "image/")
+
+# 支持的压缩编码（按优先级排列，zstd需要安装 zstandard）
+COMPRESSION_ENCODINGS = ("zstd", "gzip")
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+_zstd_compressor: Any = None
+
+
+def _zstd_available() -> bool:
+    global _zstd_compressor
+    if _zstd_compressor is None:
+        try:
+            import zstandard
+        except ImportError:
+            logger.debug("未安装 zstandard，响应压缩仅使用gzip（pip install -e \".[compression]\"）")
+            _zstd_compressor = False
+        else:
+            _zstd_compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+    return _zstd_compressor is not False
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """按 Accept-Encoding（含q值）选择压缩编码，客户端不接受压缩时返回None"""
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    for encoding in COMPRESSION_ENCODINGS:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality <= 0:
+            continue
+        if encoding == "zstd" and not _zstd_available():
+            continue
+        return encoding
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "zstd" and _zstd_available():
+        return _zstd_compressor.compress(body)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+class CompressionMiddleware:
+    """ASGI中间件：客户端支持时，对超过 min_size 字节的响应进行 zstd/gzip 压缩
+
+    响应体会先缓存再压缩，SSE长连接和图片等响应直接透传。
+    """
+
+    def __init__(self, app: Any, min_size: int = 1024):
+        self.app = app
+        self.min_size = min_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers", []))
+        encoding = negotiate_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        state = {"start": None, "passthrough": False}
+        chunks: List[bytes] = []
+
+        async def send_compressed(message):
+            if message["type"] == "http.response.start":
+                if _should_skip(message):
+                    state["passthrough"] = True
+                    await send(message)
+                else:
+                    state["start"] = message
+                return
+            if message["type"] != "http.response.body" or state["passthrough"]:
+                await send(message)
+                return
+
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            body = b"".join(chunks)
+            start = state["start"]
+            response_headers = [
+                (key, value) for key, value in start["headers"]
+                if key.lower() not in (b"content-length", b"vary")
+            ]
+            vary = [value for key, value in start["headers"] if key.lower() == b"vary"]
+            response_headers.append((b"vary", b", ".join(vary + [b"Accept-Encoding"])))
+            if len(body) >= self.min_size:
+                body = compress(body, encoding)
+                response_headers.append((b"content-encoding", encoding.encode("latin-1")))
+                response_headers = [
+                    (key, _weaken_etag(value) if key.lower() == b"etag" else value)
+                    for key, value in response_headers
+                ]
+            response_headers.append((b"content-length", str(len(body)).encode("latin-1")))
+            await send({**start, "headers": response_headers})
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
+
+
+def _should_skip(start: Any) -> bool:
+    """已编码、无响应体或不适合压缩的响应"""
+    if start["status"] in (204, 304) or start["status"] < 200:
+        return True
+    for key, value in start.get("headers", []):
+        key = key.lower()
+        if key == b"content-encoding":
+            return True
+        if key == b"content-type" and value.decode("latin-1").startswith(UNCOMPRESSED_CONTENT_TYPES):
+            return True
+    return False
+
+
+def _weaken_etag(value: bytes) -> bytes:
+    """压缩后的表示与原始字节不同，强ETag改为弱ETag（条件请求仍按弱比较命中）"""
+    return value if value.startswith(b"W/") else b"W/" + value
+
+
+def content_etag(body: bytes) -> str:
+    """响应内容的ETag（不含引号）"""
+    return hashlib.sha256(body).hexdigest()[:20]
+
+
+def parse_item_time(value: Optional[str]) -> Optional[datetime]:
+    """解析商品时间字段（mercapi返回本地时区的无时区时间），转换为UTC"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    return parsed.astimezone(timezone.utc)
+
+
+def item_validators(item_id: str, updated_time: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """由商品的更新时间生成 (ETag, Last-Modified)；没有更新时间时返回 (None, None)"""
+    updated = parse_item_time(updated_time)
+    if updated is None:
+        return None, None
+    return f"{item_id}-{int(updated.timestamp())}", format_datetime(updated, usegmt=True)
+
+
+def not_modified(if_none_match: Optional[str], if_modified_since: Optional[str],
+                 etag: str, last_modified: Optional[str]) -> bool:
+    """条件请求是否命中（有 If-None-Match 时忽略 If-Modified-Since）"""
+    if if_none_match:
+        return etag_matches(if_none_match, etag)
+    if not if_modified_since or not last_modified:
+        return False
+    try:
+        return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
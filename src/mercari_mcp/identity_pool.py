@@ -0,0 +1,217 @@
+"""
+上游身份池 - 管理多个独立的mercapi实例（各自的签名密钥和HTTP客户端），分摊上游请求
+
+约定：所有上游请求都必须通过 IdentityPool.acquire() 取得的实例直接发起（search / item / profile
+或签名后的原始请求），不能使用mercapi响应模型上的便捷方法（item.seller()、full_item()、
+search_results.next_page() 等）。这些方法使用类级别共享的实例，会绕过身份选择与冷却；
+默认工厂创建实例后会把共享实例替换为占位对象，误用时直接报错。
+"""
+
+import logging
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional
+
+if TYPE_CHECKING:
+    from mercapi import Mercapi
+
+logger = logging.getLogger(__name__)
+
+# 视为被限流的上游响应状态码
+THROTTLE_STATUS_CODES = (403, 429)
+
+# 连续失败达到该次数时冷却该身份
+FAILURE_THRESHOLD = 3
+
+# 延迟的指数移动平均系数
+LATENCY_EMA_ALPHA = 0.2
+
+
+class _PoolOnlyMercapi:
+    """绑定到mercapi响应模型上的占位对象，模型的便捷方法会绕过身份池，调用时直接报错"""
+
+    def __getattr__(self, name: str) -> Any:
+        raise RuntimeError(f"mercapi响应模型的便捷方法会绕过上游身份池，请通过身份池选出的实例调用 {name}()")
+
+
+def default_mercapi_factory() -> "Mercapi":
+    """创建mercapi实例（每个实例生成独立的密钥对和设备UUID）"""
+    from mercapi import Mercapi
+    from mercapi.models.base import ResponseModel
+
+    mercapi = Mercapi()
+    # Mercapi() 会把自己登记为所有响应模型共用的实例（最后创建的实例生效），改为占位对象
+    ResponseModel.set_mercapi(_PoolOnlyMercapi())
+    return mercapi
+
+
+class MercapiIdentity:
+    """身份池中的一个上游身份及其使用统计"""
+
+    def __init__(self, index: int, factory: Callable[[], Any],
+                 cooldown_seconds: float = 60.0, max_cooldown_seconds: float = 600.0):
+        self.index = index
+        self._factory = factory
+        self.cooldown_seconds = cooldown_seconds
+        self.max_cooldown_seconds = max_cooldown_seconds
+        self._mercapi: Optional[Any] = None
+        self.inflight = 0
+        self.requests = 0
+        self.failures = 0
+        self.throttled = 0
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self.cooldown_level = 0
+        self.latency_ms: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    @property
+    def mercapi(self) -> Any:
+        """mercapi实例（首次使用时创建）"""
+        if self._mercapi is None:
+            self._mercapi = self._factory()
+            self._install_response_hook(self._mercapi)
+        return self._mercapi
+
+    def _install_response_hook(self, mercapi: Any) -> None:
+        """在实例的HTTP客户端上登记响应钩子，用于识别限流（mercapi本身不检查状态码）"""
+        hooks = getattr(getattr(mercapi, "_client", None), "event_hooks", None)
+        if isinstance(hooks, dict):
+            hooks.setdefault("response", []).append(self._on_response)
+
+    async def _on_response(self, response: Any) -> None:
+        if response.status_code in THROTTLE_STATUS_CODES:
+            self.mark_throttled(f"HTTP {response.status_code}", _retry_after(response))
+
+    def cooling(self, now: Optional[float] = None) -> bool:
+        return (now if now is not None else time.monotonic()) < self.cooldown_until
+
+    def mark_throttled(self, reason: str, retry_after: Optional[float] = None) -> None:
+        self.throttled += 1
+        self.last_error = reason
+        self._cool_down(reason, retry_after)
+
+    def _cool_down(self, reason: str, retry_after: Optional[float] = None) -> None:
+        # 冷却期间再次出错不重复加倍
+        if self.cooling():
+            return
+        seconds = min(self.cooldown_seconds * (2 ** self.cooldown_level), self.max_cooldown_seconds)
+        seconds = max(seconds, retry_after or 0.0)
+        self.cooldown_level += 1
+        self.cooldown_until = time.monotonic() + seconds
+        logger.warning(f"上游身份 #{self.index} 冷却 {seconds:.0f} 秒: {reason}")
+
+    def record_success(self, elapsed_ms: float) -> None:
+        self.consecutive_failures = 0
+        if not self.cooling():
+            self.cooldown_level = 0
+        self._record_latency(elapsed_ms)
+
+    def record_failure(self, error: BaseException, elapsed_ms: float) -> None:
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.last_error = str(error) or type(error).__name__
+        self._record_latency(elapsed_ms)
+        # 带响应的HTTP错误（如 raise_for_status）：限流状态码立即冷却（响应钩子已处理时跳过）
+        response = getattr(error, "response", None)
+        status_code = getattr(response, "status_code", None)
+        if status_code in THROTTLE_STATUS_CODES:
+            if not self.cooling():
+                self.mark_throttled(f"HTTP {status_code}", _retry_after(response))
+            return
+        if self.consecutive_failures >= FAILURE_THRESHOLD:
+            self._cool_down(f"连续失败 {self.consecutive_failures} 次")
+
+    def _record_latency(self, elapsed_ms: float) -> None:
+        if self.latency_ms is None:
+            self.latency_ms = elapsed_ms
+        else:
+            self.latency_ms += LATENCY_EMA_ALPHA * (elapsed_ms - self.latency_ms)
+
+    def stats(self) -> Dict[str, Any]:
+        remaining = self.cooldown_until - time.monotonic()
+        return {
+            "index": self.index,
+            "created": self._mercapi is not None,
+            "inflight": self.inflight,
+            "requests": self.requests,
+            "failures": self.failures,
+            "throttled": self.throttled,
+            "cooldown_seconds": round(remaining, 1) if remaining > 0 else 0.0,
+            "latency_ms": round(self.latency_ms, 1) if self.latency_ms is not None else None,
+            "last_error": self.last_error,
+        }
+
+
+def _retry_after(response: Any) -> Optional[float]:
+    """读取 Retry-After 响应头（秒数形式）"""
+    value = getattr(response, "headers", {}).get("retry-after")
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+class IdentityPool:
+    """上游身份池
+
+    - 请求分配给进行中请求数最少的身份（相同时选总请求数较少的）
+    - 身份被限流（403/429）或连续失败时进入冷却，冷却时间按次数指数增长
+    - 所有身份都在冷却时，使用最早结束冷却的身份（不阻塞请求）
+
+    factory 用于创建mercapi实例，测试时可以传入假的上游实现。
+    请求只能通过 acquire() 返回的实例发起（见模块说明）。
+    """
+
+    def __init__(
+        self,
+        size: int = 1,
+        factory: Optional[Callable[[], Any]] = None,
+        cooldown_seconds: float = 60.0,
+        max_cooldown_seconds: float = 600.0
+    ):
+        factory = factory or default_mercapi_factory
+        self.identities: List[MercapiIdentity] = [
+            MercapiIdentity(index, factory, cooldown_seconds, max_cooldown_seconds)
+            for index in range(max(size, 1))
+        ]
+        self.forced = 0
+
+    def __len__(self) -> int:
+        return len(self.identities)
+
+    def select(self) -> MercapiIdentity:
+        """选择一个身份"""
+        now = time.monotonic()
+        available = [identity for identity in self.identities if not identity.cooling(now)]
+        if not available:
+            self.forced += 1
+            return min(self.identities, key=lambda identity: identity.cooldown_until)
+        return min(available, key=lambda identity: (identity.inflight, identity.requests))
+
+    @contextmanager
+    def acquire(self) -> Iterator[Any]:
+        """选择一个身份发起请求，返回其mercapi实例，并记录结果"""
+        identity = self.select()
+        mercapi = identity.mercapi
+        identity.inflight += 1
+        identity.requests += 1
+        started = time.perf_counter()
+        try:
+            yield mercapi
+        except Exception as e:
+            identity.record_failure(e, (time.perf_counter() - started) * 1000)
+            raise
+        else:
+            identity.record_success((time.perf_counter() - started) * 1000)
+        finally:
+            identity.inflight -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "size": len(self.identities),
+            "available": sum(1 for identity in self.identities if not identity.cooling(now)),
+            "forced": self.forced,
+            "identities": [identity.stats() for identity in self.identities],
+        }
@@ -0,0 +1,313 @@
+"""
+商品图片缓存 - 磁盘LRU缓存、并发请求合并与可选的缩小尺寸变体
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import re
+from collections import OrderedDict
+from io import BytesIO
+from pathlib import Path
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from .tracing import span
+
+if TYPE_CHECKING:
+    import httpx
+
+logger = logging.getLogger(__name__)
+
+# 可用的缩小宽度（请求的宽度向上取到最近的一档，限制变体数量）
+IMAGE_WIDTHS = (120, 240, 480, 720)
+
+# 单张图片的最大字节数
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+
+# 图片响应的缓存策略
+IMAGE_CACHE_CONTROL = "public, max-age=86400"
+
+_CONTENT_TYPE_EXTENSIONS = {
+    "image/jpeg": "jpg",
+    "image/png": "png",
+    "image/webp": "webp",
+    "image/gif": "gif",
+}
+_EXTENSION_CONTENT_TYPES = {ext: content_type for content_type, ext in _CONTENT_TYPE_EXTENSIONS.items()}
+_PIL_FORMATS = {"image/jpeg": "JPEG", "image/png": "PNG", "image/webp": "WEBP", "image/gif": "GIF"}
+
+_ITEM_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+# 缓存文件名：<商品ID>[_w<宽度>]-<ETag>.<扩展名>
+_FILE_PATTERN = re.compile(r"^(?P<key>[A-Za-z0-9_-]+?(?:_w\d+)?)-(?P<etag>[0-9a-f]{20})\.(?P<ext>[a-z]+)$")
+
+ImageSourceResolver = Callable[[str], Awaitable[Optional[str]]]
+
+
+class ImageNotFoundError(Exception):
+    """商品图片不存在"""
+
+
+class CachedImage(BaseModel):
+    """已缓存的图片"""
+    key: str = Field(..., description="缓存键")
+    path: Path = Field(..., description="缓存文件路径")
+    content_type: str = Field(..., description="MIME类型")
+    etag: str = Field(..., description="内容哈希（ETag）")
+    size: int = Field(..., description="字节数")
+
+
+def is_valid_item_id(item_id: str) -> bool:
+    """商品ID是否可以安全地用作缓存文件名"""
+    return bool(_ITEM_ID_PATTERN.match(item_id or ""))
+
+
+def snap_width(width: Optional[int]) -> Optional[int]:
+    """将请求的宽度取到最近的可用档位，不缩小时返回None"""
+    if not width or width <= 0:
+        return None
+    for candidate in IMAGE_WIDTHS:
+        if width <= candidate:
+            return candidate
+    return IMAGE_WIDTHS[-1]
+
+
+def proxied_image_url(base_url: str, item_id: str, width: Optional[int] = None) -> str:
+    """代理后的商品图片地址"""
+    url = f"{base_url.rstrip('/')}/img/{item_id}"
+    width = snap_width(width)
+    return f"{url}?w={width}" if width else url
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """判断 If-None-Match 请求头是否命中当前ETag"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == f'"{etag}"':
+            return True
+    return False
+
+
+class ThumbnailSources:
+    """商品ID到原始缩略图地址的有界映射（输出代理地址时登记）"""
+
+    def __init__(self, max_items: int = 10000):
+        self.max_items = max_items
+        self._urls: "OrderedDict[str, str]" = OrderedDict()
+
+    def remember(self, item_id: str, url: str) -> None:
+        if not url:
+            return
+        self._urls[item_id] = url
+        self._urls.move_to_end(item_id)
+        while len(self._urls) > self.max_items:
+            self._urls.popitem(last=False)
+
+    def get(self, item_id: str) -> Optional[str]:
+        return self._urls.get(item_id)
+
+
+class ImageCache:
+    """磁盘LRU图片缓存
+
+    - 缓存文件按最近访问顺序维护在内存中，总大小超过上限时淘汰最久未访问的文件
+    - 同一图片的并发请求合并为一次上游下载
+    - 请求缩小尺寸时基于原图生成变体（需要安装Pillow，未安装时返回原图）
+    """
+
+    def __init__(self, cache_dir: Path, resolve_source: ImageSourceResolver,
+                 max_bytes: int = 256 * 1024 * 1024, timeout: float = 10.0):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self._resolve_source = resolve_source
+        self._entries: "OrderedDict[str, CachedImage]" = OrderedDict()
+        self._total_bytes = 0
+        self._inflight: Dict[str, "asyncio.Future[CachedImage]"] = {}
+        self._loaded = False
+        self._http_client: Optional["httpx.AsyncClient"] = None
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def _ensure_loaded(self) -> None:
+        """首次使用时扫描缓存目录（按修改时间恢复LRU顺序）"""
+        if self._loaded:
+            return
+        self._loaded = True
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        found = []
+        for path in self.cache_dir.iterdir():
+            match = _FILE_PATTERN.match(path.name)
+            if not match or match.group("ext") not in _EXTENSION_CONTENT_TYPES:
+                continue
+            stat = path.stat()
+            found.append((stat.st_mtime, CachedImage(
+                key=match.group("key"),
+                path=path,
+                content_type=_EXTENSION_CONTENT_TYPES[match.group("ext")],
+                etag=match.group("etag"),
+                size=stat.st_size
+            )))
+        for _, entry in sorted(found, key=lambda pair: pair[0]):
+            self._add_entry(entry)
+        self._evict()
+        logger.info(f"图片缓存已加载: {len(self._entries)} 个文件, {self._total_bytes} 字节")
+
+    def stats(self) -> Dict[str, int]:
+        """缓存统计"""
+        return {
+            "files": len(self._entries),
+            "bytes": self._total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+        }
+
+    async def get(self, item_id: str, width: Optional[int] = None) -> CachedImage:
+        """获取商品图片（width为缩小后的宽度）"""
+        if not is_valid_item_id(item_id):
+            raise ImageNotFoundError(f"无效的商品ID: {item_id}")
+        self._ensure_loaded()
+        width = snap_width(width)
+        key = f"{item_id}_w{width}" if width else item_id
+
+        with span("image_cache.get", {"item.id": item_id, "image.width": width}) as current:
+            entry = self._entries.get(key)
+            if entry is not None and entry.path.exists():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                current.set_attribute("cache.hit", True)
+                return entry
+
+            current.set_attribute("cache.hit", False)
+            future = self._inflight.get(key)
+            if future is None:
+                self.misses += 1
+                future = asyncio.ensure_future(self._load(item_id, width, key))
+                self._inflight[key] = future
+                future.add_done_callback(lambda _: self._inflight.pop(key, None))
+            else:
+                self.coalesced += 1
+                current.set_attribute("cache.coalesced", True)
+            # shield：一个请求被取消时不影响其他等待同一图片的请求
+            return await asyncio.shield(future)
+
+    async def _load(self, item_id: str, width: Optional[int], key: str) -> CachedImage:
+        """下载原图或生成缩小变体并写入缓存"""
+        if width is None:
+            data, content_type = await self._download(item_id)
+        else:
+            original = await self.get(item_id)
+            loop = asyncio.get_running_loop()
+            data, content_type = await loop.run_in_executor(None, _resize, original.path, original.content_type, width)
+        return await self._store(key, data, content_type)
+
+    async def _download(self, item_id: str) -> Tuple[bytes, str]:
+        """从上游下载商品原图"""
+        url = await self._resolve_source(item_id)
+        if not url:
+            raise ImageNotFoundError(f"找不到商品图片: {item_id}")
+
+        if self._http_client is None:
+            import httpx
+
+            self._http_client = httpx.AsyncClient(timeout=self.timeout, follow_redirects=True)
+        # 流式读取响应体，超过 MAX_IMAGE_BYTES 时立即中止，不把超大响应整体读入内存
+        async with self._http_client.stream("GET", url) as response:
+            if response.status_code == 404:
+                raise ImageNotFoundError(f"商品图片不存在: {item_id}")
+            response.raise_for_status()
+
+            content_type = response.headers.get("content-type", "").split(";")[0].strip().lower()
+            if content_type not in _CONTENT_TYPE_EXTENSIONS:
+                raise Exception(f"不支持的图片类型: {content_type or '未知'}")
+            content_length = response.headers.get("content-length", "")
+            if content_length.isdigit() and int(content_length) > MAX_IMAGE_BYTES:
+                raise Exception(f"图片过大: {content_length} 字节")
+
+            chunks = []
+            received = 0
+            async for chunk in response.aiter_bytes():
+                received += len(chunk)
+                if received > MAX_IMAGE_BYTES:
+                    raise Exception(f"图片过大: 超过 {MAX_IMAGE_BYTES} 字节")
+                chunks.append(chunk)
+        return b"".join(chunks), content_type
+
+    async def _store(self, key: str, data: bytes, content_type: str) -> CachedImage:
+        """原子地写入缓存文件并登记"""
+        etag = hashlib.sha1(data).hexdigest()[:20]
+        path = self.cache_dir / f"{key}-{etag}.{_CONTENT_TYPE_EXTENSIONS[content_type]}"
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, _write_file, path, data)
+
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._total_bytes -= previous.size
+            if previous.path != path:
+                _unlink(previous.path)
+        entry = CachedImage(key=key, path=path, content_type=content_type, etag=etag, size=len(data))
+        self._add_entry(entry)
+        self._evict()
+        return entry
+
+    def _add_entry(self, entry: CachedImage) -> None:
+        self._entries[entry.key] = entry
+        self._total_bytes += entry.size
+
+    def _evict(self) -> None:
+        """淘汰最久未访问的文件，直到总大小不超过上限（至少保留最新的一个）"""
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            self._total_bytes -= entry.size
+            _unlink(entry.path)
+
+    async def close(self) -> None:
+        """关闭HTTP客户端"""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+
+
+def _write_file(path: Path, data: bytes) -> None:
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+def _unlink(path: Path) -> None:
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def _resize(path: Path, content_type: str, width: int) -> Tuple[bytes, str]:
+    """按宽度等比缩小图片（在线程池中执行），未安装Pillow或原图不大于目标宽度时返回原图"""
+    data = path.read_bytes()
+    try:
+        from PIL import Image
+    except ImportError:
+        logger.warning("未安装Pillow，返回原图: pip install -e \".[images]\"")
+        return data, content_type
+
+    with Image.open(BytesIO(data)) as image:
+        if image.width <= width:
+            return data, content_type
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.Resampling.LANCZOS)
+        if content_type == "image/jpeg" and resized.mode not in ("RGB", "L"):
+            resized = resized.convert("RGB")
+        output = BytesIO()
+        options = {"quality": 85} if content_type in ("image/jpeg", "image/webp") else {}
+        resized.save(output, format=_PIL_FORMATS[content_type], **options)
+        return output.getvalue(), content_type
@@ -0,0 +1,271 @@
+"""
+后台任务 - 耗时较长的工具调用以任务方式在有界的工作队列中执行，结果按请求指纹缓存与去重
+"""
+
+import asyncio
+import contextvars
+import hashlib
+import itertools
+import json
+import logging
+import secrets
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 任务优先级（数值越小越先执行）
+JOB_PRIORITIES = {
+    "high": 0,
+    "normal": 1,
+    "low": 2,
+}
+
+# 任务状态
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+JOB_ACTIVE_STATES = (JOB_QUEUED, JOB_RUNNING)
+
+JobRunner = Callable[[], Awaitable[Any]]
+
+
+class JobNotFoundError(Exception):
+    """任务不存在或结果已过期"""
+
+
+class JobRejectedError(Exception):
+    """任务队列已满或超出会话配额"""
+
+
+def request_fingerprint(tool: str, arguments: Dict[str, Any]) -> str:
+    """工具名与参数的指纹（参数顺序不影响结果）"""
+    payload = json.dumps([tool, arguments], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class Job:
+    """一个后台任务"""
+
+    def __init__(self, job_id: str, tool: str, arguments: Dict[str, Any], fingerprint: str,
+                 runner: JobRunner, session_key: Optional[str], priority: int,
+                 context: contextvars.Context):
+        self.job_id = job_id
+        self.tool = tool
+        self.arguments = arguments
+        self.fingerprint = fingerprint
+        self.runner: Optional[JobRunner] = runner
+        # 提交时的上下文（追踪span、MCP请求上下文），任务在其中执行
+        self.context: Optional[contextvars.Context] = context
+        self.session_key = session_key
+        # 可以读取结果的会话：提交者和附加到本任务的会话
+        self.sessions: Set[Optional[str]] = {session_key}
+        self.priority = priority
+        self.status = JOB_QUEUED
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created = time.monotonic()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        # 重复提交并附加到本任务的次数
+        self.attached = 0
+        self._task: Optional["asyncio.Task[Any]"] = None
+        self._done: Optional[asyncio.Event] = None
+
+    @property
+    def done_event(self) -> asyncio.Event:
+        if self._done is None:
+            self._done = asyncio.Event()
+        return self._done
+
+    @property
+    def active(self) -> bool:
+        return self.status in JOB_ACTIVE_STATES
+
+    def finish(self, status: str, result: Any = None, error: Optional[str] = None) -> None:
+        self.status = status
+        self.result = result
+        self.error = error
+        self.finished = time.monotonic()
+        self.runner = None  # 释放闭包中的参数和客户端引用
+        self.context = None
+        self.done_event.set()
+
+    def elapsed_seconds(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+
+class JobManager:
+    """后台任务管理
+
+    - 固定数量的工作者按优先级从队列中取任务执行，队列长度有上限
+    - 每个会话同时进行中的任务数有上限
+    - 相同请求（工具名和参数相同）在进行中或结果未过期时直接返回已有任务
+    - 完成的任务结果保留 result_ttl 秒
+    """
+
+    def __init__(self, workers: int = 2, max_queue: int = 50,
+                 per_session_limit: int = 5, result_ttl: float = 1800.0):
+        self.workers = max(workers, 1)
+        self.max_queue = max_queue
+        self.per_session_limit = per_session_limit
+        self.result_ttl = result_ttl
+        self._jobs: Dict[str, Job] = {}
+        self._by_fingerprint: Dict[str, str] = {}
+        self._queue: Optional["asyncio.PriorityQueue[Tuple[int, int, Job]]"] = None
+        self._worker_tasks: List["asyncio.Task[None]"] = []
+        self._sequence = itertools.count()
+        # 已取消但仍留在队列中（尚未被工作者取出）的任务数，不占用队列容量
+        self._cancelled_queued = 0
+        self.submitted = 0
+        self.deduplicated = 0
+        self.rejected = 0
+
+    def submit(self, tool: str, arguments: Dict[str, Any], runner: JobRunner,
+               session_key: Optional[str] = None, priority: str = "normal") -> Tuple[Job, bool]:
+        """提交任务，返回 (任务, 是否附加到了已有任务)"""
+        self._sweep()
+        fingerprint = request_fingerprint(tool, arguments)
+        existing = self._jobs.get(self._by_fingerprint.get(fingerprint, ""))
+        if existing is not None and existing.status not in (JOB_FAILED, JOB_CANCELLED):
+            existing.attached += 1
+            existing.sessions.add(session_key)
+            self.deduplicated += 1
+            return existing, True
+
+        if self.per_session_limit and session_key is not None:
+            active = sum(1 for job in self._jobs.values() if job.active and job.session_key == session_key)
+            if active >= self.per_session_limit:
+                self.rejected += 1
+                raise JobRejectedError(f"当前会话进行中的任务已达上限（{self.per_session_limit} 个），请稍后再试")
+        queue = self._ensure_workers()
+        if self._queued_count() >= self.max_queue:
+            self.rejected += 1
+            raise JobRejectedError(f"任务队列已满（{self.max_queue} 个），请稍后再试")
+
+        job = Job(
+            secrets.token_urlsafe(9), tool, arguments, fingerprint, runner,
+            session_key, JOB_PRIORITIES.get(priority, JOB_PRIORITIES["normal"]),
+            contextvars.copy_context()
+        )
+        self._jobs[job.job_id] = job
+        self._by_fingerprint[fingerprint] = job.job_id
+        queue.put_nowait((job.priority, next(self._sequence), job))
+        self.submitted += 1
+        logger.info(f"提交后台任务: {job.job_id} ({tool})")
+        return job, False
+
+    def get(self, job_id: str, session_key: Optional[str]) -> Job:
+        """按ID获取任务（其他会话的任务视为不存在）"""
+        self._sweep()
+        job = self._jobs.get(job_id or "")
+        if job is None or session_key not in job.sessions:
+            raise JobNotFoundError(f"任务 {job_id} 不存在或结果已过期")
+        return job
+
+    async def wait(self, job_id: str, session_key: Optional[str], timeout: float) -> Job:
+        """等待任务完成，最多等待 timeout 秒（超时返回进行中的任务）"""
+        job = self.get(job_id, session_key)
+        if job.active and timeout > 0:
+            try:
+                await asyncio.wait_for(job.done_event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return job
+
+    def cancel(self, job_id: str, session_key: Optional[str]) -> Job:
+        """取消任务（排队中的任务不再执行，执行中的任务被中断）
+
+        附加到任务的会话可以读取结果，但只有提交任务的会话可以取消。
+        """
+        job = self.get(job_id, session_key)
+        if job.session_key != session_key:
+            raise JobRejectedError(f"任务 {job_id} 由其他会话提交，不能取消")
+        if job.status == JOB_QUEUED:
+            job.finish(JOB_CANCELLED)
+            self._cancelled_queued += 1
+        elif job.status == JOB_RUNNING and job._task is not None:
+            job._task.cancel()
+        return job
+
+    def _ensure_workers(self) -> "asyncio.PriorityQueue[Tuple[int, int, Job]]":
+        """首次提交时创建队列并启动工作者（需在事件循环中调用）"""
+        if self._queue is None:
+            self._queue = asyncio.PriorityQueue()
+        self._worker_tasks = [task for task in self._worker_tasks if not task.done()]
+        while len(self._worker_tasks) < self.workers:
+            self._worker_tasks.append(asyncio.ensure_future(self._worker()))
+        return self._queue
+
+    def _queued_count(self) -> int:
+        """队列中等待执行的任务数（不含已取消的任务）"""
+        if self._queue is None:
+            return 0
+        return self._queue.qsize() - self._cancelled_queued
+
+    async def _worker(self) -> None:
+        assert self._queue is not None
+        while True:
+            _, _, job = await self._queue.get()
+            try:
+                if job.status == JOB_QUEUED:
+                    await self._run(job)
+                else:
+                    self._cancelled_queued -= 1
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Job) -> None:
+        job.status = JOB_RUNNING
+        job.started = time.monotonic()
+        assert job.runner is not None and job.context is not None
+        # 工作者在首次提交时创建，继承的是第一个提交者的上下文；任务需在自己提交时的上下文中执行
+        task = job.context.run(asyncio.ensure_future, job.runner())
+        job._task = task
+        try:
+            # 使用wait而不直接await，区分任务被取消（cancel_job）与工作者本身被取消
+            await asyncio.wait([task])
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        finally:
+            job._task = None
+
+        if task.cancelled():
+            job.finish(JOB_CANCELLED)
+            logger.info(f"后台任务已取消: {job.job_id}")
+        elif task.exception() is not None:
+            job.finish(JOB_FAILED, error=str(task.exception()))
+            logger.warning(f"后台任务失败: {job.job_id}, {task.exception()}")
+        else:
+            job.finish(JOB_DONE, result=task.result())
+            logger.info(f"后台任务完成: {job.job_id} ({job.elapsed_seconds():.1f}s)")
+
+    def _sweep(self) -> None:
+        """清理结果已过期的任务"""
+        deadline = time.monotonic() - self.result_ttl
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if not job.active and job.finished is not None and job.finished < deadline
+        ]
+        for job_id in expired:
+            job = self._jobs.pop(job_id)
+            if self._by_fingerprint.get(job.fingerprint) == job_id:
+                del self._by_fingerprint[job.fingerprint]
+
+    def stats(self) -> Dict[str, Any]:
+        counts: Dict[str, int] = {}
+        for job in self._jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {
+            "workers": self.workers,
+            "queued": self._queued_count(),
+            "jobs": counts,
+            "submitted": self.submitted,
+            "deduplicated": self.deduplicated,
+            "rejected": self.rejected,
+        }
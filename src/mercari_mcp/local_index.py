@@ -0,0 +1,230 @@
+"""
+本地商品索引 - 保存解析过的商品，支持离线全文检索与价格区间查询
+"""
+
+import bisect
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from pydantic import BaseModel, Field
+
+from .mercapi_client import MercariItem
+from .text_utils import char_ngrams, normalize_text
+
+logger = logging.getLogger(__name__)
+
+# 新数据缺失时沿用旧数据的字段（搜索结果中没有这些信息，详情中有）
+_MERGE_FIELDS = ("description", "brand_name", "category_name", "seller_rating")
+
+
+class LocalIndexHit(BaseModel):
+    """本地索引命中结果"""
+    item: MercariItem = Field(..., description="商品数据")
+    indexed_at: float = Field(..., description="写入索引的时间戳")
+    age_seconds: float = Field(..., description="数据距今的秒数")
+
+
+class LocalIndexResult(BaseModel):
+    """本地索引查询结果"""
+    total_count: int = Field(..., description="匹配的商品数量")
+    items: List[LocalIndexHit] = Field(..., description="商品列表")
+    index_size: int = Field(..., description="索引中的商品总数")
+
+
+def format_age(seconds: float) -> str:
+    """将数据年龄格式化为易读文本"""
+    if seconds < 60:
+        return "刚刚"
+    if seconds < 3600:
+        return f"{int(seconds // 60)}分钟前"
+    if seconds < 86400:
+        return f"{int(seconds // 3600)}小时前"
+    return f"{int(seconds // 86400)}天前"
+
+
+class LocalListingIndex:
+    """本地商品索引（内存）
+
+    - 名称与描述建立字符n-gram倒排索引，适配日文等无空格文本
+    - 价格与创建时间维护有序列表，区间查询使用二分查找
+    - 超过容量时按写入顺序淘汰最旧的商品
+    """
+
+    def __init__(self, ngram_size: int = 2, max_items: int = 100000):
+        self.ngram_size = ngram_size
+        self.max_items = max_items
+        self._items: "OrderedDict[str, MercariItem]" = OrderedDict()
+        self._indexed_at: Dict[str, float] = {}
+        self._texts: Dict[str, str] = {}
+        self._postings: Dict[str, Set[str]] = {}
+        self._by_price: List[Tuple[int, str]] = []
+        self._by_created: List[Tuple[str, str]] = []
+        self._by_category: Dict[int, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def add(self, item: MercariItem) -> None:
+        """写入（或更新）一个商品"""
+        previous = self._items.get(item.id)
+        if previous is not None:
+            updates = {
+                field: getattr(previous, field)
+                for field in _MERGE_FIELDS
+                if getattr(item, field) is None and getattr(previous, field) is not None
+            }
+            if updates:
+                item = item.model_copy(update=updates)
+            self._remove(item.id)
+
+        self._items[item.id] = item
+        self._indexed_at[item.id] = time.time()
+
+        text = normalize_text(item.name) + "\n" + normalize_text(item.description)
+        self._texts[item.id] = text
+        for gram in char_ngrams(text, self.ngram_size):
+            self._postings.setdefault(gram, set()).add(item.id)
+
+        bisect.insort(self._by_price, (item.price, item.id))
+        if item.created_time:
+            bisect.insort(self._by_created, (item.created_time, item.id))
+        if item.category_id is not None:
+            self._by_category.setdefault(item.category_id, set()).add(item.id)
+
+        while len(self._items) > self.max_items:
+            oldest_id = next(iter(self._items))
+            self._remove(oldest_id)
+
+    def add_many(self, items: Iterable[MercariItem]) -> None:
+        """批量写入商品"""
+        for item in items:
+            self.add(item)
+
+    def _remove(self, item_id: str) -> None:
+        """从所有索引结构中移除商品"""
+        item = self._items.pop(item_id, None)
+        if item is None:
+            return
+        self._indexed_at.pop(item_id, None)
+
+        text = self._texts.pop(item_id, "")
+        for gram in char_ngrams(text, self.ngram_size):
+            postings = self._postings.get(gram)
+            if postings is not None:
+                postings.discard(item_id)
+                if not postings:
+                    del self._postings[gram]
+
+        self._remove_sorted(self._by_price, (item.price, item_id))
+        if item.created_time:
+            self._remove_sorted(self._by_created, (item.created_time, item_id))
+        if item.category_id is not None:
+            members = self._by_category.get(item.category_id)
+            if members is not None:
+                members.discard(item_id)
+                if not members:
+                    del self._by_category[item.category_id]
+
+    @staticmethod
+    def _remove_sorted(entries: list, entry: tuple) -> None:
+        """从有序列表中删除指定条目"""
+        pos = bisect.bisect_left(entries, entry)
+        if pos < len(entries) and entries[pos] == entry:
+            del entries[pos]
+
+    def _match_keyword(self, keyword: str) -> Set[str]:
+        """全文检索：n-gram倒排求交集后再做子串校验"""
+        query = normalize_text(keyword)
+        if not query:
+            return set(self._items)
+
+        grams = char_ngrams(query, self.ngram_size)
+        if len(query) < self.ngram_size:
+            candidates = set(self._items)
+        else:
+            postings = sorted(
+                (self._postings.get(gram, set()) for gram in grams), key=len
+            )
+            candidates = set(postings[0])
+            for other in postings[1:]:
+                candidates &= other
+                if not candidates:
+                    break
+
+        return {item_id for item_id in candidates if query in self._texts[item_id]}
+
+    def _price_range_ids(self, price_min: Optional[int], price_max: Optional[int]) -> List[str]:
+        """价格区间查询（按价格升序）"""
+        lo, hi = self._price_bounds(price_min, price_max)
+        return [item_id for _, item_id in self._by_price[lo:hi]]
+
+    def _price_bounds(self, price_min: Optional[int], price_max: Optional[int]) -> Tuple[int, int]:
+        """计算价格区间在有序列表中的下标范围"""
+        lo = 0
+        hi = len(self._by_price)
+        if price_min is not None:
+            lo = bisect.bisect_left(self._by_price, (price_min, ""))
+        if price_max is not None:
+            hi = bisect.bisect_left(self._by_price, (price_max + 1, ""))
+        return lo, hi
+
+    def search(
+        self,
+        keyword: Optional[str] = None,
+        category_id: Optional[int] = None,
+        price_min: Optional[int] = None,
+        price_max: Optional[int] = None,
+        sort: str = "created_time",
+        order: str = "desc",
+        limit: int = 20
+    ) -> LocalIndexResult:
+        """查询本地索引，不发起任何上游请求"""
+        candidates: Optional[Set[str]] = None
+        if keyword:
+            candidates = self._match_keyword(keyword)
+        if category_id is not None:
+            members = self._by_category.get(int(category_id), set())
+            candidates = set(members) if candidates is None else candidates & members
+
+        if candidates is not None:
+            # 候选集较小，直接过滤后排序
+            matched = [
+                self._items[item_id] for item_id in candidates
+                if (price_min is None or self._items[item_id].price >= price_min)
+                and (price_max is None or self._items[item_id].price <= price_max)
+            ]
+            if sort == "price":
+                matched.sort(key=lambda item: (item.price, item.id), reverse=(order == "desc"))
+            else:
+                matched.sort(key=lambda item: (item.created_time or "", item.id), reverse=(order == "desc"))
+            matched_ids = [item.id for item in matched]
+        elif sort == "price":
+            # 无关键词/分类条件时，直接遍历价格有序列表
+            matched_ids = self._price_range_ids(price_min, price_max)
+            if order == "desc":
+                matched_ids.reverse()
+        else:
+            # 按创建时间有序列表遍历，无创建时间的商品排在最后
+            in_range = set(self._price_range_ids(price_min, price_max))
+            matched_ids = [item_id for _, item_id in self._by_created if item_id in in_range]
+            if order == "desc":
+                matched_ids.reverse()
+            with_created = set(matched_ids)
+            matched_ids.extend(item_id for item_id in in_range if item_id not in with_created)
+
+        now = time.time()
+        hits = [
+            LocalIndexHit(
+                item=self._items[item_id],
+                indexed_at=self._indexed_at[item_id],
+                age_seconds=now - self._indexed_at[item_id]
+            )
+            for item_id in matched_ids[:limit]
+        ]
+        return LocalIndexResult(
+            total_count=len(matched_ids),
+            items=hits,
+            index_size=len(self._items)
+        )
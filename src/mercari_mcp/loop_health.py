@@ -0,0 +1,175 @@
+"""
+事件循环健康 - 循环延迟监控，以及将大批量CPU密集工作移出事件循环
+"""
+
+import asyncio
+import contextvars
+import functools
+import logging
+import multiprocessing
+import statistics
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Optional, TypeVar
+
+from .config import env_flag, env_float, env_int, env_str
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# 卸载方式：off 在事件循环中直接执行；thread 使用线程池；process 使用进程池（仅用于可序列化的纯函数）
+OFFLOAD_MODES = ("off", "thread", "process")
+
+# 循环延迟统计保留的最近样本数
+LAG_WINDOW = 120
+
+
+class LoopLagMonitor:
+    """事件循环延迟监控：定时休眠并测量实际唤醒比预期晚了多久"""
+
+    def __init__(self, interval: float = 0.5, warn_ms: float = 250.0):
+        self.interval = interval
+        self.warn_ms = warn_ms
+        self.max_ms = 0.0
+        self.samples = 0
+        self.slow_count = 0
+        self._recent: Deque[float] = deque(maxlen=LAG_WINDOW)
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    def start(self) -> None:
+        """开始监控（需在事件循环中调用）"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.record(max(loop.time() - expected, 0.0) * 1000)
+
+    def record(self, lag_ms: float) -> None:
+        self.samples += 1
+        self.max_ms = max(self.max_ms, lag_ms)
+        self._recent.append(lag_ms)
+        if lag_ms >= self.warn_ms:
+            self.slow_count += 1
+            logger.warning(f"事件循环阻塞: 延迟 {lag_ms:.0f}ms")
+
+    def stats(self) -> Dict[str, Any]:
+        """循环延迟统计（最近样本的平均值/p99，以及启动以来的最大值）"""
+        recent = sorted(self._recent)
+        return {
+            "last_ms": round(self._recent[-1], 1) if recent else 0.0,
+            "avg_ms": round(statistics.mean(recent), 1) if recent else 0.0,
+            "p99_ms": round(recent[min(int(len(recent) * 0.99), len(recent) - 1)], 1) if recent else 0.0,
+            "max_ms": round(self.max_ms, 1),
+            "samples": self.samples,
+            "slow_count": self.slow_count,
+        }
+
+
+class Offloader:
+    """按数据规模决定在事件循环中直接执行，还是移到线程池/进程池执行"""
+
+    def __init__(self, mode: str = "thread", threshold: int = 200, max_workers: Optional[int] = None):
+        if mode not in OFFLOAD_MODES:
+            logger.warning(f"未知的卸载方式: {mode}，改为 thread")
+            mode = "thread"
+        self.mode = mode
+        self.threshold = threshold
+        self.max_workers = max_workers
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self.inline_count = 0
+        self.thread_count = 0
+        self.process_count = 0
+
+    def _executor(self, process_safe: bool) -> Executor:
+        if self.mode == "process" and process_safe:
+            if self._process_pool is None:
+                # spawn：子进程不继承事件循环和线程状态
+                self._process_pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            self.process_count += 1
+            return self._process_pool
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="mercari-mcp-offload")
+        self.thread_count += 1
+        return self._thread_pool
+
+    async def run(self, func: Callable[..., T], *args: Any, size: int, process_safe: bool = True) -> T:
+        """执行 func(*args)；size 达到阈值时移出事件循环
+
+        process_safe=False 表示参数或函数不能跨进程传递（如绑定到本进程状态的方法），只会使用线程池。
+        """
+        if self.mode == "off" or size < self.threshold:
+            self.inline_count += 1
+            return func(*args)
+        executor = self._executor(process_safe)
+        loop = asyncio.get_running_loop()
+        call = functools.partial(func, *args)
+        if isinstance(executor, ThreadPoolExecutor):
+            # 线程中沿用当前上下文（追踪span、慢调用记录）
+            return await loop.run_in_executor(executor, contextvars.copy_context().run, call)
+        return await loop.run_in_executor(executor, call)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "threshold": self.threshold,
+            "inline": self.inline_count,
+            "thread": self.thread_count,
+            "process": self.process_count,
+        }
+
+    def shutdown(self) -> None:
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown(wait=False)
+            self._thread_pool = None
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False)
+            self._process_pool = None
+
+
+offloader = Offloader()
+loop_monitor: Optional[LoopLagMonitor] = None
+
+
+async def offload(func: Callable[..., T], *args: Any, size: int, process_safe: bool = True) -> T:
+    """使用全局卸载配置执行 func(*args)"""
+    return await offloader.run(func, *args, size=size, process_safe=process_safe)
+
+
+def loop_health_stats() -> Dict[str, Any]:
+    """事件循环延迟与卸载统计"""
+    return {
+        "loop_lag": loop_monitor.stats() if loop_monitor is not None else None,
+        "offload": offloader.stats(),
+    }
+
+
+def configure_loop_health_from_env() -> None:
+    """按环境变量配置卸载方式并启动循环延迟监控（需在事件循环中调用）"""
+    global offloader, loop_monitor
+    offloader.shutdown()
+    offloader = Offloader(
+        mode=env_str("MERCARI_MCP_OFFLOAD", "thread"),
+        threshold=env_int("MERCARI_MCP_OFFLOAD_THRESHOLD", 200),
+        max_workers=env_int("MERCARI_MCP_OFFLOAD_WORKERS", 0) or None
+    )
+    if env_flag("MERCARI_MCP_LOOP_MONITOR", True) and loop_monitor is None:
+        loop_monitor = LoopLagMonitor(
+            interval=env_float("MERCARI_MCP_LOOP_MONITOR_INTERVAL", 0.5),
+            warn_ms=env_float("MERCARI_MCP_LOOP_LAG_WARN_MS", 250.0)
+        )
+        loop_monitor.start()
+        logger.info(f"事件循环监控已启用（告警阈值 {loop_monitor.warn_ms:.0f}ms），卸载方式: {offloader.mode}")
@@ -0,0 +1,44 @@
+"""
+主数据缓存 - 分类树、品牌词典等上游主数据的磁盘缓存
+"""
+
+import json
+import logging
+import time
+from pathlib import Path
+from typing import List, Optional, Type, TypeVar
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+# 主数据磁盘缓存的有效期（秒）
+MASTER_DATA_CACHE_TTL = 7 * 24 * 3600
+
+M = TypeVar("M", bound=BaseModel)
+
+
+def load_cached_models(cache_path: Path, model: Type[M], ttl: float = MASTER_DATA_CACHE_TTL) -> Optional[List[M]]:
+    """读取磁盘缓存的主数据（不存在或过期返回None）"""
+    try:
+        if not cache_path.exists() or time.time() - cache_path.stat().st_mtime > ttl:
+            return None
+        raw = json.loads(cache_path.read_text(encoding="utf-8"))
+        return [model(**entry) for entry in raw]
+    except Exception as e:
+        logger.warning(f"读取主数据缓存失败: {cache_path}, {e}")
+        return None
+
+
+def save_cached_models(cache_path: Path, models: List[BaseModel]) -> None:
+    """将主数据写入磁盘缓存"""
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_name(cache_path.name + ".tmp")
+        tmp_path.write_text(
+            json.dumps([entry.model_dump() for entry in models], ensure_ascii=False),
+            encoding="utf-8"
+        )
+        tmp_path.replace(cache_path)
+    except Exception as e:
+        logger.warning(f"写入主数据缓存失败: {cache_path}, {e}")
@@ -4,12 +4,75 @@ Mercapi客户端包装器 - 使用mercapi库进行Mercari API调用
 
 import asyncio
 import logging
-from typing import Any, Dict, List, Optional
-from mercapi import Mercapi
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Set, Tuple, Type
 from pydantic import BaseModel, Field
 
+from .brands import BrandEntry, BrandIndex, parse_brand_entries
+from .categories import CategoryIndex, CategoryNode, flatten_category_tree
+from .dedupe import collapse_duplicates as collapse_duplicates_items
+from .loop_health import offload
+from .master_data import load_cached_models, save_cached_models
+from .ranking import DEFAULT_RANKING_WEIGHTS, rank_items
+from .sellers import SELLER_ITEM_STATUSES, SellerProfile, parse_seller_profile
+from .tracing import span
+
+if TYPE_CHECKING:
+    from .identity_pool import IdentityPool
+    from .local_index import LocalListingIndex
+    from .prefetch import DetailCache
+    from .price_history import PriceHistoryStore
+
 logger = logging.getLogger(__name__)
 
+# Mercari主数据接口（mercapi未封装）
+CATEGORY_MASTER_URL = "https://api.mercari.jp/master/item_categories/get"
+BRAND_MASTER_URL = "https://api.mercari.jp/master/item_brands/get"
+
+# 主数据类型：(接口地址, 缓存文件名, 缓存模型, 解析函数, 索引类)
+MasterDataKind = Tuple[str, str, Type[BaseModel], Callable[[Any], List[Any]], Callable[[List[Any]], Any]]
+MASTER_DATA_KINDS: Dict[str, MasterDataKind] = {
+    "categories": (CATEGORY_MASTER_URL, "categories.json", CategoryNode, flatten_category_tree, CategoryIndex),
+    "brands": (BRAND_MASTER_URL, "brands.json", BrandEntry, parse_brand_entries, BrandIndex),
+}
+
+# 主数据加载失败后的重试间隔（秒）
+MASTER_DATA_RETRY_SECONDS = 300
+
+# 卖家商品接口（mercapi的items()只返回第一页）
+SELLER_ITEMS_URL = "https://api.mercari.jp/items/get_items"
+SELLER_ITEMS_PAGE_SIZE = 30
+
+# 卖家资料缓存的有效期（秒）
+SELLER_PROFILE_TTL = 3600
+
+# 批量获取卖家信息时同时进行的请求数
+SELLER_FETCH_CONCURRENCY = 5
+
+# 商品状态参数与Mercari商品状况ID的对应关系
+CONDITION_IDS = {
+    "new": [1],
+    "like_new": [2],
+    "good": [3],
+    "fair": [4],
+    "poor": [5, 6],
+}
+
+# 排序参数与上游排序方式（SearchRequestData.SortBy成员名）的对应关系
+SORT_OPTIONS = {
+    "created_time": "SORT_CREATED_TIME",
+    "price": "SORT_PRICE",
+    "popular": "SORT_NUM_LIKES",
+}
+
+# 销售状态参数与上游状态筛选（SearchRequestData.Status成员名）的对应关系
+STATUS_OPTIONS = {
+    "on_sale": ["STATUS_ON_SALE"],
+    "sold_out": ["STATUS_SOLD_OUT"],
+}
+
 
 class MercariItem(BaseModel):
     """Mercari商品数据模型"""
@@ -29,6 +92,10 @@ class MercariItem(BaseModel):
     updated_time: Optional[str] = Field(None, description="更新时间")
     url: Optional[str] = Field(None, description="商品链接")
     condition: Optional[str] = Field(None, description="商品状况")
+    condition_id: Optional[int] = Field(None, description="商品状况ID")
+    duplicate_count: int = Field(default=0, description="折叠的近似重复商品数量")
+    duplicate_ids: List[str] = Field(default_factory=list, description="折叠的近似重复商品ID")
+    relevance_score: Optional[float] = Field(default=None, description="相关度得分（仅 sort=relevance 时）")
 
 
 class MercariSearchResult(BaseModel):
@@ -37,48 +104,267 @@ class MercariSearchResult(BaseModel):
     items: List[MercariItem] = Field(..., description="商品列表")
     has_next: bool = Field(..., description="是否有下一页")
     current_page: int = Field(..., description="当前页码")
+    collapsed_count: int = Field(default=0, description="折叠掉的近似重复商品数量")
+    cursor: Optional[str] = Field(default=None, description="下一页的结果游标（由 next_page 工具使用）")
+
+
+class MercariSearchBatch(BaseModel):
+    """一页上游搜索结果经筛选、排序、折叠后的商品"""
+    items: List[MercariItem] = Field(..., description="商品列表")
+    total_count: int = Field(..., description="总结果数量")
+    next_page_token: Optional[str] = Field(default=None, description="上游下一页的分页令牌")
+    collapsed_count: int = Field(0, description="折叠掉的近似重复商品数量")
+
+
+class SellerInventory(BaseModel):
+    """卖家的商品（各状态分区合并后按上架时间从新到旧排列）"""
+    seller_id: str = Field(..., description="卖家ID")
+    seller: Optional[SellerProfile] = Field(None, description="卖家资料（获取失败时为空）")
+    items: List[MercariItem] = Field(..., description="商品列表")
+    truncated: bool = Field(False, description="是否因达到数量上限而未拉取全部商品")
+    upstream_pages: int = Field(0, description="请求的上游页数")
+
+
+class MercariSearchPage(BaseModel):
+    """上游搜索结果的一页"""
+    items: List[MercariItem] = Field(..., description="商品列表")
+    total_count: int = Field(..., description="总结果数量")
+    page_token: Optional[str] = Field(None, description="本页的分页令牌")
+    next_page_token: Optional[str] = Field(None, description="下一页的分页令牌")
+
+
+def parse_condition_ids(condition: Optional[str]) -> List[int]:
+    """将商品状态参数（可用逗号分隔多个）转换为商品状况ID列表"""
+    if not condition:
+        return []
+    ids: List[int] = []
+    for name in condition.split(","):
+        name = name.strip()
+        if name not in CONDITION_IDS:
+            raise ValueError(f"不支持的商品状态: {name}")
+        ids.extend(CONDITION_IDS[name])
+    return ids
+
+
+def is_sold_status(status: Optional[str]) -> bool:
+    """判断商品状态是否为已售出（含交易中）"""
+    if not status:
+        return False
+    status = status.upper()
+    return "SOLD" in status or "TRADING" in status
 
 
 class MercapiClient:
     """Mercapi客户端包装器"""
     
-    def __init__(self):
-        self.mercapi = Mercapi()
+    def __init__(
+        self,
+        local_index: Optional["LocalListingIndex"] = None,
+        price_history: Optional["PriceHistoryStore"] = None,
+        cache_dir: Optional[Path] = None,
+        ranking_weights: Optional[Dict[str, float]] = None,
+        detail_cache: Optional["DetailCache"] = None,
+        identity_pool: Optional["IdentityPool"] = None
+    ):
+        # 上游身份池；mercapi实例在首次请求时才创建（导入mercapi/httpx较慢，不影响服务器启动）
+        if identity_pool is None:
+            from .identity_pool import IdentityPool
+
+            identity_pool = IdentityPool()
+        self.identity_pool = identity_pool
+        # 可选的本地商品索引，解析出的商品会写入其中
+        self.local_index = local_index
+        # 可选的价格历史存储，记录每次解析到的价格和状态
+        self.price_history = price_history
+        # 主数据（分类树等）的磁盘缓存目录
+        self.cache_dir = cache_dir
+        # sort=relevance 时本地排序的特征权重
+        self.ranking_weights = ranking_weights or dict(DEFAULT_RANKING_WEIGHTS)
+        # 可选的商品详情缓存（由详情预取器填充）
+        self.detail_cache = detail_cache
+        # 进行中的上游请求数（预取器据此判断上游是否繁忙）
+        self.upstream_inflight = 0
+        self._master_indexes: Dict[str, Any] = {}
+        self._master_locks: Dict[str, asyncio.Lock] = {}
+        self._master_retry_at: Dict[str, float] = {}
+        # 卖家资料缓存：卖家ID -> (获取时间, 资料)，以及进行中的请求
+        self._seller_profiles: Dict[str, Tuple[float, SellerProfile]] = {}
+        self._seller_pending: Dict[str, "asyncio.Future[Optional[SellerProfile]]"] = {}
+
+    @contextmanager
+    def _upstream(self) -> Iterator[Any]:
+        """从身份池中选择一个mercapi实例发起上游请求，并统计进行中的请求"""
+        self.upstream_inflight += 1
+        try:
+            with self.identity_pool.acquire() as mercapi:
+                yield mercapi
+        finally:
+            self.upstream_inflight -= 1
+
+    @property
+    def _category_index(self) -> Optional[CategoryIndex]:
+        """已加载的分类索引（未加载时为None）"""
+        return self._master_indexes.get("categories")
+
+    async def _fetch_master_data(self, url: str) -> Any:
+        """请求Mercari主数据接口（复用mercapi的签名和HTTP客户端）"""
+        import httpx
+
+        with self._upstream() as mercapi:
+            request = httpx.Request("GET", url, headers=mercapi._headers)
+            response = await mercapi._client.send(mercapi._sign_request(request))
+            response.raise_for_status()
+        body = response.json()
+        return body.get("data", body) if isinstance(body, dict) else body
+
+    async def _get_master_index(self, kind: str) -> Any:
+        """获取主数据索引（首次调用时从磁盘缓存或上游加载，之后常驻内存）"""
+        index = self._master_indexes.get(kind)
+        if index is not None:
+            return index
+        if time.time() < self._master_retry_at.get(kind, 0.0):
+            return None
+        
+        url, cache_name, model, parse, index_class = MASTER_DATA_KINDS[kind]
+        lock = self._master_locks.setdefault(kind, asyncio.Lock())
+        async with lock:
+            if kind in self._master_indexes:
+                return self._master_indexes[kind]
+            with span("master_data.load", {"master_data.kind": kind}) as current:
+                cache_path = self.cache_dir / cache_name if self.cache_dir else None
+                entries = load_cached_models(cache_path, model) if cache_path else None
+                current.set_attribute("cache.hit", entries is not None)
+                if entries is None:
+                    try:
+                        logger.info(f"加载Mercari主数据: {kind}")
+                        entries = parse(await self._fetch_master_data(url))
+                    except Exception as e:
+                        logger.warning(f"加载主数据失败: {kind}, {e}")
+                        entries = None
+                    if entries and cache_path:
+                        save_cached_models(cache_path, entries)
+                current.set_attribute("item.count", len(entries or []))
+            if not entries:
+                self._master_retry_at[kind] = time.time() + MASTER_DATA_RETRY_SECONDS
+                return None
+            index = index_class(entries)
+            self._master_indexes[kind] = index
+            logger.info(f"主数据索引已加载: {kind}, {len(index)} 条")
+            return index
+
+    async def get_category_index(self) -> Optional[CategoryIndex]:
+        """获取分类索引"""
+        return await self._get_master_index("categories")
+
+    async def get_brand_index(self) -> Optional[BrandIndex]:
+        """获取品牌索引"""
+        return await self._get_master_index("brands")
+
+    def _annotate_brand(self, items: List[MercariItem], brand_ids: List[int]) -> None:
+        """按品牌筛选时，结果必然属于该品牌，直接填充品牌名称"""
+        if len(brand_ids) != 1:
+            return
+        brand_index = self._master_indexes.get("brands")
+        brand_name = brand_index.name_for(brand_ids[0]) if brand_index is not None else None
+        if not brand_name:
+            return
+        for item in items:
+            if item.brand_name is None:
+                item.brand_name = brand_name
+
+    def _record_parsed_items(self, items: List[MercariItem], keyword: Optional[str] = None) -> None:
+        """将解析出的商品写入本地存储"""
+        if self.local_index is not None:
+            try:
+                self.local_index.add_many(items)
+            except Exception as e:
+                logger.warning(f"写入本地索引失败: {e}")
+        if self.price_history is not None:
+            try:
+                self.price_history.record_items(items, keyword=keyword)
+            except Exception as e:
+                logger.warning(f"记录价格历史失败: {e}")
+    
+    async def get_seller_profile(self, seller_id: str) -> Optional[SellerProfile]:
+        """获取卖家资料（缓存 SELLER_PROFILE_TTL 秒，同一卖家的并发请求合并为一次；失败时返回None）"""
+        cached = self._seller_profiles.get(seller_id)
+        if cached is not None and time.monotonic() - cached[0] < SELLER_PROFILE_TTL:
+            return cached[1]
+        pending = self._seller_pending.get(seller_id)
+        if pending is not None:
+            return await asyncio.shield(pending)
+        
+        future = asyncio.ensure_future(self._fetch_seller_profile(seller_id))
+        self._seller_pending[seller_id] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            self._seller_pending.pop(seller_id, None)
+    
+    async def _fetch_seller_profile(self, seller_id: str) -> Optional[SellerProfile]:
+        try:
+            # 直接用所选实例请求卖家资料（item_data.seller() 等模型方法会绕过身份池）
+            with span("mercapi.seller", {"seller.id": seller_id}), self._upstream() as mercapi:
+                profile = await mercapi.profile(seller_id)
+        except Exception as e:
+            logger.warning(f"获取卖家信息失败: {e}")
+            return None
+        if profile is None:
+            return None
+        seller = parse_seller_profile(seller_id, profile)
+        self._seller_profiles[seller_id] = (time.monotonic(), seller)
+        return seller
+    
+    async def _fetch_seller_info(self, item_data) -> Tuple[str, Optional[float]]:
+        """获取搜索结果商品的卖家名称和评分（失败时返回空值）"""
+        seller_id = getattr(item_data, 'seller_id', None)
+        if not seller_id:
+            return "", None
+        seller = await self.get_seller_profile(str(seller_id))
+        if seller is None:
+            return "", None
+        return seller.name, seller.rating
     
-    async def _parse_search_result_item(self, item_data) -> MercariItem:
-        """解析搜索结果中的商品数据"""
+    async def _fetch_sellers(self, item_datas: List[Any]) -> List[Tuple[str, Optional[float]]]:
+        """并发获取一批商品的卖家信息（同一卖家只请求一次，并发数受 SELLER_FETCH_CONCURRENCY 限制）"""
+        semaphore = asyncio.Semaphore(SELLER_FETCH_CONCURRENCY)
+        
+        async def fetch(item_data) -> Tuple[str, Optional[float]]:
+            async with semaphore:
+                return await self._fetch_seller_info(item_data)
+        
+        return list(await asyncio.gather(*(fetch(item_data) for item_data in item_datas)))
+    
+    async def _parse_search_result_item(self, item_data, fetch_seller: bool = True) -> MercariItem:
+        """解析搜索结果中的商品数据（fetch_seller=False 时跳过卖家信息请求）"""
+        seller_name, seller_rating = await self._fetch_seller_info(item_data) if fetch_seller else ("", None)
+        return self._build_search_item(item_data, seller_name, seller_rating)
+    
+    def _build_search_items(self, item_datas: List[Any], sellers: List[Tuple[str, Optional[float]]]) -> List[MercariItem]:
+        """批量构建搜索结果商品（纯CPU工作，可在线程池中执行），跳过无法解析的商品"""
+        items = []
+        for item_data, (seller_name, seller_rating) in zip(item_datas, sellers):
+            try:
+                items.append(self._build_search_item(item_data, seller_name, seller_rating))
+            except Exception as e:
+                logger.warning(f"解析商品数据失败: {e}, 跳过此商品")
+        return items
+    
+    def _build_search_item(self, item_data, seller_name: str = "", seller_rating: Optional[float] = None) -> MercariItem:
+        """由搜索结果数据和卖家信息构建商品"""
         try:
             # 获取缩略图URL
             thumbnail = ""
             if hasattr(item_data, 'thumbnails') and item_data.thumbnails:
                 thumbnail = item_data.thumbnails[0]
             
-            # 获取卖家信息
-            seller_name = ""
-            seller_rating = None
             seller_id = getattr(item_data, 'seller_id', '')
             
-            # 对于SearchResultItem，seller是一个方法，需要调用
-            if hasattr(item_data, 'seller'):
-                try:
-                    seller_obj = await item_data.seller()
-                    if seller_obj:
-                        seller_name = getattr(seller_obj, 'name', '')
-                        # 计算评分
-                        ratings = getattr(seller_obj, 'ratings', None)
-                        if ratings:
-                            good = getattr(ratings, 'good', 0)
-                            normal = getattr(ratings, 'normal', 0)
-                            bad = getattr(ratings, 'bad', 0)
-                            total = good + normal + bad
-                            if total > 0:
-                                seller_rating = (good * 5 + normal * 3 + bad * 1) / total
-                except Exception as e:
-                    logger.warning(f"获取卖家信息失败: {e}")
-            
-            # 获取分类信息
+            # 获取分类信息（SearchResultItem没有分类名称，从已加载的分类索引中查找）
             category_id = getattr(item_data, 'category_id', None)
-            category_name = None  # SearchResultItem没有直接的分类名称
+            category_name = None
+            if self._category_index is not None:
+                category_name = self._category_index.name_for(category_id)
             
             # 获取状况信息
             condition_id = getattr(item_data, 'item_condition_id', None)
@@ -107,7 +393,8 @@ class MercapiClient:
                 created_time=created_time,
                 updated_time=updated_time,
                 url=item_url,
-                condition=condition
+                condition=condition,
+                condition_id=condition_id
             )
         except Exception as e:
             logger.error(f"解析搜索结果商品数据失败: {e}")
@@ -147,8 +434,10 @@ class MercapiClient:
             
             # 获取状况信息
             condition = None
+            condition_id = None
             if hasattr(item_data, 'item_condition') and item_data.item_condition:
                 condition = getattr(item_data.item_condition, 'name', None)
+                condition_id = getattr(item_data.item_condition, 'id_', None)
             
             # 获取品牌信息（如果有的话）
             brand_name = None
@@ -181,7 +470,8 @@ class MercapiClient:
                 'created_time': created_time,
                 'updated_time': updated_time,
                 'url': item_url,
-                'condition': condition
+                'condition': condition,
+                'condition_id': condition_id
             }
         except Exception as e:
             logger.error(f"解析商品数据失败: {e}")
@@ -217,68 +507,454 @@ class MercapiClient:
         sort: str = "created_time",
         order: str = "desc",
         page: int = 1,
-        limit: int = 20
+        limit: int = 20,
+        category_ids: Optional[List[int]] = None,
+        brand_ids: Optional[List[int]] = None,
+        collapse_duplicates: bool = False
     ) -> MercariSearchResult:
-        """搜索Mercari商品"""
+        """搜索Mercari商品（在第一页上游结果中分页）"""
+        logger.info(f"搜索商品: keyword={keyword}, page={page}, limit={limit}")
+        batch = await self.search_batch(
+            keyword,
+            category_id=category_id,
+            brand_id=brand_id,
+            price_min=price_min,
+            price_max=price_max,
+            condition=condition,
+            sort=sort,
+            order=order,
+            category_ids=category_ids,
+            brand_ids=brand_ids,
+            collapse_duplicates=collapse_duplicates
+        )
+        
+        # 应用分页
+        start_index = (page - 1) * limit
+        end_index = start_index + limit
+        return MercariSearchResult(
+            total_count=batch.total_count,
+            items=batch.items[start_index:end_index],
+            has_next=len(batch.items) > end_index,
+            current_page=page,
+            collapsed_count=batch.collapsed_count
+        )
+    
+    async def search_batch(
+        self,
+        keyword: str,
+        category_id: Optional[str] = None,
+        brand_id: Optional[str] = None,
+        price_min: Optional[int] = None,
+        price_max: Optional[int] = None,
+        condition: Optional[str] = None,
+        sort: str = "created_time",
+        order: str = "desc",
+        category_ids: Optional[List[int]] = None,
+        brand_ids: Optional[List[int]] = None,
+        collapse_duplicates: bool = False,
+        page_token: Optional[str] = None
+    ) -> MercariSearchBatch:
+        """拉取一页上游搜索结果（筛选条件传给上游），并在本地按相关度排序、折叠近似重复商品"""
         
         try:
-            logger.info(f"搜索商品: keyword={keyword}, page={page}, limit={limit}")
+            # 分类在上游筛选（上游会同时匹配子分类）
+            categories = list(category_ids or [])
+            if category_id is not None:
+                categories.append(int(category_id))
+            
+            # 品牌在上游筛选
+            brands = list(brand_ids or [])
+            if brand_id is not None:
+                brands.append(int(brand_id))
+            
+            # 预先加载分类/品牌索引，用于填充结果中的分类和品牌名称
+            await self.get_category_index()
+            if brands:
+                await self.get_brand_index()
+            
+            # 价格范围、排序方式与商品状况在上游处理；relevance 使用上游的相关度排序，再在本地重排
+            sort_by, sort_order = self._upstream_sort(sort, order)
             
             # 使用mercapi进行搜索
-            search_result = await self.mercapi.search(keyword)
+            search_result = await self._search_upstream(
+                keyword,
+                categories=categories,
+                brands=brands,
+                price_min=price_min,
+                price_max=price_max,
+                item_conditions=parse_condition_ids(condition),
+                sort_by=sort_by,
+                sort_order=sort_order,
+                page_token=page_token
+            )
             
             # 解析响应数据
-            items = []
-            for item_data in search_result.items:
-                try:
-                    item = await self._parse_search_result_item(item_data)
-                    items.append(item)
-                except Exception as e:
-                    logger.warning(f"解析商品数据失败: {e}, 跳过此商品")
-                    continue
+            items = await self._parse_search_results(search_result)
             
-            # 应用过滤条件
-            if price_min is not None:
-                items = [item for item in items if item.price >= price_min]
-            if price_max is not None:
-                items = [item for item in items if item.price <= price_max]
-            if category_id is not None:
-                items = [item for item in items if item.category_id == int(category_id)]
+            self._annotate_brand(items, brands)
+            self._record_parsed_items(items, keyword=keyword)
             
-            # 应用分页
-            start_index = (page - 1) * limit
-            end_index = start_index + limit
-            paged_items = items[start_index:end_index]
+            # 本地相关度排序（在折叠和分页之前，使每组重复商品中得分最高的作为代表）
+            if sort == "relevance":
+                with span("rank_items", {"item.count": len(items)}):
+                    items = await offload(rank_items, items, keyword, self.ranking_weights, size=len(items))
             
-            return MercariSearchResult(
+            # 折叠近似重复商品（在分页之前，每页只包含不重复的商品）
+            collapsed_count = 0
+            if collapse_duplicates:
+                before = len(items)
+                with span("collapse_duplicates", {"item.count": before}) as current:
+                    items = await offload(collapse_duplicates_items, items, size=before)
+                    collapsed_count = before - len(items)
+                    current.set_attribute("collapsed.count", collapsed_count)
+            
+            return MercariSearchBatch(
+                items=items,
                 total_count=search_result.meta.num_found,
-                items=paged_items,
-                has_next=len(items) > end_index,
-                current_page=page
+                next_page_token=search_result.meta.next_page_token or None,
+                collapsed_count=collapsed_count
             )
             
         except Exception as e:
             logger.error(f"搜索错误: {e}")
             raise Exception(f"搜索失败: {str(e)}")
     
+    async def _search_upstream(self, keyword: str, **kwargs) -> Any:
+        """请求上游搜索接口（记录追踪span）"""
+        attributes = {"search.keyword": keyword, "search.page_token": kwargs.get("page_token")}
+        with span("mercapi.search", attributes) as current, self._upstream() as mercapi:
+            search_result = await mercapi.search(keyword, **kwargs)
+            current.set_attribute("item.count", len(search_result.items))
+            current.set_attribute("search.total_count", search_result.meta.num_found)
+            return search_result
+    
+    async def _parse_search_results(self, search_result, fetch_seller: bool = True) -> List[MercariItem]:
+        """解析一页搜索结果（跳过无法解析的商品）
+
+        卖家信息在事件循环中并发请求；商品构建与校验是纯CPU工作，批量较大时移到线程池执行。
+        """
+        item_datas = list(search_result.items)
+        with span("parse_search_results", {"fetch_seller": fetch_seller}) as current:
+            if fetch_seller:
+                sellers = await self._fetch_sellers(item_datas)
+            else:
+                sellers = [("", None)] * len(item_datas)
+            # 上游商品对象绑定了本进程的HTTP客户端，不能传给进程池
+            items = await offload(
+                self._build_search_items, item_datas, sellers,
+                size=len(item_datas), process_safe=False
+            )
+            current.set_attribute("item.count", len(items))
+        return items
+    
+    def _upstream_sort(self, sort: str, order: str) -> Tuple[Any, Any]:
+        """将排序参数转换为上游排序方式（relevance 等未知方式使用上游的相关度排序）"""
+        from mercapi.requests import SearchRequestData
+
+        sort_by = getattr(SearchRequestData.SortBy, SORT_OPTIONS.get(sort, "SORT_SCORE"))
+        sort_order = (
+            SearchRequestData.SortOrder.ORDER_ASC if order == "asc"
+            else SearchRequestData.SortOrder.ORDER_DESC
+        )
+        return sort_by, sort_order
+    
+    async def iter_search_pages(
+        self,
+        keyword: str,
+        category_ids: Optional[List[int]] = None,
+        price_min: Optional[int] = None,
+        price_max: Optional[int] = None,
+        condition: Optional[str] = None,
+        status: Optional[str] = None,
+        sort: str = "created_time",
+        order: str = "desc",
+        page_token: Optional[str] = None,
+        max_pages: Optional[int] = None,
+        fetch_seller: bool = False,
+        brand_ids: Optional[List[int]] = None
+    ) -> AsyncIterator[MercariSearchPage]:
+        """逐页拉取上游搜索结果（筛选条件直接传给上游）"""
+        from mercapi.requests import SearchRequestData
+        
+        sort_by, sort_order = self._upstream_sort(sort, order)
+        item_conditions = parse_condition_ids(condition)
+        statuses = [getattr(SearchRequestData.Status, name) for name in STATUS_OPTIONS.get(status or "", [])]
+        await self.get_category_index()
+        if brand_ids:
+            await self.get_brand_index()
+        pages = 0
+        
+        while max_pages is None or pages < max_pages:
+            logger.info(f"拉取搜索结果页: keyword={keyword}, page={pages + 1}")
+            search_result = await self._search_upstream(
+                keyword,
+                categories=list(category_ids or []),
+                brands=list(brand_ids or []),
+                price_min=price_min,
+                price_max=price_max,
+                item_conditions=item_conditions,
+                status=statuses,
+                sort_by=sort_by,
+                sort_order=sort_order,
+                page_token=page_token
+            )
+            pages += 1
+            
+            items = await self._parse_search_results(search_result, fetch_seller=fetch_seller)
+            self._annotate_brand(items, list(brand_ids or []))
+            self._record_parsed_items(items, keyword=keyword)
+            
+            next_page_token = search_result.meta.next_page_token or None
+            yield MercariSearchPage(
+                items=items,
+                total_count=search_result.meta.num_found,
+                page_token=page_token,
+                next_page_token=next_page_token
+            )
+            
+            if not next_page_token:
+                break
+            page_token = next_page_token
+    
+    async def fetch_new_items(
+        self,
+        keyword: str,
+        since_created: Optional[str] = None,
+        seen_ids: Optional[Set[str]] = None,
+        category_id: Optional[int] = None,
+        price_min: Optional[int] = None,
+        price_max: Optional[int] = None,
+        max_pages: int = 3,
+        fetch_seller: bool = True
+    ) -> List[MercariItem]:
+        """按创建时间倒序拉取新上架商品，遇到已见过的商品即停止翻页（fetch_seller=False 时跳过卖家信息请求）"""
+        from mercapi.requests import SearchRequestData
+        
+        seen_ids = seen_ids or set()
+        new_items: List[MercariItem] = []
+        page_token = None
+        await self.get_category_index()
+        
+        try:
+            for _ in range(max_pages):
+                search_result = await self._search_upstream(
+                    keyword,
+                    categories=[int(category_id)] if category_id is not None else [],
+                    price_min=price_min,
+                    price_max=price_max,
+                    sort_by=SearchRequestData.SortBy.SORT_CREATED_TIME,
+                    sort_order=SearchRequestData.SortOrder.ORDER_DESC,
+                    page_token=page_token
+                )
+                
+                reached_seen = False
+                item_datas = []
+                for item_data in search_result.items:
+                    created_time = str(item_data.created) if hasattr(item_data, 'created') else None
+                    # 已见过或早于水位线的商品无需解析（包括卖家信息请求）
+                    if item_data.id_ in seen_ids or (
+                        since_created and created_time and created_time < since_created
+                    ):
+                        reached_seen = True
+                        continue
+                    item_datas.append(item_data)
+                
+                if fetch_seller:
+                    sellers = await self._fetch_sellers(item_datas)
+                else:
+                    sellers = [("", None)] * len(item_datas)
+                new_items.extend(self._build_search_items(item_datas, sellers))
+                
+                page_token = search_result.meta.next_page_token
+                if reached_seen or not page_token:
+                    break
+            
+            self._record_parsed_items(new_items, keyword=keyword)
+            return new_items
+            
+        except Exception as e:
+            logger.error(f"拉取新商品错误: {e}")
+            raise Exception(f"拉取新商品失败: {str(e)}")
+    
     async def get_item_detail(self, item_id: str) -> MercariItem:
-        """获取商品详情"""
+        """获取商品详情（启用详情缓存时优先使用预取的结果）"""
+        if self.detail_cache is None:
+            return await self.fetch_item_detail(item_id)
+        
+        # 正在预取时等待预取完成（结果会写入缓存），避免重复请求
+        pending = self.detail_cache.pending(item_id)
+        if pending is not None:
+            try:
+                await asyncio.shield(pending)
+            except Exception:
+                pass  # 预取失败时重新请求
+        
+        cached = self.detail_cache.get(item_id)
+        if cached is not None:
+            logger.info(f"商品详情命中缓存: item_id={item_id}")
+            return cached
+        
+        item = await self.fetch_item_detail(item_id)
+        self.detail_cache.put(item)
+        return item
+    
+    async def fetch_item_detail(self, item_id: str) -> MercariItem:
+        """向上游请求商品详情"""
         try:
             logger.info(f"获取商品详情: item_id={item_id}")
             
             # 使用mercapi获取商品详情
-            item_data = await self.mercapi.item(item_id)
+            with span("mercapi.item", {"item.id": item_id}), self._upstream() as mercapi:
+                item_data = await mercapi.item(item_id)
             
             if item_data is None:
                 raise Exception(f"商品 {item_id} 不存在或无法访问")
             
             # 解析所有信息（包括详细描述）
-            return self._parse_item_data(item_data)
+            item = self._parse_item_data(item_data)
+            self._record_parsed_items([item])
+            return item
             
         except Exception as e:
             logger.error(f"获取商品详情错误: {e}")
             raise Exception(f"获取商品详情失败: {str(e)}")
     
+    async def _fetch_seller_items_page(
+        self, seller_id: str, status: str, max_pager_id: Optional[str] = None
+    ) -> Tuple[List[Any], Optional[str]]:
+        """请求卖家某一状态分区的一页商品，返回 (SellerItem列表, 下一页的max_pager_id)"""
+        import httpx
+        from mercapi.mapping import map_to_class
+        from mercapi.models import Items
+
+        params: Dict[str, Any] = {
+            "seller_id": seller_id,
+            "limit": SELLER_ITEMS_PAGE_SIZE,
+            "with_auction": True,
+            "status": status,
+        }
+        if max_pager_id:
+            params["max_pager_id"] = max_pager_id
+        attributes = {"seller.id": seller_id, "seller.status": status}
+        with span("mercapi.seller_items", attributes) as current, self._upstream() as mercapi:
+            request = httpx.Request("GET", SELLER_ITEMS_URL, params=params, headers=mercapi._headers)
+            response = await mercapi._client.send(mercapi._sign_request(request))
+            if response.status_code == 404:
+                return [], None
+            response.raise_for_status()
+            body = response.json()
+            current.set_attribute("item.count", len(body.get("data") or []))
+        
+        raw_items = body.get("data") or []
+        items = map_to_class(body, Items).items if raw_items else []
+        # 上游以最后一个商品的 pager_id 作为下一页的起点
+        has_next = bool((body.get("meta") or {}).get("has_next"))
+        next_pager_id = raw_items[-1].get("pager_id") if has_next and raw_items else None
+        return items, str(next_pager_id) if next_pager_id else None
+    
+    async def _fetch_seller_partition(
+        self, seller_id: str, status: str, max_items: int, seller: Optional[SellerProfile]
+    ) -> Tuple[List[MercariItem], bool, int]:
+        """逐页拉取卖家某一状态分区的商品，返回 (商品, 是否被截断, 请求页数)"""
+        items: List[MercariItem] = []
+        pager_id: Optional[str] = None
+        pages = 0
+        while True:
+            item_datas, pager_id = await self._fetch_seller_items_page(seller_id, status, pager_id)
+            pages += 1
+            for item_data in item_datas:
+                try:
+                    item = self._build_search_item(
+                        item_data,
+                        seller.name if seller else "",
+                        seller.rating if seller else None
+                    )
+                except Exception as e:
+                    logger.warning(f"解析卖家商品失败: {e}, 跳过此商品")
+                    continue
+                category = getattr(item_data, 'item_category', None)
+                if item.category_id is None and category is not None:
+                    item.category_id = getattr(category, 'id_', None)
+                    item.category_name = getattr(category, 'name', None)
+                items.append(item)
+            if not pager_id:
+                return items, False, pages
+            if len(items) >= max_items:
+                return items, True, pages
+    
+    async def get_seller_items(
+        self,
+        seller_id: str,
+        statuses: Optional[List[str]] = None,
+        max_items: int = 300
+    ) -> SellerInventory:
+        """拉取卖家的商品（卖家资料与各状态分区并发请求，各分区内按 max_pager_id 逐页拉取）"""
+        statuses = list(statuses or SELLER_ITEM_STATUSES)
+        logger.info(f"获取卖家商品: seller_id={seller_id}, status={','.join(statuses)}")
+        try:
+            # 卖家资料通常已在搜索时缓存
+            seller = await self.get_seller_profile(seller_id)
+            await self.get_category_index()
+            partitions = await asyncio.gather(*[
+                self._fetch_seller_partition(seller_id, status, max_items, seller)
+                for status in statuses
+            ])
+        except Exception as e:
+            logger.error(f"获取卖家商品错误: {e}")
+            raise Exception(f"获取卖家商品失败: {str(e)}")
+        
+        items: List[MercariItem] = []
+        seen: Set[str] = set()
+        for partition_items, _, _ in partitions:
+            for item in partition_items:
+                if item.id not in seen:
+                    seen.add(item.id)
+                    items.append(item)
+        items.sort(key=lambda item: item.created_time or "", reverse=True)
+        truncated = any(partition_truncated for _, partition_truncated, _ in partitions) or len(items) > max_items
+        self._record_parsed_items(items)
+        return SellerInventory(
+            seller_id=seller_id,
+            seller=seller,
+            items=items[:max_items],
+            truncated=truncated,
+            upstream_pages=sum(pages for _, _, pages in partitions)
+        )
+    
+    async def seller_items_batch(
+        self,
+        inventory: SellerInventory,
+        price_min: Optional[int] = None,
+        price_max: Optional[int] = None,
+        sort: str = "created_time",
+        order: str = "desc",
+        collapse_duplicates: bool = False,
+        page_token: Optional[str] = None
+    ) -> MercariSearchBatch:
+        """在已拉取的卖家商品中筛选价格、排序、折叠近似重复商品（一次返回全部结果）"""
+        items = list(inventory.items)
+        if price_min is not None:
+            items = [item for item in items if item.price >= price_min]
+        if price_max is not None:
+            items = [item for item in items if item.price <= price_max]
+        if sort == "price":
+            items.sort(key=lambda item: item.price, reverse=order == "desc")
+        elif order == "asc":
+            items.reverse()
+        
+        collapsed_count = 0
+        if collapse_duplicates:
+            before = len(items)
+            with span("collapse_duplicates", {"item.count": before}):
+                items = await offload(collapse_duplicates_items, items, size=before)
+            collapsed_count = before - len(items)
+        
+        return MercariSearchBatch(
+            items=items,
+            total_count=len(items),
+            collapsed_count=collapsed_count
+        )
+    
     def _format_price(self, price: int) -> str:
         """格式化价格"""
         return f"¥{price:,}"
@@ -0,0 +1,197 @@
+"""
+商品详情预取 - 搜索返回后在后台低优先级地预取排名靠前商品的详情，并缓存一段时间
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import TYPE_CHECKING, Any, Deque, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from .mercapi_client import MercapiClient, MercariItem
+
+logger = logging.getLogger(__name__)
+
+
+class _CacheEntry:
+    __slots__ = ("item", "fetched_at", "prefetched", "used")
+
+    def __init__(self, item: "MercariItem", prefetched: bool):
+        self.item = item
+        self.fetched_at = time.monotonic()
+        self.prefetched = prefetched
+        self.used = False
+
+
+class DetailCache:
+    """商品详情缓存（TTL + LRU），并统计预取的命中情况"""
+
+    def __init__(self, ttl_seconds: float = 300.0, max_items: int = 500):
+        self.ttl_seconds = ttl_seconds
+        self.max_items = max_items
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._pending: Dict[str, "asyncio.Future[MercariItem]"] = {}
+        self.hits = 0
+        self.misses = 0
+        self.prefetched = 0
+        self.prefetch_used = 0
+
+    def get(self, item_id: str) -> Optional["MercariItem"]:
+        """读取未过期的详情，并记录命中/未命中"""
+        entry = self._entries.get(item_id)
+        if entry is not None and time.monotonic() - entry.fetched_at > self.ttl_seconds:
+            self._entries.pop(item_id, None)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(item_id)
+        self.hits += 1
+        self._mark_used(entry)
+        return entry.item
+
+    def contains(self, item_id: str) -> bool:
+        """是否已缓存或正在预取（不计入命中统计）"""
+        entry = self._entries.get(item_id)
+        fresh = entry is not None and time.monotonic() - entry.fetched_at <= self.ttl_seconds
+        return fresh or item_id in self._pending
+
+    def put(self, item: "MercariItem", prefetched: bool = False) -> None:
+        self._entries[item.id] = _CacheEntry(item, prefetched)
+        self._entries.move_to_end(item.id)
+        if prefetched:
+            self.prefetched += 1
+        while len(self._entries) > self.max_items:
+            self._entries.popitem(last=False)
+
+    def pending(self, item_id: str) -> Optional["asyncio.Future[MercariItem]"]:
+        """正在进行的预取请求"""
+        return self._pending.get(item_id)
+
+    def track_pending(self, item_id: str, future: "asyncio.Future[MercariItem]") -> None:
+        self._pending[item_id] = future
+        future.add_done_callback(lambda _: self._pending.pop(item_id, None))
+
+    def _mark_used(self, entry: _CacheEntry) -> None:
+        if entry.prefetched and not entry.used:
+            self.prefetch_used += 1
+        entry.used = True
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "items": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "prefetched": self.prefetched,
+            "prefetch_used": self.prefetch_used,
+            "prefetch_use_rate": round(self.prefetch_used / self.prefetched, 3) if self.prefetched else None,
+        }
+
+
+class DetailPrefetcher:
+    """后台预取商品详情
+
+    - 每次搜索只预取前 top_k 个商品，新的搜索优先（队列满时丢弃最旧的）
+    - 预取请求之间至少间隔 1/rate_per_second 秒
+    - 上游有前台请求进行中时让路；请求失败时指数退避
+    """
+
+    def __init__(
+        self,
+        client: "MercapiClient",
+        cache: DetailCache,
+        top_k: int = 3,
+        rate_per_second: float = 1.0,
+        max_queue: int = 30,
+        busy_inflight: int = 1,
+        max_backoff_seconds: float = 60.0
+    ):
+        self.client = client
+        self.cache = cache
+        self.top_k = top_k
+        self.min_interval = 1.0 / rate_per_second if rate_per_second > 0 else 0.0
+        self.busy_inflight = busy_inflight
+        self.max_backoff_seconds = max_backoff_seconds
+        self._queue: Deque[str] = deque(maxlen=max_queue)
+        self._task: Optional["asyncio.Task[None]"] = None
+        self._backoff = 0.0
+        self._last_fetch = 0.0
+        self.scheduled = 0
+        self.fetched = 0
+        self.failed = 0
+        self.deferred = 0
+
+    def schedule(self, items: List["MercariItem"]) -> int:
+        """登记一次搜索结果的前 top_k 个商品，返回新加入队列的数量"""
+        item_ids = [
+            item.id for item in items[:self.top_k]
+            if not self.cache.contains(item.id) and item.id not in self._queue
+        ]
+        # 新搜索的商品排在队首，同一搜索内保持排名顺序
+        for item_id in reversed(item_ids):
+            self._queue.appendleft(item_id)
+        self.scheduled += len(item_ids)
+        if item_ids and (self._task is None or self._task.done()):
+            self._task = asyncio.ensure_future(self._run())
+        return len(item_ids)
+
+    def _busy(self) -> bool:
+        return self.client.upstream_inflight >= self.busy_inflight
+
+    async def _run(self) -> None:
+        """逐个预取，队列为空时结束（下次登记时重新启动）"""
+        loop = asyncio.get_running_loop()
+        while self._queue:
+            wait = self._last_fetch + max(self.min_interval, self._backoff) - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            if self._busy():
+                # 前台请求优先：让路并逐步拉长等待
+                self.deferred += 1
+                self._increase_backoff()
+                self._last_fetch = loop.time()
+                continue
+            if not self._queue:
+                break
+
+            item_id = self._queue.popleft()
+            if self.cache.contains(item_id):
+                continue
+            self._last_fetch = loop.time()
+            future = asyncio.ensure_future(self._fetch(item_id))
+            self.cache.track_pending(item_id, future)
+            try:
+                await asyncio.shield(future)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += 1
+                self._increase_backoff()
+                logger.debug(f"预取商品详情失败: {item_id}, {e}")
+                continue
+            self.fetched += 1
+            self._backoff = 0.0
+
+    async def _fetch(self, item_id: str) -> "MercariItem":
+        """请求详情并写入缓存（在等待者恢复之前写入，等待者随后可直接命中缓存）"""
+        item = await self.client.fetch_item_detail(item_id)
+        self.cache.put(item, prefetched=True)
+        return item
+
+    def _increase_backoff(self) -> None:
+        self._backoff = min(max(self._backoff * 2, 1.0), self.max_backoff_seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "top_k": self.top_k,
+            "queued": len(self._queue),
+            "scheduled": self.scheduled,
+            "fetched": self.fetched,
+            "failed": self.failed,
+            "deferred": self.deferred,
+            "backoff_seconds": self._backoff,
+            "cache": self.cache.stats(),
+        }
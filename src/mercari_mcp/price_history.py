@@ -0,0 +1,363 @@
+"""
+价格历史 - 记录商品价格/状态观测值的列式时间序列存储
+"""
+
+import logging
+import time
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from pydantic import BaseModel, Field
+
+from .loop_health import offload
+from .mercapi_client import MercariItem
+from .text_utils import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# numpy为可选依赖且导入较慢，首次聚合时才导入；缺失时使用纯Python聚合
+np: Any = None
+_numpy_checked = False
+
+
+def _load_numpy():
+    """按需导入numpy，未安装时返回None"""
+    global np, _numpy_checked
+    if not _numpy_checked:
+        _numpy_checked = True
+        try:
+            import numpy
+            np = numpy
+        except ImportError:
+            np = None
+    return np
+
+
+class PriceObservation(BaseModel):
+    """价格观测值"""
+    timestamp: float = Field(..., description="观测时间戳")
+    price: int = Field(..., description="价格")
+    status: str = Field(..., description="商品状态")
+
+
+class PriceDropEvent(BaseModel):
+    """降价事件"""
+    item_id: str = Field(..., description="商品ID")
+    timestamp: float = Field(..., description="观测到降价的时间戳")
+    old_price: int = Field(..., description="降价前价格")
+    new_price: int = Field(..., description="降价后价格")
+    drop_ratio: float = Field(..., description="降价幅度（0-1）")
+
+
+class PriceStats(BaseModel):
+    """价格统计"""
+    scope: str = Field(..., description="统计范围：item 或 keyword")
+    key: str = Field(..., description="商品ID或关键词")
+    item_count: int = Field(..., description="商品数量")
+    observation_count: int = Field(..., description="观测值数量")
+    min_price: Optional[int] = Field(default=None, description="最低价格")
+    max_price: Optional[int] = Field(default=None, description="最高价格")
+    median_price: Optional[float] = Field(default=None, description="价格中位数（按记录的价格变化点计算，不按持续时间加权）")
+    latest_price: Optional[int] = Field(default=None, description="最新价格（仅单个商品）")
+    drop_count: int = Field(default=0, description="降价事件数量")
+    drop_events: List[PriceDropEvent] = Field(default_factory=list, description="最近的降价事件")
+
+
+class PriceHistoryStore:
+    """价格历史存储（追加写入的列式数组）
+
+    每个观测值拆分为四列：商品序号、时间戳、价格、状态编码，
+    商品ID与状态字符串各自驻留为整数编码。为保持紧凑，价格和状态
+    与该商品上一次观测相同时不重复记录，只保存变化点。
+    统计时通过每个商品的行号数组取列，安装numpy时使用向量化聚合。
+
+    商品数超过 max_items 时淘汰最久未观测到的商品（一次淘汰到容量的90%，
+    再重建列数组）；超过 max_age 秒未观测到的商品每小时清理一次。
+    """
+
+    # 超过容量时淘汰到容量的比例（批量淘汰，避免每个新商品都重建列数组）
+    EVICT_RATIO = 0.9
+    # 按最长保留时间清理的检查间隔（秒）
+    AGE_CHECK_INTERVAL = 3600.0
+
+    def __init__(self, max_items: int = 50000, max_age: float = 30 * 86400.0):
+        self.max_items = max_items
+        self.max_age = max_age
+        self._item_col = array("I")
+        self._time_col = array("d")
+        self._price_col = array("q")
+        self._status_col = array("H")
+        self._item_ids: List[str] = []
+        self._item_index: Dict[str, int] = {}
+        self._statuses: List[str] = []
+        self._status_index: Dict[str, int] = {}
+        self._item_rows: Dict[int, array] = {}
+        self._keyword_items: Dict[str, Set[int]] = {}
+        # 每个商品最近一次被观测到的时间（含价格未变化而跳过写入的观测）
+        self._last_seen = array("d")
+        self._next_age_check = time.time() + self.AGE_CHECK_INTERVAL
+
+    def __len__(self) -> int:
+        return len(self._price_col)
+
+    def _intern_item(self, item_id: str) -> int:
+        """商品ID驻留为整数编码"""
+        index = self._item_index.get(item_id)
+        if index is None:
+            index = len(self._item_ids)
+            self._item_ids.append(item_id)
+            self._item_index[item_id] = index
+            self._item_rows[index] = array("I")
+            self._last_seen.append(0.0)
+        return index
+
+    def _intern_status(self, status: str) -> int:
+        """状态字符串驻留为整数编码"""
+        code = self._status_index.get(status)
+        if code is None:
+            code = len(self._statuses)
+            self._statuses.append(status)
+            self._status_index[status] = code
+        return code
+
+    def record(self, item_id: str, price: int, status: str, timestamp: Optional[float] = None) -> bool:
+        """追加一条观测值，价格和状态均未变化时跳过，返回是否写入"""
+        item_index = self._intern_item(item_id)
+        status_code = self._intern_status(status or "")
+        rows = self._item_rows[item_index]
+        observed_at = timestamp if timestamp is not None else time.time()
+        self._last_seen[item_index] = max(self._last_seen[item_index], observed_at)
+        if rows:
+            last_row = rows[-1]
+            if self._price_col[last_row] == price and self._status_col[last_row] == status_code:
+                return False
+
+        rows.append(len(self._price_col))
+        self._item_col.append(item_index)
+        self._time_col.append(observed_at)
+        self._price_col.append(int(price))
+        self._status_col.append(status_code)
+        return True
+
+    def record_items(self, items: Iterable[MercariItem], keyword: Optional[str] = None) -> int:
+        """记录一批商品的观测值，并关联到搜索关键词"""
+        now = time.time()
+        written = 0
+        keyword_items = self._keyword_items.setdefault(normalize_text(keyword), set()) if keyword else None
+        for item in items:
+            if self.record(item.id, item.price, item.status, now):
+                written += 1
+            if keyword_items is not None:
+                keyword_items.add(self._item_index[item.id])
+        self._evict(now)
+        return written
+
+    def _evict(self, now: float) -> None:
+        """超出容量或到达清理时间时淘汰商品"""
+        over_capacity = self.max_items > 0 and len(self._item_ids) > self.max_items
+        age_due = self.max_age > 0 and now >= self._next_age_check
+        if not over_capacity and not age_due:
+            return
+        if age_due:
+            self._next_age_check = now + self.AGE_CHECK_INTERVAL
+
+        keep: List[int] = list(range(len(self._item_ids)))
+        if self.max_age > 0:
+            cutoff = now - self.max_age
+            keep = [index for index in keep if self._last_seen[index] >= cutoff]
+        if self.max_items > 0 and len(keep) > self.max_items:
+            target = int(self.max_items * self.EVICT_RATIO)
+            keep = sorted(sorted(keep, key=lambda index: self._last_seen[index], reverse=True)[:target])
+        if len(keep) < len(self._item_ids):
+            self._rebuild(keep)
+
+    def _rebuild(self, keep: List[int]) -> None:
+        """只保留指定商品（按原编码升序）的观测值，重新编号并重建列数组"""
+        remap = {old: new for new, old in enumerate(keep)}
+        evicted = len(self._item_ids) - len(keep)
+
+        item_col = array("I")
+        time_col = array("d")
+        price_col = array("q")
+        status_col = array("H")
+        item_rows: Dict[int, array] = {new: array("I") for new in range(len(keep))}
+        # 按原行号顺序复制，同一商品的行保持时间顺序
+        for row, old_index in enumerate(self._item_col):
+            new_index = remap.get(old_index)
+            if new_index is None:
+                continue
+            item_rows[new_index].append(len(price_col))
+            item_col.append(new_index)
+            time_col.append(self._time_col[row])
+            price_col.append(self._price_col[row])
+            status_col.append(self._status_col[row])
+
+        self._item_col, self._time_col, self._price_col, self._status_col = item_col, time_col, price_col, status_col
+        self._item_rows = item_rows
+        self._item_ids = [self._item_ids[old] for old in keep]
+        self._item_index = {item_id: index for index, item_id in enumerate(self._item_ids)}
+        self._last_seen = array("d", (self._last_seen[old] for old in keep))
+        keyword_items: Dict[str, Set[int]] = {}
+        for keyword, members in self._keyword_items.items():
+            remapped = {remap[old] for old in members if old in remap}
+            if remapped:
+                keyword_items[keyword] = remapped
+        self._keyword_items = keyword_items
+        logger.info(f"价格历史淘汰 {evicted} 个商品，保留 {len(keep)} 个商品、{len(price_col)} 条观测值")
+
+    def get_history(self, item_id: str, limit: Optional[int] = None) -> List[PriceObservation]:
+        """获取单个商品的观测历史（按时间升序）"""
+        item_index = self._item_index.get(item_id)
+        if item_index is None:
+            return []
+        rows = self._item_rows[item_index]
+        if limit is not None:
+            rows = rows[-limit:]
+        return [
+            PriceObservation(
+                timestamp=self._time_col[row],
+                price=self._price_col[row],
+                status=self._statuses[self._status_col[row]]
+            )
+            for row in rows
+        ]
+
+    def item_stats(self, item_id: str, max_events: int = 20) -> Optional[PriceStats]:
+        """单个商品的价格统计"""
+        prepared = self._prepare_item(item_id)
+        return self._finish(*prepared, max_events) if prepared else None
+
+    def keyword_stats(self, keyword: str, max_events: int = 20) -> Optional[PriceStats]:
+        """某个搜索关键词下所有商品的价格统计"""
+        prepared = self._prepare_keyword(keyword)
+        return self._finish(*prepared, max_events) if prepared else None
+
+    async def compute_stats(
+        self,
+        item_id: Optional[str] = None,
+        keyword: Optional[str] = None,
+        max_events: int = 20
+    ) -> Optional[PriceStats]:
+        """价格统计（观测值较多时在线程池中聚合，不阻塞事件循环）"""
+        prepared = self._prepare_item(item_id) if item_id else self._prepare_keyword(keyword or "")
+        if not prepared:
+            return None
+        stats, columns = prepared
+        return await offload(
+            self._finish, stats, columns, max_events,
+            size=stats.observation_count, process_safe=False
+        )
+
+    def _prepare_item(self, item_id: str) -> Optional[Tuple[PriceStats, Optional[tuple]]]:
+        item_index = self._item_index.get(item_id)
+        if item_index is None:
+            return None
+        return self._prepare("item", item_id, [item_index])
+
+    def _prepare_keyword(self, keyword: str) -> Optional[Tuple[PriceStats, Optional[tuple]]]:
+        item_indices = self._keyword_items.get(normalize_text(keyword))
+        if not item_indices:
+            return None
+        return self._prepare("keyword", keyword, sorted(item_indices))
+
+    def _gather_rows(self, item_indices: List[int]) -> array:
+        """拼接多个商品的行号（同一商品的行保持时间顺序）"""
+        rows = array("I")
+        for item_index in item_indices:
+            rows.extend(self._item_rows[item_index])
+        return rows
+
+    def _prepare(self, scope: str, key: str, item_indices: List[int]) -> Tuple[PriceStats, Optional[tuple]]:
+        """取出参与统计的列（复制，之后的聚合不再访问可增长的列数组，可在其他线程中进行）"""
+        rows = self._gather_rows(item_indices)
+        stats = PriceStats(
+            scope=scope,
+            key=key,
+            item_count=len(item_indices),
+            observation_count=len(rows)
+        )
+        if not rows:
+            return stats, None
+
+        if scope == "item":
+            stats.latest_price = self._price_col[rows[-1]]
+
+        if _load_numpy() is not None:
+            # 花式索引生成副本，frombuffer视图随即释放，不会阻止列数组继续追加
+            row_idx = np.frombuffer(rows, dtype=np.uint32)
+            columns = (
+                np.frombuffer(self._price_col, dtype=np.int64)[row_idx],
+                np.frombuffer(self._item_col, dtype=np.uint32)[row_idx],
+                np.frombuffer(self._time_col, dtype=np.float64)[row_idx],
+            )
+        else:
+            columns = (
+                [self._price_col[row] for row in rows],
+                [self._item_col[row] for row in rows],
+                [self._time_col[row] for row in rows],
+            )
+        return stats, columns
+
+    def _finish(self, stats: PriceStats, columns: Optional[tuple], max_events: int) -> PriceStats:
+        """计算最小/最大/中位数价格与降价事件"""
+        if columns is None:
+            return stats
+        prices, items, times = columns
+        if _load_numpy() is not None:
+            self._aggregate_numpy(stats, prices, items, times, max_events)
+        else:
+            self._aggregate_python(stats, prices, items, times, max_events)
+        return stats
+
+    def _aggregate_numpy(self, stats: PriceStats, prices, items, times, max_events: int) -> None:
+        """向量化聚合"""
+        stats.min_price = int(prices.min())
+        stats.max_price = int(prices.max())
+        stats.median_price = float(np.median(prices))
+
+        # 同一商品相邻观测值价格下降即为降价事件
+        drops = np.flatnonzero((prices[1:] < prices[:-1]) & (items[1:] == items[:-1])) + 1
+        stats.drop_count = int(drops.size)
+        if drops.size:
+            recent = drops[np.argsort(times[drops], kind="stable")[::-1][:max_events]]
+            stats.drop_events = [
+                self._drop_event(int(items[i]), float(times[i]), int(prices[i - 1]), int(prices[i]))
+                for i in recent
+            ]
+
+    def _aggregate_python(
+        self,
+        stats: PriceStats,
+        prices: Sequence[int],
+        items: Sequence[int],
+        times: Sequence[float],
+        max_events: int
+    ) -> None:
+        """纯Python聚合（未安装numpy时使用）"""
+        sorted_prices = sorted(prices)
+        n = len(sorted_prices)
+        stats.min_price = sorted_prices[0]
+        stats.max_price = sorted_prices[-1]
+        mid = n // 2
+        stats.median_price = float(sorted_prices[mid]) if n % 2 else (sorted_prices[mid - 1] + sorted_prices[mid]) / 2
+
+        drops = [
+            i for i in range(1, n)
+            if prices[i] < prices[i - 1] and items[i] == items[i - 1]
+        ]
+        stats.drop_count = len(drops)
+        drops.sort(key=lambda i: times[i], reverse=True)
+        stats.drop_events = [
+            self._drop_event(items[i], times[i], prices[i - 1], prices[i])
+            for i in drops[:max_events]
+        ]
+
+    def _drop_event(self, item_index: int, timestamp: float, old_price: int, new_price: int) -> PriceDropEvent:
+        """构建降价事件"""
+        return PriceDropEvent(
+            item_id=self._item_ids[item_index],
+            timestamp=timestamp,
+            old_price=old_price,
+            new_price=new_price,
+            drop_ratio=(old_price - new_price) / old_price if old_price else 0.0
+        )
@@ -0,0 +1,246 @@
+"""
+行情价格汇总 - 单次遍历、内存有界的价格统计（分位数、均值、直方图）
+"""
+
+import bisect
+import math
+from typing import Dict, List, Optional, Sequence
+
+from pydantic import BaseModel, Field
+
+from .mercapi_client import MercapiClient, is_sold_status
+
+# 汇总默认输出的分位数
+DEFAULT_QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+
+# 价格直方图的分桶边界（日元）
+HISTOGRAM_EDGES = (
+    0, 500, 1000, 2000, 3000, 5000, 10000, 20000, 30000, 50000,
+    100000, 200000, 500000, 1000000,
+)
+
+
+class P2Quantile:
+    """P²算法的分位数估计（Jain & Chlamtac, 1985）
+
+    只维护5个标记点，内存为O(1)，不保存样本本身。
+    """
+
+    def __init__(self, p: float):
+        self.p = p
+        self.count = 0
+        self._heights: List[float] = []
+        self._positions = [0, 1, 2, 3, 4]
+        self._desired = [0.0, 2 * p, 4 * p, 2 + 2 * p, 4.0]
+        self._increments = [0.0, p / 2, p, (1 + p) / 2, 1.0]
+
+    def add(self, x: float) -> None:
+        """加入一个样本"""
+        self.count += 1
+        q = self._heights
+        if self.count <= 5:
+            bisect.insort(q, x)
+            return
+
+        n = self._positions
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = bisect.bisect_right(q, x) - 1
+            k = min(max(k, 0), 3)
+
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self._desired[i] += self._increments[i]
+
+        for i in (1, 2, 3):
+            d = self._desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                step = 1 if d > 0 else -1
+                candidate = self._parabolic(i, step)
+                if q[i - 1] < candidate < q[i + 1]:
+                    q[i] = candidate
+                else:
+                    q[i] = q[i] + step * (q[i + step] - q[i]) / (n[i + step] - n[i])
+                n[i] += step
+
+    def _parabolic(self, i: int, d: int) -> float:
+        """分段抛物线插值"""
+        q = self._heights
+        n = self._positions
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def value(self) -> Optional[float]:
+        """当前分位数估计值（样本不足5个时精确计算）"""
+        if self.count == 0:
+            return None
+        if self.count <= 5:
+            q = self._heights
+            rank = self.p * (len(q) - 1)
+            lower = math.floor(rank)
+            upper = math.ceil(rank)
+            return q[lower] + (q[upper] - q[lower]) * (rank - lower)
+        return self._heights[2]
+
+
+class StatusSummary(BaseModel):
+    """按销售状态划分的价格汇总"""
+    count: int = Field(default=0, description="商品数量")
+    mean: Optional[float] = Field(default=None, description="平均价格")
+    median: Optional[float] = Field(default=None, description="价格中位数（估计值）")
+
+
+class HistogramBucket(BaseModel):
+    """价格直方图分桶"""
+    lower: int = Field(..., description="下界（含）")
+    upper: Optional[int] = Field(default=None, description="上界（不含），为空表示无上限")
+    count: int = Field(..., description="商品数量")
+
+
+class PriceSummary(BaseModel):
+    """行情价格汇总"""
+    keyword: str = Field(..., description="搜索关键词")
+    count: int = Field(..., description="参与统计的商品数量")
+    total_found: int = Field(default=0, description="上游报告的总结果数量")
+    pages_fetched: int = Field(default=0, description="拉取的上游页数")
+    truncated: bool = Field(default=False, description="是否因达到数量上限而提前停止")
+    mean: Optional[float] = Field(default=None, description="平均价格")
+    min_price: Optional[int] = Field(default=None, description="最低价格")
+    max_price: Optional[int] = Field(default=None, description="最高价格")
+    percentiles: Dict[str, float] = Field(default_factory=dict, description="分位数（估计值）")
+    on_sale: StatusSummary = Field(default_factory=StatusSummary, description="在售商品")
+    sold: StatusSummary = Field(default_factory=StatusSummary, description="已售商品")
+    histogram: List[HistogramBucket] = Field(default_factory=list, description="价格直方图")
+
+
+class _RunningStats:
+    """数量、总和、中位数的流式统计"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.median = P2Quantile(0.5)
+
+    def add(self, price: int) -> None:
+        self.count += 1
+        self.total += price
+        self.median.add(price)
+
+    def summary(self) -> StatusSummary:
+        return StatusSummary(
+            count=self.count,
+            mean=self.total / self.count if self.count else None,
+            median=self.median.value()
+        )
+
+
+class PriceSummaryAccumulator:
+    """单次遍历的价格汇总累加器，内存占用与样本数量无关"""
+
+    def __init__(self, quantiles: Sequence[float] = DEFAULT_QUANTILES,
+                 edges: Sequence[int] = HISTOGRAM_EDGES):
+        self._overall = _RunningStats()
+        self._quantiles = [P2Quantile(p) for p in quantiles if p != 0.5]
+        self._on_sale = _RunningStats()
+        self._sold = _RunningStats()
+        self._edges = list(edges)
+        self._bucket_counts = [0] * len(self._edges)
+        self.min_price: Optional[int] = None
+        self.max_price: Optional[int] = None
+
+    @property
+    def count(self) -> int:
+        return self._overall.count
+
+    def add(self, price: int, status: Optional[str] = None) -> None:
+        """加入一个商品价格"""
+        self._overall.add(price)
+        for estimator in self._quantiles:
+            estimator.add(price)
+        (self._sold if is_sold_status(status) else self._on_sale).add(price)
+        bucket = max(bisect.bisect_right(self._edges, price) - 1, 0)
+        self._bucket_counts[bucket] += 1
+        if self.min_price is None or price < self.min_price:
+            self.min_price = price
+        if self.max_price is None or price > self.max_price:
+            self.max_price = price
+
+    def result(self, keyword: str) -> PriceSummary:
+        """生成汇总结果"""
+        estimators = [self._overall.median] + self._quantiles
+        percentiles = {
+            f"p{round(estimator.p * 100)}": estimator.value()
+            for estimator in sorted(estimators, key=lambda e: e.p)
+            if estimator.value() is not None
+        }
+        histogram = [
+            HistogramBucket(
+                lower=self._edges[i],
+                upper=self._edges[i + 1] if i + 1 < len(self._edges) else None,
+                count=count
+            )
+            for i, count in enumerate(self._bucket_counts)
+            if count
+        ]
+        overall = self._overall.summary()
+        return PriceSummary(
+            keyword=keyword,
+            count=overall.count,
+            mean=overall.mean,
+            min_price=self.min_price,
+            max_price=self.max_price,
+            percentiles=percentiles,
+            on_sale=self._on_sale.summary(),
+            sold=self._sold.summary(),
+            histogram=histogram
+        )
+
+
+async def collect_price_summary(
+    client: MercapiClient,
+    keyword: str,
+    max_items: int = 500,
+    category_id: Optional[int] = None,
+    price_min: Optional[int] = None,
+    price_max: Optional[int] = None,
+    condition: Optional[str] = None,
+    status: Optional[str] = None
+) -> PriceSummary:
+    """流式拉取最多 max_items 个商品并汇总价格（不请求卖家信息）"""
+    accumulator = PriceSummaryAccumulator()
+    total_found = 0
+    pages_fetched = 0
+    truncated = False
+
+    async for page in client.iter_search_pages(
+        keyword,
+        category_ids=[int(category_id)] if category_id is not None else None,
+        price_min=price_min,
+        price_max=price_max,
+        condition=condition,
+        status=status
+    ):
+        pages_fetched += 1
+        total_found = page.total_count
+        for item in page.items:
+            if accumulator.count >= max_items:
+                truncated = True
+                break
+            accumulator.add(item.price, item.status)
+        if truncated or accumulator.count >= max_items:
+            truncated = truncated or bool(page.next_page_token)
+            break
+
+    summary = accumulator.result(keyword)
+    summary.total_found = total_found
+    summary.pages_fetched = pages_fetched
+    summary.truncated = truncated
+    return summary
@@ -0,0 +1,278 @@
+"""
+性能诊断 - 慢调用日志（分阶段耗时与上游请求次数）与按需采样CPU分析
+"""
+
+import asyncio
+import json
+import logging
+import logging.handlers
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from .config import env_flag, env_float, env_int, env_str
+
+logger = logging.getLogger(__name__)
+
+# 名称以此前缀开头的阶段计为上游请求
+UPSTREAM_STAGE_PREFIX = "mercapi."
+
+# 采样间隔（秒）与单次分析的最长时间
+PROFILE_INTERVAL = 0.005
+MAX_PROFILE_SECONDS = 120.0
+
+# 分析摘要中列出的函数数量
+PROFILE_TOP_FUNCTIONS = 15
+
+
+class CallRecord:
+    """一次工具调用的分阶段耗时记录（通过contextvar在调用内的各阶段间共享）"""
+
+    def __init__(self, tool: str, arguments: Dict[str, Any]):
+        self.tool = tool
+        self.arguments = arguments
+        self.started = time.perf_counter()
+        self.stage_ms: Dict[str, float] = {}
+        self.stage_counts: Counter = Counter()
+
+    def add_stage(self, name: str, elapsed_ms: float) -> None:
+        self.stage_ms[name] = self.stage_ms.get(name, 0.0) + elapsed_ms
+        self.stage_counts[name] += 1
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def to_dict(self, error: bool = False) -> Dict[str, Any]:
+        return {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "tool": self.tool,
+            "duration_ms": round(self.elapsed_ms(), 1),
+            "error": error,
+            "arguments": self.arguments,
+            "stages": {
+                name: {"count": self.stage_counts[name], "ms": round(ms, 1)}
+                for name, ms in sorted(self.stage_ms.items(), key=lambda pair: -pair[1])
+            },
+            "upstream_calls": {
+                name: count for name, count in self.stage_counts.items()
+                if name.startswith(UPSTREAM_STAGE_PREFIX)
+            },
+        }
+
+
+_current_call: ContextVar[Optional[CallRecord]] = ContextVar("mercari_mcp_current_call", default=None)
+
+
+def current_call() -> Optional[CallRecord]:
+    """当前工具调用的耗时记录（未启用慢调用日志时为None）"""
+    return _current_call.get()
+
+
+@contextmanager
+def stage_timer(record: CallRecord, name: str) -> Iterator[None]:
+    """记录一个阶段的耗时"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record.add_stage(name, (time.perf_counter() - started) * 1000)
+
+
+class SlowCallLog:
+    """慢调用日志：超过阈值的工具调用以JSON行写入按大小轮转的日志文件"""
+
+    def __init__(self, path: Path, threshold_ms: float = 5000.0,
+                 max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5):
+        self.path = Path(path)
+        self.threshold_ms = threshold_ms
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        handler = logging.handlers.RotatingFileHandler(
+            self.path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        # 独立的logger，不向上传播到服务器日志
+        self._logger = logging.getLogger(f"{__name__}.slow_calls.{id(self)}")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        self._logger.addHandler(handler)
+        self._handler = handler
+
+    @contextmanager
+    def track(self, tool: str, arguments: Dict[str, Any]) -> Iterator[CallRecord]:
+        """记录一次工具调用，耗时超过阈值时写入日志"""
+        record = CallRecord(tool, arguments)
+        token = _current_call.set(record)
+        error = False
+        try:
+            yield record
+        except BaseException:
+            error = True
+            raise
+        finally:
+            _current_call.reset(token)
+            if record.elapsed_ms() >= self.threshold_ms:
+                self.write(record.to_dict(error=error))
+
+    def write(self, entry: Dict[str, Any]) -> None:
+        try:
+            self._logger.info(json.dumps(entry, ensure_ascii=False, default=str))
+        except Exception as e:
+            logger.warning(f"写入慢调用日志失败: {e}")
+
+    def close(self) -> None:
+        self._logger.removeHandler(self._handler)
+        self._handler.close()
+
+
+slow_call_log: Optional[SlowCallLog] = None
+
+
+@contextmanager
+def track_call(tool: str, arguments: Dict[str, Any]) -> Iterator[Optional[CallRecord]]:
+    """记录工具调用（未启用慢调用日志时为空操作）"""
+    if slow_call_log is None:
+        yield None
+        return
+    with slow_call_log.track(tool, arguments) as record:
+        yield record
+
+
+class ProfileResult(BaseModel):
+    """一次采样分析的结果"""
+    path: str = Field(..., description="折叠栈文件路径（可用 flamegraph.pl / speedscope 打开）")
+    seconds: float = Field(..., description="采样时长（秒）")
+    samples: int = Field(..., description="样本数")
+    top_functions: List[Tuple[str, int]] = Field(default_factory=list, description="自身耗时最多的函数及样本数")
+
+
+class SamplingProfiler:
+    """采样分析器：后台线程定时抓取目标线程（事件循环线程）的调用栈
+
+    相比cProfile，采样对被分析代码几乎没有额外开销，适合在线上进程中临时开启。
+    采样线程需要取得GIL，因此长时间占用事件循环的代码（正是要找的热点）最容易被采到。
+    """
+
+    def __init__(self, thread_id: int, interval: float = PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="mercari-mcp-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def top_functions(self, limit: int = PROFILE_TOP_FUNCTIONS) -> List[Tuple[str, int]]:
+        """按自身样本数（栈顶函数）排序"""
+        leaves: Counter = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return leaves.most_common(limit)
+
+    def write_collapsed(self, path: Path) -> None:
+        """写出折叠栈格式（每行：栈;栈;栈 样本数）"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+profile_dir = Path("profiles")
+_profile_lock: Optional[asyncio.Lock] = None
+
+
+async def run_profile(seconds: float = 10.0) -> ProfileResult:
+    """对事件循环线程采样指定时长，结果写入 profile_dir"""
+    global _profile_lock
+    if _profile_lock is None:
+        _profile_lock = asyncio.Lock()
+    if _profile_lock.locked():
+        raise Exception("已有采样分析正在进行")
+
+    seconds = min(max(seconds, 0.1), MAX_PROFILE_SECONDS)
+    async with _profile_lock:
+        profiler = SamplingProfiler(threading.get_ident())
+        logger.info(f"开始CPU采样分析: {seconds} 秒")
+        profiler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.stop()
+        path = profile_dir / f"profile-{datetime.now().strftime('%Y%m%d-%H%M%S')}.txt"
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, profiler.write_collapsed, path)
+        logger.info(f"CPU采样分析完成: {profiler.samples} 个样本, {path}")
+        return ProfileResult(
+            path=str(path),
+            seconds=seconds,
+            samples=profiler.samples,
+            top_functions=profiler.top_functions()
+        )
+
+
+def _on_profile_signal(seconds: float) -> None:
+    async def profile():
+        try:
+            await run_profile(seconds)
+        except Exception as e:
+            logger.warning(f"CPU采样分析失败: {e}")
+
+    asyncio.ensure_future(profile())
+
+
+def install_profile_signal(seconds: float = 10.0) -> bool:
+    """收到 SIGUSR2 时对事件循环采样分析（需在事件循环中调用，仅支持Unix）"""
+    if not hasattr(signal, "SIGUSR2"):
+        return False
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGUSR2, _on_profile_signal, seconds)
+    except (NotImplementedError, RuntimeError) as e:
+        logger.warning(f"无法注册采样分析信号: {e}")
+        return False
+    logger.info(f"已启用CPU采样分析信号: kill -USR2 <pid>（采样 {seconds} 秒）")
+    return True
+
+
+def configure_profiling_from_env() -> None:
+    """按环境变量启用慢调用日志与采样分析信号（需在事件循环中调用）"""
+    global slow_call_log, profile_dir
+    profile_dir = Path(env_str("MERCARI_MCP_PROFILE_DIR", "profiles"))
+    slow_log_path = env_str("MERCARI_MCP_SLOW_LOG")
+    if slow_log_path and slow_call_log is None:
+        slow_call_log = SlowCallLog(
+            Path(slow_log_path),
+            threshold_ms=env_float("MERCARI_MCP_SLOW_LOG_THRESHOLD_MS", 5000.0),
+            backup_count=env_int("MERCARI_MCP_SLOW_LOG_BACKUPS", 5)
+        )
+        logger.info(f"慢调用日志已启用: {slow_log_path}（阈值 {slow_call_log.threshold_ms:.0f}ms）")
+    if env_flag("MERCARI_MCP_PROFILE_SIGNAL"):
+        install_profile_signal(env_float("MERCARI_MCP_PROFILE_SECONDS", 10.0))
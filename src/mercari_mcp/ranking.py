@@ -0,0 +1,147 @@
+"""
+相关度排序 - 按批计算商品特征列并以可配置的加权公式打分
+"""
+
+import logging
+import math
+import statistics
+import time
+from array import array
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence
+
+from .text_utils import char_ngrams, normalize_text
+
+if TYPE_CHECKING:
+    from .mercapi_client import MercariItem
+
+logger = logging.getLogger(__name__)
+
+# 排序特征（均归一化到0-1，越大越好）
+RANKING_FEATURES = ("match", "price", "seller", "condition", "freshness", "available")
+
+# 默认特征权重（可通过 MERCARI_MCP_RANKING_WEIGHTS 覆盖，如 "match=0.5,price=0.2"）
+DEFAULT_RANKING_WEIGHTS: Dict[str, float] = {
+    "match": 0.4,
+    "price": 0.15,
+    "seller": 0.15,
+    "condition": 0.1,
+    "freshness": 0.1,
+    "available": 0.1,
+}
+
+# 商品状况ID对应的得分
+CONDITION_SCORES = {1: 1.0, 2: 0.85, 3: 0.7, 4: 0.45, 5: 0.25, 6: 0.1}
+
+# 新鲜度衰减的时间尺度（天）
+FRESHNESS_DAYS = 7.0
+
+# 缺失特征时使用的中性得分
+NEUTRAL_SCORE = 0.5
+
+
+def parse_ranking_weights(spec: Optional[str]) -> Dict[str, float]:
+    """解析 "特征=权重" 逗号分隔的权重配置，未指定的特征使用默认权重"""
+    weights = dict(DEFAULT_RANKING_WEIGHTS)
+    if not spec:
+        return weights
+    for part in spec.split(","):
+        name, _, value = part.partition("=")
+        name = name.strip()
+        if name not in RANKING_FEATURES:
+            logger.warning(f"忽略未知的排序特征: {name}")
+            continue
+        try:
+            weights[name] = float(value)
+        except ValueError:
+            logger.warning(f"忽略无效的排序权重: {part}")
+    return weights
+
+
+def _match_score(query_grams, query_key: str, name: str) -> float:
+    """关键词与商品名称的匹配度：完整包含为1，否则为关键词bigram的覆盖率"""
+    key = normalize_text(name)
+    if not query_key:
+        return NEUTRAL_SCORE
+    if query_key in key:
+        return 1.0
+    if not query_grams:
+        return 0.0
+    return len(query_grams & char_ngrams(key, 2)) / len(query_grams)
+
+
+def _price_score(price: int, median: Optional[float]) -> float:
+    """价格与本批中位数的偏离（对数距离），低于中位数的商品衰减更慢"""
+    if not median or price <= 0:
+        return NEUTRAL_SCORE
+    distance = math.log(price / median)
+    scale = math.log(4) if distance < 0 else math.log(3)
+    return max(0.0, 1.0 - abs(distance) / scale)
+
+
+def _seller_score(rating: Optional[float]) -> float:
+    """卖家评分（1-5）"""
+    if rating is None:
+        return NEUTRAL_SCORE
+    return min(max((rating - 1) / 4, 0.0), 1.0)
+
+
+def _freshness_score(created_time: Optional[str], now: float) -> float:
+    """上架时间的指数衰减"""
+    if not created_time:
+        return NEUTRAL_SCORE
+    try:
+        created = datetime.fromisoformat(created_time)
+    except ValueError:
+        return NEUTRAL_SCORE
+    age_days = max(now - created.timestamp(), 0.0) / 86400
+    return math.exp(-age_days / FRESHNESS_DAYS)
+
+
+class RankingFeatures:
+    """一批商品的特征列（每个特征一个 array('d')，与商品顺序一致）"""
+
+    def __init__(self, items: Sequence["MercariItem"], keyword: str, now: Optional[float] = None):
+        from .mercapi_client import is_sold_status
+
+        now = time.time() if now is None else now
+        query_key = normalize_text(keyword)
+        query_grams = char_ngrams(query_key, 2)
+        prices = [item.price for item in items if item.price > 0]
+        median = statistics.median(prices) if prices else None
+
+        self.size = len(items)
+        self.columns: Dict[str, array] = {
+            "match": array("d", (_match_score(query_grams, query_key, item.name) for item in items)),
+            "price": array("d", (_price_score(item.price, median) for item in items)),
+            "seller": array("d", (_seller_score(item.seller_rating) for item in items)),
+            "condition": array("d", (CONDITION_SCORES.get(item.condition_id or 0, NEUTRAL_SCORE) for item in items)),
+            "freshness": array("d", (_freshness_score(item.created_time, now) for item in items)),
+            "available": array("d", (0.0 if is_sold_status(item.status) else 1.0 for item in items)),
+        }
+
+    def score(self, weights: Dict[str, float]) -> List[float]:
+        """按权重对所有商品打分（按特征列累加）"""
+        total_weight = sum(abs(weights.get(name, 0.0)) for name in RANKING_FEATURES) or 1.0
+        scores = [0.0] * self.size
+        for name in RANKING_FEATURES:
+            weight = weights.get(name, 0.0) / total_weight
+            if not weight:
+                continue
+            column = self.columns[name]
+            for i in range(self.size):
+                scores[i] += weight * column[i]
+        return scores
+
+
+def rank_items(
+    items: Sequence["MercariItem"],
+    keyword: str,
+    weights: Optional[Dict[str, float]] = None,
+    now: Optional[float] = None
+) -> List["MercariItem"]:
+    """按相关度从高到低排序（同分时保持原顺序），并填充相关度得分"""
+    features = RankingFeatures(items, keyword, now=now)
+    scores = features.score(weights or DEFAULT_RANKING_WEIGHTS)
+    order = sorted(range(len(items)), key=lambda i: -scores[i])
+    return [items[i].model_copy(update={"relevance_score": round(scores[i], 4)}) for i in order]
@@ -0,0 +1,89 @@
+"""
+卖家 - 卖家资料模型、评分计算与卖家全部商品的汇总统计
+"""
+
+import statistics
+from typing import Any, List, Optional
+
+from pydantic import BaseModel, Field
+
+# 卖家商品的状态分区（上游 get_items 接口的 status 参数，各分区并发拉取）
+SELLER_ITEM_STATUSES = ("on_sale", "trading", "sold_out")
+
+# status 参数与状态分区的对应关系
+SELLER_STATUS_OPTIONS = {
+    "all": list(SELLER_ITEM_STATUSES),
+    "on_sale": ["on_sale"],
+    "sold_out": ["trading", "sold_out"],
+}
+
+
+class SellerProfile(BaseModel):
+    """卖家资料"""
+    id: str = Field(..., description="卖家ID")
+    name: str = Field(default="", description="卖家名称")
+    rating: Optional[float] = Field(None, description="卖家评分（1-5）")
+    num_ratings: int = Field(0, description="评价数")
+    num_sell_items: Optional[int] = Field(None, description="上游统计的出品数")
+    follower_count: Optional[int] = Field(None, description="关注者数")
+
+
+class SellerItemStats(BaseModel):
+    """卖家商品的汇总统计"""
+    listing_count: int = Field(..., description="商品数")
+    on_sale_count: int = Field(0, description="在售商品数")
+    sold_count: int = Field(0, description="已售出（含交易中）商品数")
+    sold_ratio: Optional[float] = Field(None, description="已售出比例")
+    price_min: Optional[int] = Field(None, description="最低价格")
+    price_max: Optional[int] = Field(None, description="最高价格")
+    price_avg: Optional[float] = Field(None, description="平均价格")
+    price_median: Optional[float] = Field(None, description="价格中位数")
+    newest_time: Optional[str] = Field(None, description="最近上架时间")
+    oldest_time: Optional[str] = Field(None, description="最早上架时间")
+
+
+def seller_rating(ratings: Any) -> Optional[float]:
+    """由好评/一般/差评数计算卖家评分（好评5分、一般3分、差评1分的加权平均）"""
+    if not ratings:
+        return None
+    good = getattr(ratings, 'good', 0) or 0
+    normal = getattr(ratings, 'normal', 0) or 0
+    bad = getattr(ratings, 'bad', 0) or 0
+    total = good + normal + bad
+    if total <= 0:
+        return None
+    return (good * 5 + normal * 3 + bad * 1) / total
+
+
+def parse_seller_profile(seller_id: str, profile: Any) -> SellerProfile:
+    """由mercapi的Profile构建卖家资料"""
+    return SellerProfile(
+        id=seller_id,
+        name=getattr(profile, 'name', '') or '',
+        rating=seller_rating(getattr(profile, 'ratings', None)),
+        num_ratings=getattr(profile, 'num_ratings', 0) or 0,
+        num_sell_items=getattr(profile, 'num_sell_items', None),
+        follower_count=getattr(profile, 'follower_count', None)
+    )
+
+
+def summarize_seller_items(items: List[Any]) -> SellerItemStats:
+    """汇总卖家商品的数量、售出比例、价格范围与上架时间（纯函数）"""
+    # 避免与 mercapi_client 循环导入
+    from .mercapi_client import is_sold_status
+
+    sold_count = sum(1 for item in items if is_sold_status(item.status))
+    prices = [item.price for item in items]
+    times = sorted(item.created_time for item in items if item.created_time)
+    return SellerItemStats(
+        listing_count=len(items),
+        on_sale_count=len(items) - sold_count,
+        sold_count=sold_count,
+        sold_ratio=round(sold_count / len(items), 3) if items else None,
+        price_min=min(prices) if prices else None,
+        price_max=max(prices) if prices else None,
+        price_avg=round(statistics.mean(prices), 1) if prices else None,
+        price_median=statistics.median(prices) if prices else None,
+        newest_time=times[-1] if times else None,
+        oldest_time=times[0] if times else None
+    )
@@ -3,7 +3,10 @@ Mercari MCP Server - 实现Mercari商品搜索的MCP智能体工具
 """
 
 import asyncio
+import functools
 import logging
+import time
+from pathlib import Path
 from typing import Any, Dict, List, Optional
 
 from mcp.server import NotificationOptions, Server
@@ -14,7 +17,26 @@ from mcp.types import (
     TextContent,
 )
 
-from .mercapi_client import MercapiClient
+from .config import env_flag, env_float, env_int, env_str
+from .cursors import CursorNotFoundError, ResultCursorStore
+from .export import EXPORT_FORMATS, export_search
+from .identity_pool import IdentityPool
+from .image_cache import ThumbnailSources, proxied_image_url
+from .jobs import (
+    JOB_CANCELLED, JOB_DONE, JOB_FAILED, JOB_QUEUED, JOB_RUNNING,
+    JobManager, JobNotFoundError, JobRejectedError
+)
+from .local_index import LocalListingIndex, format_age
+from .loop_health import configure_loop_health_from_env, offload
+from .mercapi_client import MercapiClient, MercariItem
+from .prefetch import DetailCache, DetailPrefetcher
+from .price_history import PriceHistoryStore, PriceStats
+from .price_summary import collect_price_summary
+from .profiling import configure_profiling_from_env, track_call
+from .ranking import parse_ranking_weights
+from .sellers import SELLER_STATUS_OPTIONS, summarize_seller_items
+from .tracing import configure_tracing_from_env, context_from_request, span
+from .watch import WatchConfig, WatchManager, WatchNotifier
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
@@ -22,13 +44,104 @@ logger = logging.getLogger(__name__)
 
 # 创建MCP服务器实例
 server = Server("mercari-mcp")
-mercapi_client = MercapiClient()
+# 本地商品索引（设置 MERCARI_MCP_LOCAL_INDEX=1 启用）
+local_index = (
+    LocalListingIndex(max_items=env_int("MERCARI_MCP_LOCAL_INDEX_MAX_ITEMS", 100000))
+    if env_flag("MERCARI_MCP_LOCAL_INDEX") else None
+)
+# 价格历史（默认启用，设置 MERCARI_MCP_PRICE_HISTORY=0 关闭）
+price_history = (
+    PriceHistoryStore(
+        max_items=env_int("MERCARI_MCP_PRICE_HISTORY_MAX_ITEMS", 50000),
+        max_age=env_float("MERCARI_MCP_PRICE_HISTORY_MAX_AGE_DAYS", 30.0) * 86400
+    )
+    if env_flag("MERCARI_MCP_PRICE_HISTORY", True) else None
+)
+# 主数据（分类树等）的磁盘缓存目录
+cache_dir = Path(env_str("MERCARI_MCP_CACHE_DIR", str(Path.home() / ".cache" / "mercari-mcp")))
+# export_search工具的输出目录
+export_dir = Path(env_str("MERCARI_MCP_EXPORT_DIR", "exports"))
+# 图片代理（设置 MERCARI_MCP_IMAGE_PROXY_BASE 后，结果中的缩略图输出为 <地址>/img/<商品ID>）
+image_proxy_base = env_str("MERCARI_MCP_IMAGE_PROXY_BASE")
+image_proxy_width = env_int("MERCARI_MCP_IMAGE_PROXY_WIDTH", 0)
+thumbnail_sources = ThumbnailSources()
+# 搜索结果会话（search工具返回游标，next_page 从内存翻页）
+cursor_store = ResultCursorStore(
+    idle_timeout=env_float("MERCARI_MCP_CURSOR_IDLE_SECONDS", 600.0),
+    max_bytes=env_int("MERCARI_MCP_CURSOR_MAX_MB", 64) * 1024 * 1024
+)
+# 上游身份池（多个独立的mercapi实例分摊请求，设置 MERCARI_MCP_IDENTITY_POOL_SIZE 调整数量）
+identity_pool = IdentityPool(
+    size=env_int("MERCARI_MCP_IDENTITY_POOL_SIZE", 1),
+    cooldown_seconds=env_float("MERCARI_MCP_IDENTITY_COOLDOWN", 60.0)
+)
+# 商品详情预取（设置 MERCARI_MCP_PREFETCH_TOP_K>0 启用，搜索后在后台预取前K个商品的详情）
+prefetch_top_k = env_int("MERCARI_MCP_PREFETCH_TOP_K", 0)
+detail_cache = (
+    DetailCache(ttl_seconds=env_float("MERCARI_MCP_DETAIL_CACHE_TTL", 300.0))
+    if prefetch_top_k > 0 else None
+)
+# get_mercari_seller_items 最多拉取的商品数
+MAX_SELLER_ITEMS = 1000
+# 后台任务（支持的工具设置 run_as_job=true 时以任务方式执行）
+job_manager = JobManager(
+    workers=env_int("MERCARI_MCP_JOB_WORKERS", 2),
+    max_queue=env_int("MERCARI_MCP_JOB_QUEUE_SIZE", 50),
+    per_session_limit=env_int("MERCARI_MCP_JOB_SESSION_LIMIT", 5),
+    result_ttl=env_float("MERCARI_MCP_JOB_RESULT_TTL", 1800.0)
+)
+# 支持后台任务的工具，以及 get_job_result 最长的等待时间（秒）
+JOB_TOOLS = (
+    "search_mercari_items", "search_mercari_by_category", "get_mercari_seller_items",
+    "mercari_price_summary", "export_search",
+)
+MAX_JOB_WAIT_SECONDS = 60.0
+# Mercapi客户端与关注搜索管理器在首次调用工具时才创建，不拖慢服务器启动和list_tools
+mercapi_client: Optional[MercapiClient] = None
+watch_manager: Optional[WatchManager] = None
+detail_prefetcher: Optional[DetailPrefetcher] = None
+
+
+def get_mercapi_client() -> MercapiClient:
+    """获取Mercapi客户端（首次调用时创建）"""
+    global mercapi_client
+    if mercapi_client is None:
+        mercapi_client = MercapiClient(
+            local_index=local_index,
+            price_history=price_history,
+            cache_dir=cache_dir,
+            ranking_weights=parse_ranking_weights(env_str("MERCARI_MCP_RANKING_WEIGHTS")),
+            detail_cache=detail_cache,
+            identity_pool=identity_pool
+        )
+    return mercapi_client
+
+
+def get_detail_prefetcher() -> Optional[DetailPrefetcher]:
+    """获取商品详情预取器（未启用时为None）"""
+    global detail_prefetcher
+    if detail_prefetcher is None and detail_cache is not None:
+        detail_prefetcher = DetailPrefetcher(
+            get_mercapi_client(),
+            detail_cache,
+            top_k=prefetch_top_k,
+            rate_per_second=env_float("MERCARI_MCP_PREFETCH_RATE", 1.0)
+        )
+    return detail_prefetcher
+
+
+def get_watch_manager() -> WatchManager:
+    """获取关注搜索管理器（首次调用时创建）"""
+    global watch_manager
+    if watch_manager is None:
+        watch_manager = WatchManager(get_mercapi_client())
+    return watch_manager
 
 
 @server.list_tools()
 async def handle_list_tools() -> List[Tool]:
     """列出可用的工具"""
-    return [
+    tools = [
         Tool(
             name="search_mercari_items",
             description="搜索Mercari商品",
@@ -47,6 +160,10 @@ async def handle_list_tools() -> List[Tool]:
                         "type": "string",
                         "description": "品牌ID（可选）"
                     },
+                    "brand_name": {
+                        "type": "string",
+                        "description": "品牌名称或别名（可选，如：Nike、ナイキ、耐克），自动解析为品牌ID"
+                    },
                     "price_min": {
                         "type": "integer",
                         "description": "最低价格（可选）"
@@ -61,7 +178,7 @@ async def handle_list_tools() -> List[Tool]:
                     },
                     "sort": {
                         "type": "string",
-                        "description": "排序方式（可选）：created_time, price, popular",
+                        "description": "排序方式（可选）：created_time, price, popular, relevance（本地相关度排序）",
                         "default": "created_time"
                     },
                     "order": {
@@ -71,13 +188,18 @@ async def handle_list_tools() -> List[Tool]:
                     },
                     "page": {
                         "type": "integer",
-                        "description": "页码（可选）",
+                        "description": "页码（可选，后续页建议使用返回的游标调用 next_page）",
                         "default": 1
                     },
                     "limit": {
                         "type": "integer",
                         "description": "每页数量（可选）",
                         "default": 20
+                    },
+                    "collapse_duplicates": {
+                        "type": "boolean",
+                        "description": "是否折叠近似重复的商品（同款多次上架、标题略有不同），每组只保留一个（可选）",
+                        "default": False
                     }
                 },
                 "required": ["keyword"]
@@ -105,7 +227,11 @@ async def handle_list_tools() -> List[Tool]:
                 "properties": {
                     "category_name": {
                         "type": "string",
-                        "description": "分类名称（如：电子产品、服装、书籍等）"
+                        "description": "分类名称，支持日文/中文/英文或分类ID（如：电子产品、服装、书籍、カメラ等）"
+                    },
+                    "keyword": {
+                        "type": "string",
+                        "description": "在分类内搜索的关键词（可选）"
                     },
                     "price_min": {
                         "type": "integer",
@@ -121,34 +247,581 @@ async def handle_list_tools() -> List[Tool]:
                     },
                     "sort": {
                         "type": "string",
-                        "description": "排序方式（可选）：created_time, price, popular",
+                        "description": "排序方式（可选）：created_time, price, popular, relevance（本地相关度排序）",
                         "default": "created_time"
                     },
                     "page": {
                         "type": "integer",
-                        "description": "页码（可选）",
+                        "description": "页码（可选，后续页建议使用返回的游标调用 next_page）",
                         "default": 1
                     },
                     "limit": {
                         "type": "integer",
                         "description": "每页数量（可选）",
                         "default": 20
+                    },
+                    "collapse_duplicates": {
+                        "type": "boolean",
+                        "description": "是否折叠近似重复的商品（同款多次上架、标题略有不同），每组只保留一个（可选）",
+                        "default": False
                     }
                 },
                 "required": ["category_name"]
             }
+        ),
+        Tool(
+            name="search_local_index",
+            description="在本地商品索引中离线搜索（不请求Mercari，结果附带数据时效）",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "keyword": {
+                        "type": "string",
+                        "description": "全文检索关键词，匹配名称和描述（可选）"
+                    },
+                    "category_id": {
+                        "type": "integer",
+                        "description": "分类ID（可选）"
+                    },
+                    "price_min": {
+                        "type": "integer",
+                        "description": "最低价格（可选）"
+                    },
+                    "price_max": {
+                        "type": "integer",
+                        "description": "最高价格（可选）"
+                    },
+                    "sort": {
+                        "type": "string",
+                        "description": "排序方式（可选）：created_time, price",
+                        "default": "created_time"
+                    },
+                    "order": {
+                        "type": "string",
+                        "description": "排序顺序（可选）：asc, desc",
+                        "default": "desc"
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "返回数量（可选）",
+                        "default": 20
+                    }
+                }
+            }
+        ),
+        Tool(
+            name="register_watch",
+            description="注册关注搜索，后台定时轮询并增量发现新上架商品",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "keyword": {
+                        "type": "string",
+                        "description": "搜索关键词"
+                    },
+                    "category_id": {
+                        "type": "integer",
+                        "description": "分类ID（可选）"
+                    },
+                    "price_min": {
+                        "type": "integer",
+                        "description": "最低价格（可选）"
+                    },
+                    "price_max": {
+                        "type": "integer",
+                        "description": "最高价格（可选）"
+                    },
+                    "interval_seconds": {
+                        "type": "number",
+                        "description": "轮询间隔秒数（可选，最小10秒）",
+                        "default": 60
+                    },
+                    "jitter_seconds": {
+                        "type": "number",
+                        "description": "轮询随机抖动秒数（可选，默认为间隔的10%）"
+                    }
+                },
+                "required": ["keyword"]
+            }
+        ),
+        Tool(
+            name="list_watches",
+            description="列出所有关注搜索及其轮询状态",
+            inputSchema={
+                "type": "object",
+                "properties": {}
+            }
+        ),
+        Tool(
+            name="remove_watch",
+            description="删除关注搜索",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "watch_id": {
+                        "type": "string",
+                        "description": "关注ID"
+                    }
+                },
+                "required": ["watch_id"]
+            }
+        ),
+        Tool(
+            name="get_watch_updates",
+            description="获取关注搜索发现的新商品（读取后清除）",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "watch_id": {
+                        "type": "string",
+                        "description": "关注ID（可选，不填则返回所有关注的新商品）"
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "返回数量（可选）",
+                        "default": 50
+                    }
+                }
+            }
+        ),
+        Tool(
+            name="get_price_history",
+            description="获取商品的价格历史（来自本服务器记录的搜索和详情观测值）",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "item_id": {
+                        "type": "string",
+                        "description": "商品ID"
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "返回最近的观测数量（可选）",
+                        "default": 50
+                    }
+                },
+                "required": ["item_id"]
+            }
+        ),
+        Tool(
+            name="price_stats",
+            description="统计单个商品或某个关键词下商品的最低/最高/中位数价格和降价事件（中位数按记录的价格变化点计算，不按价格持续时间加权）",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "item_id": {
+                        "type": "string",
+                        "description": "商品ID（与keyword二选一）"
+                    },
+                    "keyword": {
+                        "type": "string",
+                        "description": "搜索关键词（与item_id二选一）"
+                    },
+                    "max_events": {
+                        "type": "integer",
+                        "description": "返回最近的降价事件数量（可选）",
+                        "default": 10
+                    }
+                }
+            }
+        ),
+        Tool(
+            name="mercari_price_summary",
+            description="汇总某个关键词的行情价格（分位数、均值、在售/已售对比、直方图），不返回商品列表",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "keyword": {
+                        "type": "string",
+                        "description": "搜索关键词"
+                    },
+                    "max_items": {
+                        "type": "integer",
+                        "description": "最多统计的商品数量（可选，上限5000）",
+                        "default": 500
+                    },
+                    "category_id": {
+                        "type": "integer",
+                        "description": "分类ID（可选）"
+                    },
+                    "price_min": {
+                        "type": "integer",
+                        "description": "最低价格（可选）"
+                    },
+                    "price_max": {
+                        "type": "integer",
+                        "description": "最高价格（可选）"
+                    },
+                    "condition": {
+                        "type": "string",
+                        "description": "商品状态（可选，可用逗号分隔多个）：new, like_new, good, fair, poor"
+                    },
+                    "status": {
+                        "type": "string",
+                        "description": "销售状态（可选）：on_sale, sold_out，不填则全部统计"
+                    }
+                },
+                "required": ["keyword"]
+            }
+        ),
+        Tool(
+            name="export_search",
+            description="将搜索结果的所有页流式导出为NDJSON/Parquet文件（中断后再次调用可续传）",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "keyword": {
+                        "type": "string",
+                        "description": "搜索关键词"
+                    },
+                    "file_name": {
+                        "type": "string",
+                        "description": "输出文件名（保存在服务器的导出目录中）"
+                    },
+                    "format": {
+                        "type": "string",
+                        "description": "导出格式（可选）：ndjson, parquet",
+                        "default": "ndjson"
+                    },
+                    "max_items": {
+                        "type": "integer",
+                        "description": "最多导出的商品数量（可选，累计）"
+                    },
+                    "max_pages": {
+                        "type": "integer",
+                        "description": "本次调用最多拉取的页数（可选）"
+                    },
+                    "resume": {
+                        "type": "boolean",
+                        "description": "是否从上次中断处继续（可选）",
+                        "default": True
+                    },
+                    "category_id": {
+                        "type": "integer",
+                        "description": "分类ID（可选）"
+                    },
+                    "price_min": {
+                        "type": "integer",
+                        "description": "最低价格（可选）"
+                    },
+                    "price_max": {
+                        "type": "integer",
+                        "description": "最高价格（可选）"
+                    },
+                    "condition": {
+                        "type": "string",
+                        "description": "商品状态（可选，可用逗号分隔多个）：new, like_new, good, fair, poor"
+                    },
+                    "status": {
+                        "type": "string",
+                        "description": "销售状态（可选）：on_sale, sold_out"
+                    }
+                },
+                "required": ["keyword", "file_name"]
+            }
+        ),
+        Tool(
+            name="resolve_brand",
+            description="将品牌名称或别名解析为Mercari品牌ID（本地品牌词典，支持前缀匹配）",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "name": {
+                        "type": "string",
+                        "description": "品牌名称、别名或前缀（如：Nike、ナイキ、耐克）"
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "返回数量（可选）",
+                        "default": 10
+                    }
+                },
+                "required": ["name"]
+            }
+        ),
+        Tool(
+            name="next_page",
+            description="使用搜索结果中的游标获取下一页（直接从服务器缓存的结果返回，必要时才继续请求上游）",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "cursor": {
+                        "type": "string",
+                        "description": "上一页结果中的游标"
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "每页数量（可选，默认与上一页相同）"
+                    }
+                },
+                "required": ["cursor"]
+            }
+        ),
+        Tool(
+            name="get_mercari_seller_items",
+            description="获取卖家的全部出品（在售、交易中、已售出），并汇总商品数、价格范围和售出比例",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "seller_id": {
+                        "type": "string",
+                        "description": "卖家ID（搜索结果和商品详情中的卖家ID）"
+                    },
+                    "status": {
+                        "type": "string",
+                        "description": "销售状态（可选）：all, on_sale, sold_out（含交易中）",
+                        "default": "all"
+                    },
+                    "price_min": {
+                        "type": "integer",
+                        "description": "最低价格（可选）"
+                    },
+                    "price_max": {
+                        "type": "integer",
+                        "description": "最高价格（可选）"
+                    },
+                    "sort": {
+                        "type": "string",
+                        "description": "排序方式（可选）：created_time, price",
+                        "default": "created_time"
+                    },
+                    "order": {
+                        "type": "string",
+                        "description": "排序顺序（可选）：asc, desc",
+                        "default": "desc"
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "每页数量（可选，后续页使用返回的游标调用 next_page）",
+                        "default": 20
+                    },
+                    "max_items": {
+                        "type": "integer",
+                        "description": "最多拉取的商品数（可选，上限1000）",
+                        "default": 300
+                    },
+                    "collapse_duplicates": {
+                        "type": "boolean",
+                        "description": "是否折叠近似重复的商品（可选）",
+                        "default": False
+                    }
+                },
+                "required": ["seller_id"]
+            }
+        ),
+        Tool(
+            name="get_job_result",
+            description="获取后台任务的状态和结果（可等待任务完成）",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "job_id": {
+                        "type": "string",
+                        "description": "提交任务时返回的任务ID"
+                    },
+                    "wait_seconds": {
+                        "type": "number",
+                        "description": "任务未完成时最多等待的秒数（可选，上限60）",
+                        "default": 0
+                    }
+                },
+                "required": ["job_id"]
+            }
+        ),
+        Tool(
+            name="cancel_job",
+            description="取消后台任务",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "job_id": {
+                        "type": "string",
+                        "description": "任务ID"
+                    }
+                },
+                "required": ["job_id"]
+            }
         )
     ]
+    return _with_job_options(tools)
+
+
+# 支持后台任务的工具附加的参数
+JOB_OPTION_SCHEMA = {
+    "run_as_job": {
+        "type": "boolean",
+        "description": "是否以后台任务方式执行（可选，立即返回任务ID，使用 get_job_result 获取结果；相同请求会复用已有任务）",
+        "default": False
+    },
+    "job_priority": {
+        "type": "string",
+        "description": "后台任务优先级（可选）：high, normal, low",
+        "default": "normal"
+    }
+}
+
+# 任务状态的显示文本
+JOB_STATUS_LABELS = {
+    JOB_QUEUED: "⏳ 排队中",
+    JOB_RUNNING: "🔄 执行中",
+    JOB_DONE: "✅ 已完成",
+    JOB_FAILED: "❌ 失败",
+    JOB_CANCELLED: "🚫 已取消",
+}
+
+
+def _with_job_options(tools: List[Tool]) -> List[Tool]:
+    """为耗时较长的工具添加后台任务参数"""
+    for tool in tools:
+        if tool.name in JOB_TOOLS:
+            tool.inputSchema["properties"].update(JOB_OPTION_SCHEMA)
+    return tools
+
+
+def _thumbnail_url(item: MercariItem) -> str:
+    """结果中展示的缩略图地址（配置了图片代理时输出代理地址）"""
+    if not image_proxy_base or not item.thumbnail:
+        return item.thumbnail
+    thumbnail_sources.remember(item.id, item.thumbnail)
+    return proxied_image_url(image_proxy_base, item.id, image_proxy_width)
+
+
+def _format_cursor(cursor: Optional[str]) -> str:
+    """结果游标提示（最后附带空行，与商品列表分隔）"""
+    if not cursor:
+        return "\n"
+    return f"🔖 下一页游标: {cursor}（使用 next_page 工具获取）\n\n"
+
+
+def _schedule_prefetch(items: List[MercariItem]) -> None:
+    """登记搜索结果中排名靠前的商品，在后台预取详情（未启用预取时为空操作）"""
+    prefetcher = get_detail_prefetcher()
+    if prefetcher is not None and items:
+        prefetcher.schedule(items)
+
+
+def _format_search_items(items: List[MercariItem], thumbnails: Optional[List[str]] = None, start: int = 1) -> str:
+    """格式化搜索结果中的商品列表（纯函数，大批量时可移到线程池/进程池执行）"""
+    if not items:
+        return "❌ 没有找到匹配的商品\n"
+    result_text = ""
+    for i, item in enumerate(items, start):
+        result_text += f"🛍️ 商品 {i}:\n"
+        result_text += f"   📝 ID: {item.id}\n"
+        result_text += f"   🏷️ 名称: {item.name}\n"
+        result_text += f"   💰 价格: ¥{item.price:,}\n"
+        if item.relevance_score is not None:
+            result_text += f"   🎯 相关度: {item.relevance_score:.2f}\n"
+        result_text += f"   📦 状态: {item.status}\n"
+        result_text += f"   👤 卖家: {item.seller_name}"
+        result_text += f" (ID: {item.seller_id})\n" if item.seller_id else "\n"
+        if item.seller_rating:
+            result_text += f"   ⭐ 卖家评分: {item.seller_rating}\n"
+        if item.brand_name:
+            result_text += f"   🏢 品牌: {item.brand_name}\n"
+        if item.category_name:
+            result_text += f"   📂 分类: {item.category_name}\n"
+        if item.url:
+            result_text += f"   🔗 链接: {item.url}\n"
+        if thumbnails is not None:
+            result_text += f"   🖼️ 缩略图: {thumbnails[i - start]}\n"
+        result_text += f"   📅 创建时间: {item.created_time}\n"
+        if item.duplicate_count:
+            more = " 等" if item.duplicate_count > 5 else ""
+            result_text += (
+                f"   🔁 近似重复: 另有 {item.duplicate_count} 个"
+                f"（{'、'.join(item.duplicate_ids[:5])}{more}）\n"
+            )
+        result_text += "\n"
+    return result_text
+
+
+def _make_watch_notifier() -> Optional[WatchNotifier]:
+    """为当前会话创建新商品通知回调（以MCP日志通知推送）"""
+    try:
+        session = server.request_context.session
+    except LookupError:
+        return None
+    
+    async def notify(config: WatchConfig, items: List[MercariItem]) -> None:
+        await session.send_log_message(
+            level="info",
+            data={
+                "watch_id": config.id,
+                "keyword": config.keyword,
+                "new_items": [
+                    {"id": item.id, "name": item.name, "price": item.price, "url": item.url}
+                    for item in items
+                ]
+            },
+            logger="mercari-watch"
+        )
+    
+    return notify
 
 
 @server.call_tool()
 async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> List[TextContent]:
-    """处理工具调用"""
+    """处理工具调用（启用追踪时记录工具调用span，并沿用调用方的追踪上下文）"""
+    try:
+        parent = context_from_request(server.request_context)
+    except LookupError:
+        parent = None
+    attributes = {"mcp.tool": name, "search.keyword": arguments.get("keyword")}
+    with span("mcp.tool_call", attributes, context=parent) as current:
+        if arguments.get("run_as_job") and name in JOB_TOOLS:
+            result = _submit_job(name, arguments)
+        else:
+            with track_call(name, arguments):
+                result = await _call_tool(name, arguments)
+        current.set_attribute("mcp.error", any(content.text.startswith("❌") for content in result))
+        return result
+
+
+def _session_key() -> Optional[str]:
+    """当前MCP会话的标识（用于后台任务的会话配额与访问控制）"""
+    try:
+        return str(id(server.request_context.session))
+    except LookupError:
+        return None
+
+
+def _submit_job(name: str, arguments: Dict[str, Any]) -> List[TextContent]:
+    """以后台任务方式提交工具调用，立即返回任务ID"""
+    tool_arguments = {key: value for key, value in arguments.items() if key not in JOB_OPTION_SCHEMA}
+    
+    async def run() -> List[TextContent]:
+        with span("job.run", {"mcp.tool": name}), track_call(name, tool_arguments):
+            result = await _call_tool(name, tool_arguments)
+        # 工具以"❌"文本返回错误；记为失败，避免相同请求复用失败的结果
+        if any(content.text.startswith("❌") for content in result):
+            raise Exception("\n".join(content.text.replace("❌ ", "", 1) for content in result))
+        return result
+    
+    try:
+        job, attached = job_manager.submit(
+            name, tool_arguments, run,
+            session_key=_session_key(),
+            priority=arguments.get("job_priority", "normal")
+        )
+    except JobRejectedError as e:
+        return [TextContent(type="text", text=f"❌ {str(e)}")]
+    
+    result_text = "♻️ 相同请求的任务已存在，返回该任务\n" if attached else "🧾 已提交后台任务\n"
+    result_text += f"🆔 任务ID: {job.job_id}\n"
+    result_text += f"🔧 工具: {name}\n"
+    result_text += f"📌 状态: {JOB_STATUS_LABELS[job.status]}\n"
+    result_text += "💡 使用 get_job_result 工具获取结果\n"
+    return [TextContent(type="text", text=result_text)]
+
+
+async def _call_tool(name: str, arguments: Dict[str, Any]) -> List[TextContent]:
+    """执行工具调用"""
     
     if name == "search_mercari_items":
         try:
             # 提取搜索参数
-            keyword = arguments.get("keyword")
+            keyword = arguments.get("keyword", "")
             category_id = arguments.get("category_id")
             brand_id = arguments.get("brand_id")
             price_min = arguments.get("price_min")
@@ -158,10 +831,25 @@ async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> List[TextCon
             order = arguments.get("order", "desc")
             page = arguments.get("page", 1)
             limit = arguments.get("limit", 20)
+            collapse_duplicates = arguments.get("collapse_duplicates", False)
             
-            # 执行搜索
-            search_result = await mercapi_client.search_items(
-                keyword=keyword,
+            # 将品牌名称解析为品牌ID（优先精确匹配）
+            brand_name = arguments.get("brand_name")
+            brand_matches = []
+            if brand_name:
+                brand_index = await get_mercapi_client().get_brand_index()
+                if brand_index is None:
+                    return [TextContent(type="text", text="❌ 品牌词典暂不可用，请使用 brand_id")]
+                brand_matches = brand_index.resolve(brand_name, limit=5)
+                exact_matches = [match for match in brand_matches if match.exact]
+                brand_matches = exact_matches or brand_matches
+                if not brand_matches:
+                    return [TextContent(type="text", text=f"❌ 未找到品牌: {brand_name}")]
+            
+            # 执行搜索（结果保存在服务器端会话中，后续页由 next_page 从内存返回）
+            fetch = functools.partial(
+                get_mercapi_client().search_batch,
+                keyword,
                 category_id=category_id,
                 brand_id=brand_id,
                 price_min=price_min,
@@ -169,37 +857,35 @@ async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> List[TextCon
                 condition=condition,
                 sort=sort,
                 order=order,
-                page=page,
-                limit=limit
+                brand_ids=[match.id for match in brand_matches],
+                collapse_duplicates=collapse_duplicates
+            )
+            search_result = await cursor_store.open(
+                fetch, offset=(page - 1) * limit, limit=limit,
+                context={"title": f"🔍 搜索结果（关键词：{keyword}）", "thumbnails": True}
             )
+            _schedule_prefetch(search_result.items)
             
             # 格式化结果
             result_text = f"🔍 搜索结果（关键词：{keyword}）\n"
+            if brand_matches:
+                result_text += "🏢 品牌筛选: " + "、".join(
+                    f"{match.name} (ID: {match.id})" for match in brand_matches
+                ) + "\n"
             result_text += f"📊 总共找到 {search_result.total_count} 个商品\n"
             result_text += f"📄 当前第 {search_result.current_page} 页\n"
-            result_text += f"➡️ {'有' if search_result.has_next else '没有'}下一页\n\n"
+            if search_result.collapsed_count:
+                result_text += f"🔁 已折叠 {search_result.collapsed_count} 个近似重复商品\n"
+            result_text += f"➡️ {'有' if search_result.has_next else '没有'}下一页\n"
+            result_text += _format_cursor(search_result.cursor)
             
-            if not search_result.items:
-                result_text += "❌ 没有找到匹配的商品\n"
-            else:
-                for i, item in enumerate(search_result.items, 1):
-                    result_text += f"🛍️ 商品 {i}:\n"
-                    result_text += f"   📝 ID: {item.id}\n"
-                    result_text += f"   🏷️ 名称: {item.name}\n"
-                    result_text += f"   💰 价格: ¥{item.price:,}\n"
-                    result_text += f"   📦 状态: {item.status}\n"
-                    result_text += f"   👤 卖家: {item.seller_name}\n"
-                    if item.seller_rating:
-                        result_text += f"   ⭐ 卖家评分: {item.seller_rating}\n"
-                    if item.brand_name:
-                        result_text += f"   🏢 品牌: {item.brand_name}\n"
-                    if item.category_name:
-                        result_text += f"   📂 分类: {item.category_name}\n"
-                    if item.url:
-                        result_text += f"   🔗 链接: {item.url}\n"
-                    result_text += f"   🖼️ 缩略图: {item.thumbnail}\n"
-                    result_text += f"   📅 创建时间: {item.created_time}\n"
-                    result_text += "\n"
+            # 缩略图地址在事件循环中生成（会登记图片代理的原图地址）
+            thumbnails = [_thumbnail_url(item) for item in search_result.items]
+            with span("render", {"item.count": len(search_result.items)}):
+                result_text += await offload(
+                    _format_search_items, search_result.items, thumbnails,
+                    size=len(search_result.items)
+                )
             
             return [TextContent(type="text", text=result_text)]
             
@@ -209,10 +895,10 @@ async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> List[TextCon
     
     elif name == "get_mercari_item_detail":
         try:
-            item_id = arguments.get("item_id")
+            item_id = arguments.get("item_id", "")
             
             # 获取商品详情
-            item = await mercapi_client.get_item_detail(item_id)
+            item = await get_mercapi_client().get_item_detail(item_id)
             
             # 格式化结果
             result_text = f"📋 商品详情:\n"
@@ -220,7 +906,8 @@ async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> List[TextCon
             result_text += f"🏷️ 名称: {item.name}\n"
             result_text += f"💰 价格: ¥{item.price:,}\n"
             result_text += f"📦 状态: {item.status}\n"
-            result_text += f"👤 卖家: {item.seller_name}\n"
+            result_text += f"👤 卖家: {item.seller_name}"
+            result_text += f" (ID: {item.seller_id})\n" if item.seller_id else "\n"
             if item.seller_rating:
                 result_text += f"⭐ 卖家评分: {item.seller_rating}\n"
             if item.brand_name:
@@ -229,7 +916,7 @@ async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> List[TextCon
                 result_text += f"📂 分类: {item.category_name}\n"
             if item.url:
                 result_text += f"🔗 链接: {item.url}\n"
-            result_text += f"🖼️ 缩略图: {item.thumbnail}\n"
+            result_text += f"🖼️ 缩略图: {_thumbnail_url(item)}\n"
             result_text += f"📅 创建时间: {item.created_time}\n"
             result_text += f"🔄 更新时间: {item.updated_time}\n"
             if item.description:
@@ -244,57 +931,540 @@ async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> List[TextCon
     elif name == "search_mercari_by_category":
         try:
             # 提取搜索参数
-            category_name = arguments.get("category_name")
+            category_name = arguments.get("category_name", "")
+            keyword = arguments.get("keyword", "")
             price_min = arguments.get("price_min")
             price_max = arguments.get("price_max")
             condition = arguments.get("condition")
             sort = arguments.get("sort", "created_time")
             page = arguments.get("page", 1)
             limit = arguments.get("limit", 20)
+            collapse_duplicates = arguments.get("collapse_duplicates", False)
             
-            # 使用分类名称作为关键词进行搜索
-            search_result = await mercapi_client.search_items(
-                keyword=category_name,
-                price_min=price_min,
-                price_max=price_max,
-                condition=condition,
-                sort=sort,
-                page=page,
-                limit=limit
+            # 通过分类索引将名称解析为分类ID
+            category_matches = []
+            category_index = await get_mercapi_client().get_category_index()
+            if category_index is not None:
+                category_matches = category_index.resolve(category_name)
+            
+            if category_matches:
+                # 在上游按分类ID筛选
+                fetch = functools.partial(
+                    get_mercapi_client().search_batch,
+                    keyword,
+                    category_ids=[match.id for match in category_matches],
+                    price_min=price_min,
+                    price_max=price_max,
+                    condition=condition,
+                    sort=sort,
+                    collapse_duplicates=collapse_duplicates
+                )
+            else:
+                # 无法解析分类时退回为关键词搜索
+                fetch = functools.partial(
+                    get_mercapi_client().search_batch,
+                    f"{category_name} {keyword}".strip(),
+                    price_min=price_min,
+                    price_max=price_max,
+                    condition=condition,
+                    sort=sort,
+                    collapse_duplicates=collapse_duplicates
+                )
+            search_result = await cursor_store.open(
+                fetch, offset=(page - 1) * limit, limit=limit,
+                context={"title": f"🔍 分类搜索结果（分类：{category_name}）", "thumbnails": False}
             )
+            _schedule_prefetch(search_result.items)
             
             # 格式化结果
             result_text = f"🔍 分类搜索结果（分类：{category_name}）\n"
+            if category_matches:
+                result_text += "📂 匹配分类: " + "、".join(
+                    f"{match.path} (ID: {match.id})" for match in category_matches
+                ) + "\n"
+            else:
+                result_text += "⚠️ 未能解析分类，已按关键词搜索\n"
+            result_text += f"📊 总共找到 {search_result.total_count} 个商品\n"
+            result_text += f"📄 当前第 {search_result.current_page} 页\n"
+            if search_result.collapsed_count:
+                result_text += f"🔁 已折叠 {search_result.collapsed_count} 个近似重复商品\n"
+            result_text += f"➡️ {'有' if search_result.has_next else '没有'}下一页\n"
+            result_text += _format_cursor(search_result.cursor)
+            
+            with span("render", {"item.count": len(search_result.items)}):
+                result_text += await offload(
+                    _format_search_items, search_result.items,
+                    size=len(search_result.items)
+                )
+            
+            return [TextContent(type="text", text=result_text)]
+            
+        except Exception as e:
+            logger.error(f"分类搜索失败: {e}")
+            return [TextContent(type="text", text=f"❌ 分类搜索失败: {str(e)}")]
+    
+    elif name == "next_page":
+        try:
+            cursor = arguments.get("cursor", "")
+            limit = arguments.get("limit")
+            
+            try:
+                session, offset, search_result = await cursor_store.next_page(cursor, limit=limit)
+            except CursorNotFoundError as e:
+                return [TextContent(type="text", text=f"❌ {str(e)}")]
+            _schedule_prefetch(search_result.items)
+            
+            # 格式化结果
+            result_text = f"{session.context.get('title', '🔍 搜索结果')}\n"
             result_text += f"📊 总共找到 {search_result.total_count} 个商品\n"
             result_text += f"📄 当前第 {search_result.current_page} 页\n"
-            result_text += f"➡️ {'有' if search_result.has_next else '没有'}下一页\n\n"
+            if search_result.collapsed_count:
+                result_text += f"🔁 已折叠 {search_result.collapsed_count} 个近似重复商品\n"
+            result_text += f"➡️ {'有' if search_result.has_next else '没有'}下一页\n"
+            result_text += _format_cursor(search_result.cursor)
+            
+            cursor_thumbnails = (
+                [_thumbnail_url(item) for item in search_result.items]
+                if session.context.get("thumbnails") else None
+            )
+            with span("render", {"item.count": len(search_result.items)}):
+                result_text += await offload(
+                    _format_search_items, search_result.items, cursor_thumbnails, offset + 1,
+                    size=len(search_result.items)
+                )
+            
+            return [TextContent(type="text", text=result_text)]
+            
+        except Exception as e:
+            logger.error(f"翻页失败: {e}")
+            return [TextContent(type="text", text=f"❌ 翻页失败: {str(e)}")]
+    
+    elif name == "get_mercari_seller_items":
+        try:
+            seller_id = arguments.get("seller_id", "")
+            status = arguments.get("status", "all")
+            limit = arguments.get("limit", 20)
+            max_items = min(max(arguments.get("max_items", 300), 1), MAX_SELLER_ITEMS)
+            if status not in SELLER_STATUS_OPTIONS:
+                return [TextContent(type="text", text=f"❌ 不支持的销售状态: {status}")]
+            
+            # 各状态分区并发拉取；筛选和排序在本地进行，结果保存在服务器端会话中
+            inventory = await get_mercapi_client().get_seller_items(
+                seller_id, statuses=SELLER_STATUS_OPTIONS[status], max_items=max_items
+            )
+            with span("seller_stats", {"item.count": len(inventory.items)}):
+                seller_stats = await offload(summarize_seller_items, inventory.items, size=len(inventory.items))
+            
+            seller = inventory.seller
+            seller_label = f"{seller.name} (ID: {seller_id})" if seller else f"ID: {seller_id}"
+            fetch = functools.partial(
+                get_mercapi_client().seller_items_batch,
+                inventory,
+                price_min=arguments.get("price_min"),
+                price_max=arguments.get("price_max"),
+                sort=arguments.get("sort", "created_time"),
+                order=arguments.get("order", "desc"),
+                collapse_duplicates=arguments.get("collapse_duplicates", False)
+            )
+            search_result = await cursor_store.open(
+                fetch, offset=0, limit=limit,
+                context={"title": f"🏪 卖家商品（{seller_label}）", "thumbnails": True}
+            )
+            _schedule_prefetch(search_result.items)
+            
+            # 格式化结果
+            result_text = f"🏪 卖家商品（{seller_label}）\n"
+            if seller is not None:
+                if seller.rating is not None:
+                    result_text += f"⭐ 卖家评分: {seller.rating:.2f}（{seller.num_ratings} 个评价）\n"
+                if seller.follower_count is not None:
+                    result_text += f"👥 关注者: {seller.follower_count}\n"
+            result_text += f"📦 商品数: {seller_stats.listing_count}"
+            result_text += "（已达到数量上限，未拉取全部商品）\n" if inventory.truncated else "\n"
+            result_text += f"🟢 在售: {seller_stats.on_sale_count}，🔴 已售出: {seller_stats.sold_count}"
+            if seller_stats.sold_ratio is not None:
+                result_text += f"（售出比例 {seller_stats.sold_ratio:.0%}）"
+            result_text += "\n"
+            if seller_stats.price_min is not None:
+                result_text += (
+                    f"💰 价格: ¥{seller_stats.price_min:,} ~ ¥{seller_stats.price_max:,}，"
+                    f"平均 ¥{seller_stats.price_avg:,.0f}，中位数 ¥{seller_stats.price_median:,.0f}\n"
+                )
+            if seller_stats.newest_time:
+                result_text += f"📅 上架时间: {seller_stats.oldest_time} ~ {seller_stats.newest_time}\n"
+            result_text += f"🔎 筛选后 {search_result.total_count} 个商品\n"
+            if search_result.collapsed_count:
+                result_text += f"🔁 已折叠 {search_result.collapsed_count} 个近似重复商品\n"
+            result_text += f"➡️ {'有' if search_result.has_next else '没有'}下一页\n"
+            result_text += _format_cursor(search_result.cursor)
+            
+            thumbnails = [_thumbnail_url(item) for item in search_result.items]
+            with span("render", {"item.count": len(search_result.items)}):
+                result_text += await offload(
+                    _format_search_items, search_result.items, thumbnails,
+                    size=len(search_result.items)
+                )
+            
+            return [TextContent(type="text", text=result_text)]
+            
+        except Exception as e:
+            logger.error(f"获取卖家商品失败: {e}")
+            return [TextContent(type="text", text=f"❌ 获取卖家商品失败: {str(e)}")]
+    
+    elif name == "get_job_result":
+        try:
+            job_id = arguments.get("job_id", "")
+            wait_seconds = min(max(float(arguments.get("wait_seconds", 0)), 0.0), MAX_JOB_WAIT_SECONDS)
+            
+            try:
+                job = await job_manager.wait(job_id, _session_key(), wait_seconds)
+            except JobNotFoundError as e:
+                return [TextContent(type="text", text=f"❌ {str(e)}")]
+            
+            header = f"🆔 任务 {job.job_id}（{job.tool}）{JOB_STATUS_LABELS[job.status]}"
+            if job.status == JOB_DONE:
+                header += f"，用时 {job.elapsed_seconds():.1f} 秒\n\n"
+                contents = list(job.result)
+                contents[0] = TextContent(type="text", text=header + contents[0].text)
+                return contents
+            if job.status == JOB_FAILED:
+                return [TextContent(type="text", text=f"{header}: {job.error}")]
+            if job.status == JOB_RUNNING:
+                header += f"（已运行 {job.elapsed_seconds():.0f} 秒）"
+            if job.active:
+                header += "\n💡 稍后再次调用 get_job_result，或设置 wait_seconds 等待完成"
+            return [TextContent(type="text", text=header)]
+            
+        except Exception as e:
+            logger.error(f"获取任务结果失败: {e}")
+            return [TextContent(type="text", text=f"❌ 获取任务结果失败: {str(e)}")]
+    
+    elif name == "cancel_job":
+        try:
+            try:
+                job = job_manager.cancel(arguments.get("job_id", ""), _session_key())
+            except (JobNotFoundError, JobRejectedError) as e:
+                return [TextContent(type="text", text=f"❌ {str(e)}")]
+            
+            if job.status == JOB_RUNNING:
+                return [TextContent(type="text", text=f"🚫 正在取消任务 {job.job_id}（{job.tool}）")]
+            return [TextContent(type="text", text=f"🆔 任务 {job.job_id}（{job.tool}）{JOB_STATUS_LABELS[job.status]}")]
+            
+        except Exception as e:
+            logger.error(f"取消任务失败: {e}")
+            return [TextContent(type="text", text=f"❌ 取消任务失败: {str(e)}")]
+    
+    elif name == "search_local_index":
+        try:
+            if local_index is None:
+                return [TextContent(
+                    type="text",
+                    text="❌ 本地索引未启用，请设置环境变量 MERCARI_MCP_LOCAL_INDEX=1"
+                )]
+            
+            keyword = arguments.get("keyword")
+            
+            # 查询本地索引
+            index_result = local_index.search(
+                keyword=keyword,
+                category_id=arguments.get("category_id"),
+                price_min=arguments.get("price_min"),
+                price_max=arguments.get("price_max"),
+                sort=arguments.get("sort", "created_time"),
+                order=arguments.get("order", "desc"),
+                limit=arguments.get("limit", 20)
+            )
+            
+            # 格式化结果
+            result_text = f"🗂️ 本地索引搜索结果（关键词：{keyword or '无'}）\n"
+            result_text += f"📊 匹配 {index_result.total_count} 个商品（索引共 {index_result.index_size} 个）\n\n"
             
-            if not search_result.items:
+            if not index_result.items:
                 result_text += "❌ 没有找到匹配的商品\n"
             else:
-                for i, item in enumerate(search_result.items, 1):
+                for i, hit in enumerate(index_result.items, 1):
+                    item = hit.item
                     result_text += f"🛍️ 商品 {i}:\n"
                     result_text += f"   📝 ID: {item.id}\n"
                     result_text += f"   🏷️ 名称: {item.name}\n"
                     result_text += f"   💰 价格: ¥{item.price:,}\n"
                     result_text += f"   📦 状态: {item.status}\n"
-                    result_text += f"   👤 卖家: {item.seller_name}\n"
-                    if item.seller_rating:
-                        result_text += f"   ⭐ 卖家评分: {item.seller_rating}\n"
-                    if item.brand_name:
-                        result_text += f"   🏢 品牌: {item.brand_name}\n"
                     if item.category_name:
                         result_text += f"   📂 分类: {item.category_name}\n"
                     if item.url:
                         result_text += f"   🔗 链接: {item.url}\n"
                     result_text += f"   📅 创建时间: {item.created_time}\n"
+                    result_text += f"   🕒 数据时效: {format_age(hit.age_seconds)}\n"
                     result_text += "\n"
             
             return [TextContent(type="text", text=result_text)]
             
         except Exception as e:
-            logger.error(f"分类搜索失败: {e}")
-            return [TextContent(type="text", text=f"❌ 分类搜索失败: {str(e)}")]
+            logger.error(f"本地索引搜索失败: {e}")
+            return [TextContent(type="text", text=f"❌ 本地索引搜索失败: {str(e)}")]
+    
+    elif name == "register_watch":
+        try:
+            config = get_watch_manager().register(
+                keyword=arguments.get("keyword", ""),
+                category_id=arguments.get("category_id"),
+                price_min=arguments.get("price_min"),
+                price_max=arguments.get("price_max"),
+                interval_seconds=arguments.get("interval_seconds", 60),
+                jitter_seconds=arguments.get("jitter_seconds"),
+                notifier=_make_watch_notifier()
+            )
+            
+            result_text = f"👀 已注册关注搜索\n"
+            result_text += f"🆔 关注ID: {config.id}\n"
+            result_text += f"🔍 关键词: {config.keyword}\n"
+            result_text += f"⏱️ 轮询间隔: {config.interval_seconds:.0f} 秒（抖动 ±{config.jitter_seconds:.0f} 秒）\n"
+            result_text += "📬 新商品会通过通知推送，也可以使用 get_watch_updates 获取\n"
+            
+            return [TextContent(type="text", text=result_text)]
+            
+        except Exception as e:
+            logger.error(f"注册关注搜索失败: {e}")
+            return [TextContent(type="text", text=f"❌ 注册关注搜索失败: {str(e)}")]
+    
+    elif name == "list_watches":
+        try:
+            watches = get_watch_manager().list_watches()
+            
+            result_text = f"👀 关注搜索列表（共 {len(watches)} 个）\n\n"
+            for status in watches:
+                config = status.config
+                result_text += f"🆔 {config.id}: {config.keyword}\n"
+                if config.price_min is not None or config.price_max is not None:
+                    result_text += f"   💰 价格范围: {config.price_min or 0} - {config.price_max or '不限'}\n"
+                result_text += f"   ⏱️ 轮询间隔: {config.interval_seconds:.0f} 秒，已轮询 {status.poll_count} 次\n"
+                result_text += f"   📬 未读新商品: {status.pending_updates}\n"
+                if status.last_seen_created:
+                    result_text += f"   📅 已见最新创建时间: {status.last_seen_created}\n"
+                if status.last_error:
+                    result_text += f"   ⚠️ 最近错误: {status.last_error}\n"
+                result_text += "\n"
+            
+            return [TextContent(type="text", text=result_text)]
+            
+        except Exception as e:
+            logger.error(f"获取关注列表失败: {e}")
+            return [TextContent(type="text", text=f"❌ 获取关注列表失败: {str(e)}")]
+    
+    elif name == "remove_watch":
+        watch_id = arguments.get("watch_id", "")
+        if get_watch_manager().unregister(watch_id):
+            return [TextContent(type="text", text=f"✅ 已删除关注搜索 {watch_id}")]
+        return [TextContent(type="text", text=f"❌ 关注 {watch_id} 不存在")]
+    
+    elif name == "get_watch_updates":
+        try:
+            updates = get_watch_manager().get_updates(
+                watch_id=arguments.get("watch_id"),
+                limit=arguments.get("limit", 50)
+            )
+            
+            result_text = f"📬 关注搜索新商品（共 {len(updates)} 个）\n\n"
+            if not updates:
+                result_text += "❌ 暂无新商品\n"
+            else:
+                for i, update in enumerate(updates, 1):
+                    item = update.item
+                    result_text += f"🆕 商品 {i}（关注 {update.watch_id}）:\n"
+                    result_text += f"   📝 ID: {item.id}\n"
+                    result_text += f"   🏷️ 名称: {item.name}\n"
+                    result_text += f"   💰 价格: ¥{item.price:,}\n"
+                    result_text += f"   📦 状态: {item.status}\n"
+                    result_text += f"   👤 卖家: {item.seller_name}\n"
+                    if item.url:
+                        result_text += f"   🔗 链接: {item.url}\n"
+                    result_text += f"   📅 创建时间: {item.created_time}\n"
+                    result_text += "\n"
+            
+            return [TextContent(type="text", text=result_text)]
+            
+        except Exception as e:
+            logger.error(f"获取关注新商品失败: {e}")
+            return [TextContent(type="text", text=f"❌ 获取关注新商品失败: {str(e)}")]
+    
+    elif name == "get_price_history":
+        try:
+            if price_history is None:
+                return [TextContent(type="text", text="❌ 价格历史未启用")]
+            
+            item_id = arguments.get("item_id", "")
+            observations = price_history.get_history(item_id, limit=arguments.get("limit", 50))
+            
+            result_text = f"📈 价格历史（商品：{item_id}）\n"
+            if not observations:
+                result_text += "❌ 暂无该商品的价格记录\n"
+            else:
+                result_text += f"📊 共 {len(observations)} 条记录（仅记录价格或状态变化）\n\n"
+                for observation in observations:
+                    observed_at = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(observation.timestamp))
+                    result_text += f"   📅 {observed_at}  💰 ¥{observation.price:,}  📦 {observation.status}\n"
+            
+            return [TextContent(type="text", text=result_text)]
+            
+        except Exception as e:
+            logger.error(f"获取价格历史失败: {e}")
+            return [TextContent(type="text", text=f"❌ 获取价格历史失败: {str(e)}")]
+    
+    elif name == "price_stats":
+        try:
+            if price_history is None:
+                return [TextContent(type="text", text="❌ 价格历史未启用")]
+            
+            item_id = arguments.get("item_id")
+            keyword = arguments.get("keyword")
+            max_events = arguments.get("max_events", 10)
+            if not item_id and not keyword:
+                return [TextContent(type="text", text="❌ 请提供 item_id 或 keyword")]
+            stats: Optional[PriceStats] = await price_history.compute_stats(
+                item_id=item_id, keyword=keyword, max_events=max_events
+            )
+            
+            if stats is None:
+                return [TextContent(type="text", text=f"❌ 暂无 {item_id or keyword} 的价格记录")]
+            
+            result_text = f"📈 价格统计（{'商品' if stats.scope == 'item' else '关键词'}：{stats.key}）\n"
+            result_text += f"🛍️ 商品数量: {stats.item_count}\n"
+            result_text += f"📊 观测数量: {stats.observation_count}\n"
+            result_text += f"⬇️ 最低价格: ¥{stats.min_price:,}\n"
+            result_text += f"⬆️ 最高价格: ¥{stats.max_price:,}\n"
+            result_text += f"➗ 价格中位数: ¥{stats.median_price:,.0f}\n"
+            if stats.latest_price is not None:
+                result_text += f"💰 最新价格: ¥{stats.latest_price:,}\n"
+            result_text += f"📉 降价次数: {stats.drop_count}\n"
+            for event in stats.drop_events:
+                observed_at = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(event.timestamp))
+                result_text += (
+                    f"   📅 {observed_at} {event.item_id}: ¥{event.old_price:,} → ¥{event.new_price:,}"
+                    f"（-{event.drop_ratio:.1%}）\n"
+                )
+            
+            return [TextContent(type="text", text=result_text)]
+            
+        except Exception as e:
+            logger.error(f"价格统计失败: {e}")
+            return [TextContent(type="text", text=f"❌ 价格统计失败: {str(e)}")]
+    
+    elif name == "mercari_price_summary":
+        try:
+            keyword = arguments.get("keyword", "")
+            max_items = min(max(int(arguments.get("max_items", 500)), 1), 5000)
+            
+            # 流式汇总价格
+            summary = await collect_price_summary(
+                get_mercapi_client(),
+                keyword=keyword,
+                max_items=max_items,
+                category_id=arguments.get("category_id"),
+                price_min=arguments.get("price_min"),
+                price_max=arguments.get("price_max"),
+                condition=arguments.get("condition"),
+                status=arguments.get("status")
+            )
+            
+            # 格式化结果
+            result_text = f"💹 行情价格汇总（关键词：{keyword}）\n"
+            result_text += f"📊 统计 {summary.count} 个商品（上游共 {summary.total_found} 个，拉取 {summary.pages_fetched} 页）\n"
+            if summary.truncated:
+                result_text += f"✂️ 已达到统计上限 {max_items}\n"
+            if not summary.count:
+                result_text += "❌ 没有找到匹配的商品\n"
+                return [TextContent(type="text", text=result_text)]
+            
+            result_text += f"💰 平均价格: ¥{summary.mean:,.0f}\n"
+            result_text += f"⬇️ 最低价格: ¥{summary.min_price:,}  ⬆️ 最高价格: ¥{summary.max_price:,}\n"
+            result_text += "📐 分位数: " + "  ".join(
+                f"{name}=¥{value:,.0f}" for name, value in summary.percentiles.items()
+            ) + "\n"
+            for label, status_summary in (("🟢 在售", summary.on_sale), ("🔴 已售", summary.sold)):
+                if status_summary.count:
+                    result_text += (
+                        f"{label}: {status_summary.count} 个，均价 ¥{status_summary.mean:,.0f}，"
+                        f"中位数 ¥{status_summary.median:,.0f}\n"
+                    )
+                else:
+                    result_text += f"{label}: 0 个\n"
+            result_text += "📶 价格分布:\n"
+            for bucket in summary.histogram:
+                upper = f"¥{bucket.upper:,}" if bucket.upper is not None else "以上"
+                result_text += f"   ¥{bucket.lower:,} - {upper}: {bucket.count}\n"
+            
+            return [TextContent(type="text", text=result_text)]
+            
+        except Exception as e:
+            logger.error(f"行情价格汇总失败: {e}")
+            return [TextContent(type="text", text=f"❌ 行情价格汇总失败: {str(e)}")]
+    
+    elif name == "export_search":
+        try:
+            keyword = arguments.get("keyword", "")
+            file_name = Path(arguments.get("file_name", "")).name
+            export_format = arguments.get("format", "ndjson")
+            if not file_name:
+                return [TextContent(type="text", text="❌ 请提供输出文件名")]
+            if export_format not in EXPORT_FORMATS:
+                return [TextContent(type="text", text=f"❌ 不支持的导出格式: {export_format}")]
+            
+            # 执行导出（只允许写入导出目录）
+            export_result = await export_search(
+                get_mercapi_client(),
+                keyword=keyword,
+                output_path=str(export_dir / file_name),
+                format=export_format,
+                max_items=arguments.get("max_items"),
+                max_pages=arguments.get("max_pages"),
+                resume=arguments.get("resume", True),
+                category_id=arguments.get("category_id"),
+                price_min=arguments.get("price_min"),
+                price_max=arguments.get("price_max"),
+                condition=arguments.get("condition"),
+                status=arguments.get("status")
+            )
+            
+            # 格式化结果
+            result_text = f"📦 导出结果（关键词：{keyword}）\n"
+            result_text += f"📁 文件: {', '.join(export_result.files) or export_result.path}\n"
+            result_text += f"📄 格式: {export_result.format}\n"
+            result_text += f"✍️ 本次写入 {export_result.rows_this_run} 行，累计 {export_result.rows_written} 行（{export_result.pages_fetched} 页）\n"
+            if export_result.resumed:
+                result_text += "🔁 已从上次中断处继续\n"
+            if export_result.completed:
+                result_text += "✅ 已导出全部结果\n"
+            else:
+                result_text += "⏸️ 尚未导出全部结果，再次调用相同参数即可继续\n"
+            
+            return [TextContent(type="text", text=result_text)]
+            
+        except Exception as e:
+            logger.error(f"导出失败: {e}")
+            return [TextContent(type="text", text=f"❌ 导出失败: {str(e)}")]
+    
+    elif name == "resolve_brand":
+        try:
+            brand_name = arguments.get("name", "")
+            brand_index = await get_mercapi_client().get_brand_index()
+            if brand_index is None:
+                return [TextContent(type="text", text="❌ 品牌词典暂不可用")]
+            
+            matches = brand_index.resolve(brand_name, limit=arguments.get("limit", 10))
+            
+            result_text = f"🏢 品牌解析结果（{brand_name}）\n"
+            if not matches:
+                result_text += "❌ 没有找到匹配的品牌\n"
+            for match in matches:
+                sub_name = f" / {match.sub_name}" if match.sub_name else ""
+                kind = "精确" if match.exact else "前缀"
+                result_text += f"   🆔 {match.id}: {match.name}{sub_name}（{kind}匹配：{match.matched}）\n"
+            
+            return [TextContent(type="text", text=result_text)]
+            
+        except Exception as e:
+            logger.error(f"品牌解析失败: {e}")
+            return [TextContent(type="text", text=f"❌ 品牌解析失败: {str(e)}")]
     
     else:
         return [TextContent(type="text", text=f"❌ 未知工具: {name}")]
@@ -302,6 +1472,9 @@ async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> List[TextCon
 
 async def main():
     """主函数"""
+    configure_tracing_from_env()
+    configure_profiling_from_env()
+    configure_loop_health_from_env()
     # 运行服务器
     async with stdio_server() as (read_stream, write_stream):
         await server.run(
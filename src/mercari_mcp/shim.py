@@ -0,0 +1,128 @@
+"""
+stdio转发入口 - 将会话的JSON-RPC消息通过Unix套接字转发给常驻守护进程
+
+本模块只依赖标准库，启动时不导入MCP/mercapi；守护进程不可用时自动启动守护进程，
+仍无法连接则退回到进程内的stdio服务器。
+"""
+
+import asyncio
+import logging
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Optional, Tuple
+
+from .config import env_flag, env_float, env_str
+
+logger = logging.getLogger(__name__)
+
+# 转发时每次读取的最大字节数
+CHUNK_SIZE = 64 * 1024
+
+
+def default_socket_path() -> Path:
+    """守护进程套接字路径（MERCARI_MCP_DAEMON_SOCKET，默认位于缓存目录）"""
+    cache_dir = Path(env_str("MERCARI_MCP_CACHE_DIR", str(Path.home() / ".cache" / "mercari-mcp")))
+    return Path(env_str("MERCARI_MCP_DAEMON_SOCKET", str(cache_dir / "daemon.sock")))
+
+
+async def _connect(socket_path: Path) -> Optional[Tuple[asyncio.StreamReader, asyncio.StreamWriter]]:
+    """连接守护进程，不可连接时返回None"""
+    try:
+        return await asyncio.open_unix_connection(str(socket_path))
+    except OSError:
+        return None
+
+
+def _spawn_daemon(socket_path: Path) -> None:
+    """在后台启动守护进程（脱离当前会话，日志写入套接字旁的 daemon.log）"""
+    socket_path.parent.mkdir(parents=True, exist_ok=True, mode=0o700)
+    env = dict(os.environ)
+    env["MERCARI_MCP_DAEMON_SOCKET"] = str(socket_path)
+    package_root = str(Path(__file__).resolve().parent.parent)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [package_root, env.get("PYTHONPATH")]))
+    with open(socket_path.with_name("daemon.log"), "ab") as log_file:
+        subprocess.Popen(
+            [sys.executable, "-m", "mercari_mcp.daemon"],
+            env=env,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=log_file,
+            start_new_session=True
+        )
+
+
+async def connect_daemon(
+    socket_path: Path,
+    autostart: bool = True,
+    timeout: float = 15.0
+) -> Optional[Tuple[asyncio.StreamReader, asyncio.StreamWriter]]:
+    """连接守护进程，必要时自动启动并等待其就绪"""
+    connection = await _connect(socket_path)
+    if connection is not None or not autostart:
+        return connection
+
+    logger.info(f"启动Mercari MCP守护进程: {socket_path}")
+    _spawn_daemon(socket_path)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+        connection = await _connect(socket_path)
+        if connection is not None:
+            return connection
+    return None
+
+
+async def forward_stdio(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """在stdin/stdout与守护进程套接字之间双向转发字节流"""
+    loop = asyncio.get_running_loop()
+    stdin = asyncio.StreamReader()
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(stdin), sys.stdin.buffer)
+    stdout = sys.stdout.buffer
+
+    async def upstream():
+        while True:
+            chunk = await stdin.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            writer.write(chunk)
+            await writer.drain()
+        # 客户端关闭stdin时半关闭套接字，守护进程随之结束该会话
+        if writer.can_write_eof():
+            writer.write_eof()
+
+    upstream_task = asyncio.ensure_future(upstream())
+    try:
+        while True:
+            chunk = await reader.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            stdout.write(chunk)
+            stdout.flush()
+    finally:
+        upstream_task.cancel()
+        writer.close()
+
+
+async def main():
+    """主函数"""
+    socket_path = default_socket_path()
+    connection = await connect_daemon(
+        socket_path,
+        autostart=env_flag("MERCARI_MCP_DAEMON_AUTOSTART", True),
+        timeout=env_float("MERCARI_MCP_DAEMON_START_TIMEOUT", 15.0)
+    )
+    if connection is None:
+        logger.warning(f"无法连接守护进程，改为在当前进程中运行服务器: {socket_path}")
+        from .server import main as server_main
+
+        await server_main()
+        return
+
+    await forward_stdio(*connection)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
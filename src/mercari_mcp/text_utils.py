@@ -0,0 +1,24 @@
+"""
+文本工具 - 商品名称/描述的规范化与n-gram切分
+"""
+
+import unicodedata
+from typing import Optional, Set
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """规范化文本：NFKC全半角统一、转小写、去除空白"""
+    if not text:
+        return ""
+    normalized = unicodedata.normalize("NFKC", text).lower()
+    return "".join(normalized.split())
+
+
+def char_ngrams(text: str, n: int = 2) -> Set[str]:
+    """对已规范化的文本进行字符n-gram切分（适用于日文等无空格分词的语言）"""
+    if not text:
+        return set()
+    if len(text) <= n:
+        return {text}
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
@@ -0,0 +1,191 @@
+"""
+链路追踪 - 可选的OpenTelemetry埋点（工具调用、上游请求、卖家信息、解析与渲染）
+
+未安装 opentelemetry 或未启用追踪时，span() 为空操作，几乎没有额外开销。
+启用慢调用日志时，span() 同时记录各阶段的耗时。
+"""
+
+import logging
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, Iterator, Mapping, Optional, Tuple
+
+from .config import env_flag, env_str
+from .profiling import current_call, stage_timer
+
+logger = logging.getLogger(__name__)
+
+TRACER_NAME = "mercari_mcp"
+
+# 追踪上下文的传播字段（W3C Trace Context）
+TRACE_CONTEXT_FIELDS = ("traceparent", "tracestate")
+
+_tracer = None
+
+
+class _NoopSpan:
+    """未启用追踪时使用的空span"""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, attributes: Mapping[str, Any]) -> None:
+        pass
+
+    def record_exception(self, exception: BaseException) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def tracing_enabled() -> bool:
+    """是否已启用追踪"""
+    return _tracer is not None
+
+
+def configure_tracing(exporter: str = "otlp") -> Optional[Any]:
+    """启用OpenTelemetry追踪
+
+    exporter 可选 otlp、console、memory；memory 返回 InMemorySpanExporter，
+    便于在没有采集器的环境中检查span。未安装依赖时返回None并保持空操作。
+    """
+    global _tracer
+    try:
+        from opentelemetry import trace
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, SimpleSpanProcessor
+    except ImportError:
+        logger.warning("未安装OpenTelemetry，追踪未启用: pip install -e \".[tracing]\"")
+        return None
+
+    provider = TracerProvider(resource=Resource.create({"service.name": "mercari-mcp"}))
+    span_exporter: Any
+    if exporter == "memory":
+        from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+        span_exporter = InMemorySpanExporter()
+        provider.add_span_processor(SimpleSpanProcessor(span_exporter))
+    elif exporter == "console":
+        from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+
+        span_exporter = ConsoleSpanExporter()
+        provider.add_span_processor(SimpleSpanProcessor(span_exporter))
+    else:
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            logger.warning("未安装OTLP导出器，追踪未启用: pip install opentelemetry-exporter-otlp-proto-http")
+            return None
+        span_exporter = OTLPSpanExporter()
+        provider.add_span_processor(BatchSpanProcessor(span_exporter))
+
+    # 使用独立的provider，不覆盖宿主进程的全局配置
+    _tracer = trace.get_tracer(TRACER_NAME, tracer_provider=provider)
+    logger.info(f"OpenTelemetry追踪已启用: exporter={exporter}")
+    return span_exporter
+
+
+def configure_tracing_from_env() -> Optional[Any]:
+    """按环境变量启用追踪（MERCARI_MCP_TRACING=1，MERCARI_MCP_TRACING_EXPORTER 选择导出器）"""
+    if not env_flag("MERCARI_MCP_TRACING") or tracing_enabled():
+        return None
+    return configure_tracing(env_str("MERCARI_MCP_TRACING_EXPORTER", "otlp"))
+
+
+def disable_tracing() -> None:
+    """关闭追踪（恢复为空操作）"""
+    global _tracer
+    _tracer = None
+
+
+def _clean_attributes(attributes: Optional[Mapping[str, Any]]) -> Dict[str, Any]:
+    """去掉空值，非基本类型转为字符串"""
+    cleaned: Dict[str, Any] = {}
+    for key, value in (attributes or {}).items():
+        if value is None:
+            continue
+        cleaned[key] = value if isinstance(value, (bool, int, float, str)) else str(value)
+    return cleaned
+
+
+@contextmanager
+def span(name: str, attributes: Optional[Mapping[str, Any]] = None, context: Optional[Any] = None) -> Iterator[Any]:
+    """创建一个span（未启用追踪时为空操作），并计入当前工具调用的阶段耗时"""
+    tracer = _tracer
+    record = current_call()
+    if tracer is None and record is None:
+        yield _NOOP_SPAN
+        return
+    with stage_timer(record, name) if record is not None else nullcontext():
+        if tracer is None:
+            yield _NOOP_SPAN
+        else:
+            with tracer.start_as_current_span(name, context=context, attributes=_clean_attributes(attributes)) as current:
+                yield current
+
+
+def extract_context(carrier: Mapping[str, str]) -> Optional[Any]:
+    """从请求头等载体中提取W3C追踪上下文"""
+    if _tracer is None:
+        return None
+    fields = {
+        key.lower(): value for key, value in carrier.items()
+        if key.lower() in TRACE_CONTEXT_FIELDS
+    }
+    if not fields:
+        return None
+    from opentelemetry.trace.propagation.tracecontext import TraceContextTextMapPropagator
+
+    return TraceContextTextMapPropagator().extract(fields)
+
+
+def context_from_request(request_context: Any) -> Optional[Any]:
+    """从MCP请求中提取调用方的追踪上下文
+
+    优先使用SSE传输附带的HTTP请求头，其次使用请求参数 _meta 中的 traceparent/tracestate。
+    """
+    if _tracer is None or request_context is None:
+        return None
+    carrier: Dict[str, str] = {}
+    headers = getattr(getattr(request_context, "request", None), "headers", None)
+    if headers is not None:
+        carrier.update({key: value for key, value in headers.items()})
+    meta = getattr(request_context, "meta", None)
+    extra = getattr(meta, "model_extra", None) or {}
+    for key in TRACE_CONTEXT_FIELDS:
+        if key not in {name.lower() for name in carrier} and key in extra:
+            carrier[key] = str(extra[key])
+    return extract_context(carrier)
+
+
+class TracingMiddleware:
+    """ASGI中间件：为每个HTTP请求创建span，并沿用请求头中的追踪上下文
+
+    长连接的SSE端点不创建span（否则span会一直处于打开状态）。
+    """
+
+    def __init__(self, app: Any, exclude_paths: Tuple[str, ...] = ("/sse",)):
+        self.app = app
+        self.exclude_paths = exclude_paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or _tracer is None or scope.get("path") in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        headers = {
+            key.decode("latin-1"): value.decode("latin-1")
+            for key, value in scope.get("headers", [])
+        }
+        status = {}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        attributes = {"http.method": scope.get("method"), "http.target": scope.get("path")}
+        with span(f"{scope.get('method')} {scope.get('path')}", attributes, context=extract_context(headers)) as current:
+            await self.app(scope, receive, send_with_status)
+            current.set_attribute("http.status_code", status.get("code", 0))
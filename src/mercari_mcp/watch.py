@@ -0,0 +1,300 @@
+"""
+关注搜索监控 - 定时轮询保存的搜索条件，增量发现新上架商品
+"""
+
+import asyncio
+import logging
+import random
+import time
+import uuid
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Set
+
+from pydantic import BaseModel, Field
+
+from .mercapi_client import MercapiClient, MercariItem
+
+logger = logging.getLogger(__name__)
+
+# 新商品通知回调：参数为关注配置和新商品列表
+WatchNotifier = Callable[["WatchConfig", List[MercariItem]], Awaitable[None]]
+
+
+class WatchConfig(BaseModel):
+    """关注搜索配置"""
+    id: str = Field(..., description="关注ID")
+    keyword: str = Field(..., description="搜索关键词")
+    category_id: Optional[int] = Field(None, description="分类ID")
+    price_min: Optional[int] = Field(None, description="最低价格")
+    price_max: Optional[int] = Field(None, description="最高价格")
+    interval_seconds: float = Field(60.0, description="轮询间隔（秒）")
+    jitter_seconds: float = Field(0.0, description="轮询抖动（秒）")
+
+
+class WatchUpdate(BaseModel):
+    """关注搜索发现的新商品"""
+    watch_id: str = Field(..., description="关注ID")
+    item: MercariItem = Field(..., description="新商品")
+    detected_at: float = Field(..., description="发现时间戳")
+
+
+class WatchStatus(BaseModel):
+    """关注搜索运行状态"""
+    config: WatchConfig = Field(..., description="关注配置")
+    last_polled_at: Optional[float] = Field(None, description="上次轮询时间戳")
+    next_poll_at: float = Field(..., description="下次轮询时间戳")
+    last_seen_created: Optional[str] = Field(None, description="已见过的最新创建时间")
+    pending_updates: int = Field(0, description="未读取的新商品数量")
+    poll_count: int = Field(0, description="轮询次数")
+    last_error: Optional[str] = Field(None, description="最近一次轮询错误")
+
+
+class _WatchState:
+    """单个关注搜索的运行状态"""
+
+    def __init__(self, config: WatchConfig, max_seen: int, max_pending: int,
+                 notifier: Optional[WatchNotifier] = None):
+        self.config = config
+        self.notifier = notifier
+        self.last_seen_created: Optional[str] = None
+        self.seen_order: Deque[str] = deque()
+        self.seen_ids: Set[str] = set()
+        self.max_seen = max_seen
+        self.pending: Deque[WatchUpdate] = deque(maxlen=max_pending)
+        self.baseline_done = False
+        self.last_polled_at: Optional[float] = None
+        self.next_poll_at = time.time()
+        self.poll_count = 0
+        self.last_error: Optional[str] = None
+
+    def mark_seen(self, items: List[MercariItem]) -> None:
+        """记录已见过的商品ID和最新创建时间（ID集合有上限）"""
+        for item in items:
+            if item.id in self.seen_ids:
+                continue
+            self.seen_ids.add(item.id)
+            self.seen_order.append(item.id)
+            if item.created_time and (
+                self.last_seen_created is None or item.created_time > self.last_seen_created
+            ):
+                self.last_seen_created = item.created_time
+        while len(self.seen_order) > self.max_seen:
+            self.seen_ids.discard(self.seen_order.popleft())
+
+    def schedule_next(self) -> None:
+        """按间隔和抖动计算下次轮询时间"""
+        jitter = self.config.jitter_seconds
+        delay = self.config.interval_seconds + (random.uniform(-jitter, jitter) if jitter else 0.0)
+        self.next_poll_at = time.time() + max(1.0, delay)
+
+
+class WatchManager:
+    """关注搜索管理器
+
+    - 每个关注有独立的轮询间隔与抖动，避免多个关注同时请求上游
+    - 记录已见过的商品ID与最新创建时间，每次轮询只处理新商品
+    - 首次轮询仅建立基线，不把已有商品当作新商品
+    """
+
+    def __init__(
+        self,
+        client: MercapiClient,
+        max_concurrent_polls: int = 4,
+        max_seen_ids: int = 2000,
+        max_pending_updates: int = 500,
+        min_interval_seconds: float = 10.0
+    ):
+        self.client = client
+        self.max_seen_ids = max_seen_ids
+        self.max_pending_updates = max_pending_updates
+        self.min_interval_seconds = min_interval_seconds
+        self._watches: Dict[str, _WatchState] = {}
+        self._polling: Set[str] = set()
+        self.max_concurrent_polls = max_concurrent_polls
+        self._poll_semaphore: Optional[asyncio.Semaphore] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._scheduler_task: Optional[asyncio.Task] = None
+        # 进行中的轮询任务（保留引用，避免任务在运行中被回收）
+        self._poll_tasks: Set["asyncio.Task[List[MercariItem]]"] = set()
+
+    def register(
+        self,
+        keyword: str,
+        category_id: Optional[int] = None,
+        price_min: Optional[int] = None,
+        price_max: Optional[int] = None,
+        interval_seconds: float = 60.0,
+        jitter_seconds: Optional[float] = None,
+        notifier: Optional[WatchNotifier] = None
+    ) -> WatchConfig:
+        """注册关注搜索，并确保后台调度器已启动"""
+        interval_seconds = max(self.min_interval_seconds, float(interval_seconds))
+        if jitter_seconds is None:
+            jitter_seconds = interval_seconds * 0.1
+        config = WatchConfig(
+            id=uuid.uuid4().hex[:12],
+            keyword=keyword,
+            category_id=category_id,
+            price_min=price_min,
+            price_max=price_max,
+            interval_seconds=interval_seconds,
+            jitter_seconds=min(float(jitter_seconds), interval_seconds / 2)
+        )
+        self._watches[config.id] = _WatchState(
+            config, self.max_seen_ids, self.max_pending_updates, notifier
+        )
+        logger.info(f"注册关注搜索: id={config.id}, keyword={keyword}, interval={interval_seconds}s")
+        self.start()
+        return config
+
+    def unregister(self, watch_id: str) -> bool:
+        """删除关注搜索"""
+        removed = self._watches.pop(watch_id, None) is not None
+        if removed:
+            logger.info(f"删除关注搜索: id={watch_id}")
+            self._wake()
+        return removed
+
+    def list_watches(self) -> List[WatchStatus]:
+        """列出所有关注搜索及其状态"""
+        return [
+            WatchStatus(
+                config=state.config,
+                last_polled_at=state.last_polled_at,
+                next_poll_at=state.next_poll_at,
+                last_seen_created=state.last_seen_created,
+                pending_updates=len(state.pending),
+                poll_count=state.poll_count,
+                last_error=state.last_error
+            )
+            for state in self._watches.values()
+        ]
+
+    def get_updates(self, watch_id: Optional[str] = None, limit: int = 50) -> List[WatchUpdate]:
+        """取出（并清除）未读取的新商品"""
+        if watch_id is not None:
+            state = self._watches.get(watch_id)
+            if state is None:
+                raise KeyError(f"关注 {watch_id} 不存在")
+            states = [state]
+        else:
+            states = list(self._watches.values())
+
+        updates: List[WatchUpdate] = []
+        for state in states:
+            while state.pending and len(updates) < limit:
+                updates.append(state.pending.popleft())
+        updates.sort(key=lambda update: update.detected_at)
+        return updates
+
+    async def poll(self, watch_id: str) -> List[MercariItem]:
+        """立即轮询一次关注搜索，返回新发现的商品"""
+        state = self._watches.get(watch_id)
+        if state is None or watch_id in self._polling:
+            return []
+
+        if self._poll_semaphore is None:
+            self._poll_semaphore = asyncio.Semaphore(self.max_concurrent_polls)
+
+        self._polling.add(watch_id)
+        try:
+            async with self._poll_semaphore:
+                config = state.config
+                new_items = await self.client.fetch_new_items(
+                    keyword=config.keyword,
+                    since_created=state.last_seen_created,
+                    seen_ids=state.seen_ids,
+                    category_id=config.category_id,
+                    price_min=config.price_min,
+                    price_max=config.price_max,
+                    # 首次轮询只需要一页来建立基线，且只记录商品ID和创建时间，无需卖家信息
+                    max_pages=3 if state.baseline_done else 1,
+                    fetch_seller=state.baseline_done
+                )
+            state.last_error = None
+        except Exception as e:
+            state.last_error = str(e)
+            logger.warning(f"关注搜索轮询失败: id={watch_id}, {e}")
+            return []
+        finally:
+            self._polling.discard(watch_id)
+            state.poll_count += 1
+            state.last_polled_at = time.time()
+            state.schedule_next()
+            self._wake()
+
+        state.mark_seen(new_items)
+        if not state.baseline_done:
+            state.baseline_done = True
+            logger.info(f"关注搜索基线已建立: id={watch_id}, 已有商品 {len(new_items)} 个")
+            return []
+
+        if new_items:
+            detected_at = time.time()
+            for item in new_items:
+                state.pending.append(WatchUpdate(watch_id=watch_id, item=item, detected_at=detected_at))
+            logger.info(f"关注搜索发现新商品: id={watch_id}, 数量={len(new_items)}")
+            if state.notifier is not None:
+                try:
+                    await state.notifier(state.config, new_items)
+                except Exception as e:
+                    logger.warning(f"发送新商品通知失败: id={watch_id}, {e}")
+        return new_items
+
+    def start(self) -> None:
+        """启动后台调度器（需在事件循环中调用）"""
+        if self._scheduler_task is not None and not self._scheduler_task.done():
+            self._wake()
+            return
+        self._wakeup = asyncio.Event()
+        self._scheduler_task = asyncio.create_task(self._run_scheduler())
+
+    async def stop(self) -> None:
+        """停止后台调度器和进行中的轮询"""
+        scheduler_task, self._scheduler_task = self._scheduler_task, None
+        tasks = list(self._poll_tasks)
+        if scheduler_task is not None:
+            tasks.append(scheduler_task)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._poll_tasks.clear()
+
+    def _wake(self) -> None:
+        """唤醒调度器重新计算下次轮询时间"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _poll_done(self, task: "asyncio.Task[List[MercariItem]]") -> None:
+        self._poll_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"关注搜索轮询任务异常: {task.exception()}")
+
+    async def _run_scheduler(self) -> None:
+        """调度循环：等待最早到期的关注，并发执行到期的轮询"""
+        wakeup = self._wakeup
+        assert wakeup is not None
+        # 调度器被停止或替换后退出（唤醒与取消同时发生时，wait_for 可能吞掉取消）
+        while self._scheduler_task is asyncio.current_task():
+            wakeup.clear()
+            now = time.time()
+            due = [
+                watch_id for watch_id, state in self._watches.items()
+                if state.next_poll_at <= now and watch_id not in self._polling
+            ]
+            for watch_id in due:
+                # 先推迟下次轮询时间，避免任务启动前被重复调度
+                self._watches[watch_id].schedule_next()
+                task = asyncio.create_task(self.poll(watch_id))
+                self._poll_tasks.add(task)
+                task.add_done_callback(self._poll_done)
+
+            pending_times = [
+                state.next_poll_at for watch_id, state in self._watches.items()
+                if watch_id not in self._polling
+            ]
+            timeout = max(0.5, min(pending_times) - now) if pending_times else None
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass